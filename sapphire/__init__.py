@@ -88,7 +88,7 @@ from .api import Network, Station
 from .clusters import HiSPARCStations, HiSPARCNetwork, ScienceParkCluster
 from .corsika.corsika_queries import CorsikaQuery
 from .esd import (quick_download, load_data, download_data, download_lightning,
-                  download_coincidences)
+                  download_coincidences, download_multiple_data)
 from .simulations.groundparticles import (GroundParticlesSimulation,
                                           MultipleGroundParticlesSimulation)
 from .simulations.ldf import KascadeLdfSimulation, NkgLdfSimulation
@@ -129,7 +129,8 @@ __all__ = ['analysis',
            'HiSPARCStations', 'HiSPARCNetwork', 'ScienceParkCluster',
            'CorsikaQuery',
            'quick_download', 'load_data', 'download_data',
-           'download_lightning', 'download_coincidences',
+           'download_multiple_data', 'download_lightning',
+           'download_coincidences',
            'GroundParticlesSimulation', 'MultipleGroundParticlesSimulation',
            'KascadeLdfSimulation', 'NkgLdfSimulation',
            'FlatFrontSimulation', 'ConeFrontSimulation',
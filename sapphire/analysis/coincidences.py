@@ -32,18 +32,26 @@
 """
 from __future__ import print_function
 
-import os.path
+import multiprocessing
+import os
+
+from heapq import heappop, heappush
 
 import numpy as np
 import tables
 
-from progressbar import ETA, Bar, Percentage, ProgressBar
 from six.moves import range
 
 from . import process_events
 from .. import storage
 from ..utils import pbar
 
+#: Data type of the timestamps array which lists each event by its timestamp,
+#: the index of its station and the index into the station's event table.
+TIMESTAMPS_DTYPE = [('ext_timestamp', np.uint64),
+                    ('station_idx', np.uint16),
+                    ('event_idx', np.uint32)]
+
 
 class Coincidences(object):
     """Search for and store coincidences between HiSPARC stations.
@@ -116,7 +124,7 @@ class Coincidences(object):
     """
 
     def __init__(self, data, coincidence_group, station_groups,
-                 overwrite=False, progress=True):
+                 overwrite=False, progress=True, append=False):
         """Initialize the class.
 
         :param data: either a PyTables file or path to a HDF5 file.
@@ -125,6 +133,8 @@ class Coincidences(object):
         :param station_groups: a list of groups containing the station data.
         :param overwrite: if True overwrite a previous coincidences group.
         :param progress: if True show a progressbar while storing coincidences.
+        :param append: if True use a previous coincidences group, such that
+            new coincidences can be appended to it.
 
         """
         if not isinstance(data, tables.File):
@@ -141,18 +151,22 @@ class Coincidences(object):
             if coincidence_group in self.data:
                 if overwrite:
                     self.data.remove_node(coincidence_group, recursive=True)
-                else:
+                elif not append:
                     raise RuntimeError("Group %s already exists in datafile, "
                                        "and overwrite is False" %
                                        coincidence_group)
-            head, tail = os.path.split(coincidence_group)
-            self.coincidence_group = self.data.create_group(head, tail,
-                                                            createparents=True)
+            if coincidence_group in self.data:
+                self.coincidence_group = self.data.get_node(coincidence_group)
+            else:
+                head, tail = os.path.split(coincidence_group)
+                self.coincidence_group = self.data.create_group(
+                    head, tail, createparents=True)
         self.station_groups = station_groups
 
         self.trig_threshold = 0.5
         self.overwrite = overwrite
         self.progress = progress
+        self.append = append
 
     def __enter__(self):
         return self
@@ -182,7 +196,8 @@ class Coincidences(object):
         self.process_events()
         self.store_coincidences()
 
-    def search_coincidences(self, window=10000, shifts=None, limit=None):
+    def search_coincidences(self, window=10000, shifts=None, limit=None,
+                            chunksize=None):
         """Search for coincidences.
 
         Search all data in the station_groups for coincidences, and store
@@ -195,10 +210,10 @@ class Coincidences(object):
         _src_c_index and _src_timestamps.  The former is a list of
         coincidences, which each consist of a list with indexes into the
         timestamps array as a pointer to the events making up the
-        coincidence. The latter is a list of tuples.  Each tuple consists
-        of a timestamp followed by an index into the stations list which
-        designates the detector station which measured the event, and
-        finally an index into that station's event table.
+        coincidence. The latter is an array with a row for each event.
+        Each row consists of a timestamp followed by an index into the
+        stations list which designates the detector station which measured
+        the event, and finally an index into that station's event table.
 
         :param window: the coincidence time window in nanoseconds. All events
             with delta t's smaller than this window will be considered a
@@ -209,11 +224,15 @@ class Coincidences(object):
             Use 'None' for no shift.
         :param limit: optionally limit the search for this number of
             events.
+        :param chunksize: if given, read the event tables in chunks of this
+            number of events instead of all at once.  See
+            :func:`iter_coincidences`.
 
         """
         c_index, timestamps = \
-            self._search_coincidences(window, shifts, limit)
-        timestamps = np.array(timestamps, dtype=np.uint64)
+            self._search_coincidences(window, shifts, limit, chunksize)
+        timestamps = np.column_stack([timestamps[name] for name in
+                                      timestamps.dtype.names]).astype(np.uint64)
         self.data.create_array(self.coincidence_group, '_src_timestamps',
                                timestamps)
         src_c_index = self.data.create_vlarray(self.coincidence_group,
@@ -348,7 +367,8 @@ class Coincidences(object):
         self.observables.flush()
         return event_id
 
-    def _search_coincidences(self, window=10000, shifts=None, limit=None):
+    def _search_coincidences(self, window=10000, shifts=None, limit=None,
+                             chunksize=None, workers=None, slice_length=86400):
         """Search for coincidences
 
         Search for coincidences in a set of PyTables event tables, optionally
@@ -358,20 +378,34 @@ class Coincidences(object):
         occured almost at the same time and thus might be the result of an
         extended air shower.
 
+        If a chunksize is given the event tables are read in chunks and the
+        returned timestamps only contain the events which are part of a
+        coincidence.  The memory usage then no longer depends on the total
+        number of events.
+
         :param window: the time window in nanoseconds which will be searched
             for coincidences.  Events falling outside this window will not be
             part of the coincidence.  Default: 10000 (i.e. 10 us).
         :param shifts: a list of time shifts in seconds, use 'None' for no
             shift.
         :param limit: limit the number of events which are processed.
+        :param chunksize: number of events to read from each table at once,
+            use 'None' to read all events at once.
+        :param workers: number of worker processes which each read and
+            search a time slice of the event tables, use 'None' to search in
+            this process.  Ignored if a chunksize is given.  As with a
+            chunksize, the returned timestamps only contain the events which
+            are part of a coincidence.
+        :param slice_length: length in seconds of the time slices which
+            are searched by the worker processes.
 
         :return: coincidences, timestamps. First a list of coincidences, which
             each consist of a list with indexes into the timestamps array as a
-            pointer to the events making up the coincidence. Then, a list of
-            tuples.  Each tuple consists of a timestamp followed by an index
-            into the stations list which designates the detector
-            station which measured the event, and finally an index into that
-            station's event table.
+            pointer to the events making up the coincidence. Then, a
+            structured array (see :data:`TIMESTAMPS_DTYPE`).  Each row
+            consists of a timestamp followed by an index into the stations
+            list which designates the detector station which measured the
+            event, and finally an index into that station's event table.
 
         """
         # get the 'events' tables from the groups or groupnames
@@ -382,11 +416,62 @@ class Coincidences(object):
                 event_tables.append(self.data.get_node(station_group,
                                                        'events'))
 
+        if chunksize is not None:
+            return self._stream_coincidences(event_tables, window, shifts,
+                                             limit, chunksize)
+        elif workers is not None:
+            return self._collect_coincidences(iter_coincidences_in_slices(
+                event_tables, window, shifts, limit, workers, slice_length))
+
         timestamps = self._retrieve_timestamps(event_tables, shifts, limit)
         coincidences = self._do_search_coincidences(timestamps, window)
 
         return coincidences, timestamps
 
+    def _stream_coincidences(self, event_tables, window, shifts=None,
+                             limit=None, chunksize=100000):
+        """Search for coincidences while reading the event tables in chunks
+
+        Only the events which are part of a coincidence are kept, the
+        indexes in the coincidences point into this reduced timestamps
+        array.  Consecutive coincidences may share events, these are only
+        included once.
+
+        :return: coincidences, timestamps. As :meth:`_search_coincidences`.
+
+        """
+        return self._collect_coincidences(iter_coincidences(
+            event_tables, window, shifts, limit, chunksize))
+
+    def _collect_coincidences(self, generator):
+        """Collect the coincidences yielded by a search generator
+
+        :param generator: generator yielding (index, events) tuples, see
+            :func:`iter_coincidences`.
+        :return: coincidences, timestamps. As :meth:`_search_coincidences`.
+
+        """
+        coincidences = []
+        timestamps = []
+        n_timestamps = 0
+        # index in the merged events of the last stored event
+        last_stored = -1
+
+        for start, events in pbar(generator, show=self.progress):
+            n_shared = max(last_stored + 1 - start, 0)
+            first = n_timestamps - n_shared
+            coincidences.append(list(range(first, first + len(events))))
+            timestamps.append(events[n_shared:].copy())
+            n_timestamps += len(events) - n_shared
+            last_stored = start + len(events) - 1
+
+        if timestamps:
+            timestamps = np.concatenate(timestamps)
+        else:
+            timestamps = np.empty(0, dtype=TIMESTAMPS_DTYPE)
+
+        return coincidences, timestamps
+
     def _retrieve_timestamps(self, event_tables, shifts=None, limit=None):
         """Retrieve all timestamps from all stations, optionally shifting them
 
@@ -401,38 +486,30 @@ class Coincidences(object):
             shift.
         :param limit: limit the number of events which are processed.
 
-        :return: list of tuples.  Each tuple consists of a timestamp followed
-            by an index into the stations list which designates the detector
-            station which measured the event, and finally an index of the
-            event into the station's event table.
+        :return: structured array (see :data:`TIMESTAMPS_DTYPE`).  Each row
+            consists of a timestamp followed by an index into the stations
+            list which designates the detector station which measured the
+            event, and finally an index of the event into the station's event
+            table.
 
         """
-        # calculate the shifts in nanoseconds and cast them to int.
-        # (prevent upcasting timestamps to float64 further on)
-        if shifts is not None:
-            shifts = [int(shift * 1e9) if shift is not None else shift
-                      for shift in shifts]
+        shifts = _shifts_in_nanoseconds(shifts, len(event_tables))
 
-        timestamps = []
+        station_timestamps = []
         for s_id, event_table in enumerate(event_tables):
-            ts = [(x, s_id, j) for j, x in
-                  enumerate(event_table.col('ext_timestamp')[:limit])]
-            try:
-                # shift data. carefully avoid upcasting (we're adding two
-                # ints, which is an int, and casting that back to uint64. if
-                # we're not careful, an intermediate value will be a float64,
-                # which doesn't hold the precision to store nanoseconds.
-                ts = [(np.uint64(int(x) + shifts[i]), i, j)
-                      for x, i, j in ts]
-            except (TypeError, IndexError):
-                # shift is None or doesn't exist
-                pass
-            timestamps.extend(ts)
-
-        # sort the timestamps
-        timestamps.sort()
-
-        return timestamps
+            ext_timestamps = event_table.col('ext_timestamp')[:limit]
+            station_timestamps.append(
+                _station_timestamps(ext_timestamps, s_id, shifts[s_id]))
+
+        if not station_timestamps:
+            return np.empty(0, dtype=TIMESTAMPS_DTYPE)
+        timestamps = np.concatenate(station_timestamps)
+
+        # sort the timestamps. The sort is stable, so events with equal
+        # timestamps remain ordered by station index and event index.
+        order = np.argsort(timestamps['ext_timestamp'], kind='mergesort')
+
+        return timestamps[order]
 
     def _do_search_coincidences(self, timestamps, window):
         """Search for coincidences in a set of timestamps
@@ -441,8 +518,9 @@ class Coincidences(object):
         for events which occured almost at the same time and thus might be the
         result of an extended air shower.
 
-        :param timestamps: a list of tuples (timestamp, station_idx,
-            event_idx) which will be searched
+        :param timestamps: a structured array with (timestamp, station_idx,
+            event_idx) rows which will be searched, as returned by
+            :meth:`_retrieve_timestamps`.
         :param window: the time window in nanoseconds which will be searched
             for coincidences.  Events falling outside this window will not be
             part of the coincidence.
@@ -452,47 +530,10 @@ class Coincidences(object):
             making up the coincidence
 
         """
-        coincidences = []
-
-        # traverse all timestamps
-        prev_coincidence = []
-
-        if self.progress and len(timestamps):
-            pbar = ProgressBar(max_value=len(timestamps),
-                               widgets=[Percentage(), Bar(), ETA()]).start()
-
-        for i in range(len(timestamps)):
-
-            # build coincidence, starting with the current timestamp
-            c = [i]
-            t0 = timestamps[i][0]
-
-            # traverse the rest of the timestamps
-            for j in range(i + 1, len(timestamps)):
-                # if a timestamp is within the coincidence window, add it
-                if timestamps[j][0] - t0 < window:
-                    c.append(j)
-                else:
-                    # coincidence window has passed, break for-loop
-                    break
-
-            # if we have more than one event in the coincidence, save it
-            if len(c) > 1:
-                # is this coincidence part of the previous coincidence?
-                is_part_of_prev = np.array([u in prev_coincidence
-                                            for u in c]).all()
-                if not is_part_of_prev:
-                    # no, so it's a new one
-                    coincidences.append(c)
-                    prev_coincidence = c
+        starts, stops = coincidence_windows(timestamps['ext_timestamp'],
+                                            window)
 
-            if self.progress and not i % 5000:
-                pbar.update(i)
-
-        if self.progress and len(timestamps):
-            pbar.finish()
-
-        return coincidences
+        return [list(range(start, stop)) for start, stop in zip(starts, stops)]
 
     def __repr__(self):
         if not self.data.isopen:
@@ -578,20 +619,36 @@ class CoincidencesESD(Coincidences):
     Coincidences stored by this class can easily be searched by using
     a :class:`~sapphire.analysis.coincidence_queries.CoincidenceQuery` object.
 
+    When new events have been added to the station groups, for instance by
+    downloading the next day, the new coincidences can be appended to the
+    existing coincidences group::
+
+        >>> with CoincidencesESD('data.h5', '/coincidences', groups,
+        ...                      append=True) as coin:
+        ...     coin.search_and_append_coincidences(station_numbers=[501, 503])
+
     """
 
     def search_and_store_coincidences(self, window=10000,
-                                      station_numbers=None):
+                                      station_numbers=None, workers=None,
+                                      slice_length=86400):
         """Search and store coincidences.
 
         This is a semi-automatic method to search for coincidences
         and then store the results in the coincidences group.
 
+        :param workers: optionally search in parallel using this number
+            of worker processes, each searching a time slice of the data.
+        :param slice_length: length of the time slices in seconds,
+            default is one day.
+
         """
-        self.search_coincidences(window=window)
+        self.search_coincidences(window=window, workers=workers,
+                                 slice_length=slice_length)
         self.store_coincidences(station_numbers=station_numbers)
 
-    def search_coincidences(self, window=10000, shifts=None, limit=None):
+    def search_coincidences(self, window=10000, shifts=None, limit=None,
+                            chunksize=None, workers=None, slice_length=86400):
         """Search for coincidences.
 
         Search all data in the station_groups for coincidences, and store
@@ -604,10 +661,11 @@ class CoincidencesESD(Coincidences):
         attributes ``_src_c_index`` and ``_src_timestamps``.  The
         former is a list of coincidences, which each consist of a list with
         indexes into the timestamps array as a pointer to the events making up
-        the coincidence. The latter is a list of tuples.  Each tuple consists
-        of a timestamp followed by an index into the stations list which
-        designates the detector station which measured the event, and finally
-        an index into that station's event table.
+        the coincidence. The latter is a structured array (see
+        :data:`TIMESTAMPS_DTYPE`).  Each row consists of a timestamp followed
+        by an index into the stations list which designates the detector
+        station which measured the event, and finally an index into that
+        station's event table.
 
         :param window: the coincidence time window.  All events with delta
             t's smaller than this window will be considered a coincidence.
@@ -616,12 +674,143 @@ class CoincidencesESD(Coincidences):
             Expects a list of shifts, one for each station.
         :param limit: optionally limit the search for this number of
             events.
+        :param chunksize: if given, read the event tables in chunks of this
+            number of events instead of all at once.  Only the events which
+            are part of a coincidence are then kept in ``_src_timestamps``.
+        :param workers: optionally search in parallel using this number of
+            worker processes, each searching a time slice of the data.
+        :param slice_length: length of the time slices in seconds.
+
+        """
+        c_index, timestamps = self._search_coincidences(
+            window, shifts, limit, chunksize, workers, slice_length)
+        self._src_timestamps = timestamps
+        self._src_c_index = c_index
+
+    def search_and_append_coincidences(self, window=10000,
+                                       station_numbers=None):
+        """Search for new coincidences and append them to the stored ones.
+
+        Only events starting at the last stored coincidence are searched,
+        which makes this suitable for adding coincidences after new events
+        have been appended to the station event tables, e.g. when updating
+        the data daily.  Use the ``append`` option when initializing the
+        class to allow using an existing coincidences group.  If the group
+        does not yet contain coincidences this is identical to
+        :meth:`search_and_store_coincidences`.
+
+        The station groups and station numbers should be the same as those
+        used when storing the previous coincidences.  The events in the
+        tables should be sorted by timestamp, this is the case for events
+        downloaded from the ESD.
+
+        The search is restarted at the first event of the last stored
+        coincidence, which is replaced by the new results.  Events which
+        were added later but are within the coincidence window of its
+        first event are thereby added to it.
+
+        :param window: the coincidence time window in nanoseconds.
+        :param station_numbers: optional list of station_numbers, as
+            used for :meth:`store_coincidences`.
 
         """
-        c_index, timestamps = self._search_coincidences(window, shifts, limit)
+        if 'coincidences' not in self.coincidence_group:
+            self.search_and_store_coincidences(window=window,
+                                               station_numbers=station_numbers)
+            return
+
+        self.search_new_coincidences(window=window)
+        self.append_coincidences(station_numbers=station_numbers)
+
+    def search_new_coincidences(self, window=10000):
+        """Search for coincidences which are not yet stored.
+
+        Like :meth:`search_coincidences`, but the search starts at the
+        first event of the last stored coincidence, such that only that
+        coincidence window needs to be searched again.  The first result
+        then replaces the last stored coincidence when appending, since
+        it may contain new events.
+
+        :param window: the coincidence time window in nanoseconds.
+
+        """
+        s_index = [path.decode('utf-8')
+                   for path in self.coincidence_group.s_index.read()]
+        if s_index != list(self.station_groups):
+            raise RuntimeError("The station groups are not the same as those "
+                               "of the stored coincidences.")
+
+        coincidences = self.coincidence_group.coincidences
+        if len(coincidences):
+            last_timestamp = coincidences.col('ext_timestamp')[-1]
+        else:
+            last_timestamp = None
+
+        station_timestamps = []
+        for s_id, station_group in enumerate(self.station_groups):
+            event_table = self.data.get_node(station_group, 'events')
+            if last_timestamp is None:
+                start = 0
+            else:
+                start = _first_event_at_or_after(event_table, last_timestamp)
+            ext_timestamps = event_table.read(start, field='ext_timestamp')
+            station_timestamps.append(
+                _station_timestamps(ext_timestamps, s_id, event_offset=start))
+        timestamps = np.concatenate(station_timestamps)
+        timestamps = timestamps[np.argsort(timestamps['ext_timestamp'],
+                                           kind='mergesort')]
+
+        c_index = self._do_search_coincidences(timestamps, window)
+
         self._src_timestamps = timestamps
         self._src_c_index = c_index
 
+    def append_coincidences(self, station_numbers=None):
+        """Append the previously found coincidences to the stored ones.
+
+        The ids of the new coincidences continue from the stored ones and
+        the references to their events are appended to ``c_index``.  If
+        the first found coincidence starts with the same event as the last
+        stored coincidence, it replaces that coincidence.
+
+        :param station_numbers: optional list of station_numbers, these
+            should be the same as those used to store the coincidences.
+
+        """
+        self.coincidences = self.coincidence_group.coincidences
+        if station_numbers is not None:
+            if len(station_numbers) != len(self.station_groups):
+                raise RuntimeError(
+                    "Number of station numbers must equal number of groups.")
+            s_columns = ['s%d' % number for number in station_numbers]
+        else:
+            s_columns = ['s%d' % n for n, _ in enumerate(self.station_groups)]
+        if not set(s_columns).issubset(self.coincidences.colnames):
+            raise RuntimeError("The station numbers are not the same as those "
+                               "of the stored coincidences.")
+        self.station_numbers = station_numbers
+
+        c_index = self.coincidence_group.c_index
+        if len(self._src_c_index) and len(c_index):
+            event = self._src_timestamps[self._src_c_index[0][0]]
+            first_event = (event['station_idx'], event['event_idx'])
+            if tuple(c_index[-1][0]) == first_event:
+                # the search was restarted at the last stored coincidence
+                self.coincidences.remove_rows(len(self.coincidences) - 1)
+                c_index.truncate(len(c_index) - 1)
+                # rows appended to the truncated node object are lost
+                c_index.close()
+                c_index = self.coincidence_group.c_index
+
+        self.c_index = []
+
+        for coincidence in pbar(self._src_c_index, show=self.progress):
+            self._store_coincidence(coincidence)
+
+        for observables_idx in pbar(self.c_index, show=self.progress):
+            c_index.append(observables_idx)
+        c_index.flush()
+
     def store_coincidences(self, station_numbers=None):
         """Store the previously found coincidences.
 
@@ -713,6 +902,406 @@ class CoincidencesESD(Coincidences):
         self.coincidences.flush()
 
 
+def coincidence_windows(ext_timestamps, window):
+    """Search for coincidences in a sorted array of timestamps
+
+    Each event starts a candidate coincidence containing all following
+    events within the coincidence window.  The end of each window is
+    found using a binary search on the sorted timestamps.  Candidates
+    consisting of a single event are dropped, as are candidates which
+    are fully contained in the previous coincidence.  Since the windows
+    are contiguous ranges of indexes, a candidate is contained in the
+    previous one exactly when they share the same end.
+
+    :param ext_timestamps: sorted array of timestamps in nanoseconds.
+    :param window: the time window in nanoseconds which will be searched
+        for coincidences.  Events falling outside this window will not be
+        part of the coincidence.
+
+    :return: two arrays with the start and (exclusive) stop index of each
+        coincidence into the timestamps array.
+
+    """
+    ext_timestamps = np.asarray(ext_timestamps, dtype=np.uint64)
+    window = np.uint64(np.ceil(window))
+
+    starts = np.arange(len(ext_timestamps))
+    stops = np.searchsorted(ext_timestamps, ext_timestamps + window,
+                            side='left')
+
+    # only windows with more than one event are coincidences
+    candidates = (stops - starts) > 1
+    starts = starts[candidates]
+    stops = stops[candidates]
+
+    # stops never decrease, a coincidence with the same stop as the
+    # previous one is part of that previous coincidence
+    is_new = np.ones(len(stops), dtype=bool)
+    is_new[1:] = stops[1:] != stops[:-1]
+
+    return starts[is_new], stops[is_new]
+
+
+def iter_coincidences(event_tables, window, shifts=None, limit=None,
+                      chunksize=100000):
+    """Search for coincidences while reading the event tables in chunks
+
+    The events of each table are read in chunks, which are merged in time
+    order.  A heap keeps track of the station whose loaded events end
+    earliest, all events before that timestamp are complete and can be
+    searched for coincidences.  Events within one coincidence window of
+    the end are carried over to the next search, such that coincidences
+    spanning the chunk boundaries are found.  The memory usage depends on
+    the chunksize and the number of events in a coincidence window, not on
+    the size of the tables.
+
+    The results are identical to those of
+    :meth:`Coincidences._search_coincidences` without chunks.
+
+    :param event_tables: a list of HiSPARC event tables, usually from
+        different stations.  The events in each table should be sorted by
+        timestamp.
+    :param window: the time window in nanoseconds which will be searched
+        for coincidences.
+    :param shifts: a list of time shifts in seconds, use 'None' for no
+        shift.
+    :param limit: limit the number of events which are processed.
+    :param chunksize: number of events to read from a table at once.
+
+    :return: generator which yields a (index, events) tuple for each
+        coincidence.  The index is the position of the first event in the
+        time ordered events of all tables, the events are a structured
+        array (see :data:`TIMESTAMPS_DTYPE`).
+
+    """
+    window = np.uint64(np.ceil(window))
+    shifts = _shifts_in_nanoseconds(shifts, len(event_tables))
+    readers = [_read_station_timestamps(event_table, s_id, shifts[s_id],
+                                        limit, chunksize)
+               for s_id, event_table in enumerate(event_tables)]
+
+    # (last loaded timestamp, station index) for stations with more events
+    heap = []
+    pending = []
+    for s_id, reader in enumerate(readers):
+        pending.append(np.empty(0, dtype=TIMESTAMPS_DTYPE))
+        _load_next_chunk(reader, s_id, pending, heap)
+
+    buffer = np.empty(0, dtype=TIMESTAMPS_DTYPE)
+    # index of the first buffered event in the merged events
+    offset = 0
+    # stop index of the previous coincidence in the merged events
+    last_stop = -1
+
+    while True:
+        if heap:
+            horizon = heap[0][0]
+        else:
+            horizon = None
+
+        # all events before the horizon are loaded
+        safe_events = []
+        for s_id in range(len(pending)):
+            if horizon is None:
+                n = len(pending[s_id])
+            else:
+                n = np.searchsorted(pending[s_id]['ext_timestamp'], horizon,
+                                    side='left')
+            safe_events.append(pending[s_id][:n])
+            pending[s_id] = pending[s_id][n:]
+        safe_events = np.concatenate(safe_events)
+        order = np.argsort(safe_events['ext_timestamp'], kind='mergesort')
+        buffer = np.concatenate([buffer, safe_events[order]])
+        ext_timestamps = buffer['ext_timestamp']
+
+        # coincidences starting before this index are complete
+        if horizon is None:
+            n_complete = len(buffer)
+        elif horizon < window:
+            n_complete = 0
+        else:
+            n_complete = np.searchsorted(ext_timestamps, horizon - window,
+                                         side='right')
+
+        starts, stops = coincidence_windows(ext_timestamps, window)
+        is_complete = starts < n_complete
+        starts = starts[is_complete]
+        stops = stops[is_complete]
+        for start, stop in zip(starts, stops):
+            if offset + stop == last_stop:
+                # part of the previous coincidence
+                continue
+            yield offset + start, buffer[start:stop].copy()
+        if len(stops):
+            last_stop = offset + stops[-1]
+
+        buffer = buffer[n_complete:]
+        offset += n_complete
+
+        if horizon is None:
+            break
+        _, s_id = heappop(heap)
+        _load_next_chunk(readers[s_id], s_id, pending, heap)
+
+
+def iter_coincidences_in_slices(event_tables, window, shifts=None,
+                                limit=None, workers=None, slice_length=86400):
+    """Search for coincidences in time slices using a pool of processes
+
+    The time spanned by the events is split into slices of equal length,
+    by default one day starting at midnight.  Each worker process opens the
+    data file, reads the events of all tables in its slice and in the
+    first coincidence window after it, and searches them for coincidences.
+    Only the coincidences starting in the slice, and the events which are
+    part of these, are sent back.  A coincidence at the start of a slice
+    which is part of the last coincidence of the previous slice is
+    skipped.
+
+    The event tables should be stored in a file on disk and be sorted by
+    timestamp.  The file is flushed, but it should not be modified while
+    the workers read it.  The results are identical to those of
+    :func:`iter_coincidences`.
+
+    :param event_tables: a list of HiSPARC event tables, usually from
+        different stations, all in the same file.
+    :param window: the time window in nanoseconds which will be searched
+        for coincidences.
+    :param shifts: a list of time shifts in seconds, use 'None' for no
+        shift.
+    :param limit: limit the number of events which are processed.
+    :param workers: number of worker processes.
+    :param slice_length: length of the time slices in seconds.
+
+    :return: generator which yields a (index, events) tuple for each
+        coincidence, see :func:`iter_coincidences`.
+
+    """
+    window = int(np.ceil(window))
+    shifts = _shifts_in_nanoseconds(shifts, len(event_tables))
+    slice_length = int(slice_length * 1e9)
+
+    # time spanned by the (shifted) events
+    first_timestamps = []
+    last_timestamps = []
+    for event_table, shift in zip(event_tables, shifts):
+        n_events = event_table.nrows
+        if limit is not None:
+            n_events = min(n_events, limit)
+        if n_events:
+            first_timestamps.append(
+                int(event_table[0]['ext_timestamp']) + (shift or 0))
+            last_timestamps.append(
+                int(event_table[n_events - 1]['ext_timestamp']) + (shift or 0))
+    if not first_timestamps:
+        return
+
+    event_tables[0]._v_file.flush()
+    path = event_tables[0]._v_file.filename
+    table_paths = [event_table._v_pathname for event_table in event_tables]
+    first = min(first_timestamps)
+    first -= first % slice_length
+    tasks = [(path, table_paths, window, shifts, limit, slice_start,
+              slice_start + slice_length)
+             for slice_start in range(first, max(last_timestamps) + 1,
+                                      slice_length)]
+
+    pool = _reading_pool(workers)
+    try:
+        # stop index of the previous coincidence in the merged events
+        last_stop = -1
+        for offset, starts, stops, positions, events in pool.imap(
+                _search_time_slice, tasks):
+            for start, stop, position in zip(starts, stops, positions):
+                if offset + stop == last_stop:
+                    # part of the last coincidence of the previous slice
+                    continue
+                yield (offset + start,
+                       events[position:position + stop - start].copy())
+            if len(stops):
+                last_stop = offset + stops[-1]
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _reading_pool(workers):
+    """Create a pool of processes which can read the open data file
+
+    New processes are started instead of forked, such that they do not
+    share the open file of this process.  The file is opened for writing
+    by this process, HDF5 file locking is disabled in the workers to be
+    able to open it for reading.
+
+    """
+    file_locking = os.environ.get('HDF5_USE_FILE_LOCKING')
+    os.environ['HDF5_USE_FILE_LOCKING'] = 'FALSE'
+    try:
+        return multiprocessing.get_context('spawn').Pool(workers)
+    finally:
+        if file_locking is None:
+            del os.environ['HDF5_USE_FILE_LOCKING']
+        else:
+            os.environ['HDF5_USE_FILE_LOCKING'] = file_locking
+
+
+# Data files opened by a worker process of iter_coincidences_in_slices
+_worker_files = {}
+
+
+def _search_time_slice(args):
+    """Read and search a time slice for coincidences in a worker process
+
+    :return: index of the first event of the slice in the merged events,
+        the start and stop indexes of the coincidences starting in the
+        slice relative to that index, the position of their first event in
+        the returned events, and the events which are part of these
+        coincidences.
+
+    """
+    path, table_paths, window, shifts, limit, slice_start, slice_end = args
+
+    # the file is opened once by each worker, for all its slices
+    if path not in _worker_files:
+        _worker_files[path] = tables.open_file(path, 'r')
+    data = _worker_files[path]
+
+    offset = 0
+    station_timestamps = []
+    for s_id, table_path in enumerate(table_paths):
+        event_table = data.get_node(table_path)
+        shift = shifts[s_id] or 0
+        n_events = event_table.nrows
+        if limit is not None:
+            n_events = min(n_events, limit)
+        start, stop = [
+            min(_first_event_at_or_after(
+                event_table, np.uint64(max(timestamp - shift, 0))), n_events)
+            for timestamp in (slice_start, slice_end + window)]
+        ext_timestamps = event_table.read(start, stop, field='ext_timestamp')
+        if (ext_timestamps[1:] < ext_timestamps[:-1]).any():
+            raise RuntimeError("Events in table %s are not sorted by "
+                               "timestamp" % table_path)
+        station_timestamps.append(
+            _station_timestamps(ext_timestamps, s_id, shifts[s_id],
+                                event_offset=start))
+        offset += start
+
+    timestamps = np.concatenate(station_timestamps)
+    order = np.argsort(timestamps['ext_timestamp'], kind='mergesort')
+    timestamps = timestamps[order]
+    ext_timestamps = timestamps['ext_timestamp']
+
+    starts, stops = coincidence_windows(ext_timestamps, window)
+    in_slice = starts < np.searchsorted(ext_timestamps, np.uint64(slice_end),
+                                        side='left')
+    starts = starts[in_slice]
+    stops = stops[in_slice]
+
+    # only send back the events which are part of a coincidence
+    n_coincidences = np.zeros(len(timestamps) + 1, dtype=np.int64)
+    np.add.at(n_coincidences, starts, 1)
+    np.add.at(n_coincidences, stops, -1)
+    is_used = np.cumsum(n_coincidences[:-1]) > 0
+    positions = np.cumsum(is_used) - 1
+
+    return offset, starts, stops, positions[starts], timestamps[is_used]
+
+
+def _load_next_chunk(reader, s_id, pending, heap):
+    """Append the next chunk of a station to its pending events"""
+
+    chunk = next(reader, None)
+    if chunk is not None:
+        pending[s_id] = np.concatenate([pending[s_id], chunk])
+        heappush(heap, (chunk['ext_timestamp'][-1], s_id))
+
+
+def _read_station_timestamps(event_table, s_id, shift, limit, chunksize):
+    """Read the timestamps of an event table in chunks
+
+    :return: generator yielding non-empty structured arrays (see
+        :data:`TIMESTAMPS_DTYPE`) of consecutive events.
+
+    """
+    n_events = event_table.nrows
+    if limit is not None:
+        n_events = min(n_events, limit)
+
+    previous = None
+    for start in range(0, n_events, chunksize):
+        stop = min(start + chunksize, n_events)
+        ext_timestamps = event_table.read(start, stop, field='ext_timestamp')
+        timestamps = _station_timestamps(ext_timestamps, s_id, shift,
+                                         event_offset=start)
+        ext_timestamps = timestamps['ext_timestamp']
+        if previous is not None and ext_timestamps[0] < previous:
+            is_unsorted = True
+        else:
+            is_unsorted = (ext_timestamps[1:] < ext_timestamps[:-1]).any()
+        if is_unsorted:
+            raise RuntimeError("Events in table %s are not sorted by "
+                               "timestamp" % event_table._v_pathname)
+        previous = ext_timestamps[-1]
+        yield timestamps
+
+
+def _first_event_at_or_after(event_table, ext_timestamp):
+    """Find the index of the first event at or after a timestamp
+
+    Performs a binary search on the timestamps in the table, only
+    reading the rows which are needed.  The events should be sorted by
+    timestamp.
+
+    """
+    low, high = 0, event_table.nrows
+    while low < high:
+        middle = (low + high) // 2
+        if event_table[middle]['ext_timestamp'] < ext_timestamp:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def _shifts_in_nanoseconds(shifts, n_stations):
+    """Get a time shift in nanoseconds for each station
+
+    Shifts are cast to int to prevent upcasting timestamps to float64
+    further on.  Stations without a shift get 'None'.
+
+    """
+    if shifts is None:
+        shifts = []
+    shifts = [int(shift * 1e9) if shift is not None else shift
+              for shift in shifts]
+    return (shifts + [None] * n_stations)[:n_stations]
+
+
+def _station_timestamps(ext_timestamps, s_id, shift=None, event_offset=0):
+    """Build the timestamps array for events of one station
+
+    :param ext_timestamps: timestamps of the events in nanoseconds.
+    :param s_id: index of the station.
+    :param shift: time shift in nanoseconds, use 'None' for no shift.
+    :param event_offset: index of the first event in the event table.
+    :return: structured array (see :data:`TIMESTAMPS_DTYPE`).
+
+    """
+    ext_timestamps = np.asarray(ext_timestamps, dtype=np.uint64)
+    timestamps = np.empty(len(ext_timestamps), dtype=TIMESTAMPS_DTYPE)
+    timestamps['station_idx'] = s_id
+    timestamps['event_idx'] = np.arange(event_offset,
+                                        event_offset + len(ext_timestamps))
+    if shift is not None:
+        # shift data. carefully avoid upcasting to float64, which
+        # doesn't hold the precision to store nanoseconds.
+        shifted = ext_timestamps.astype(np.int64) + np.int64(shift)
+        timestamps['ext_timestamp'] = shifted
+    else:
+        timestamps['ext_timestamp'] = ext_timestamps
+    return timestamps
+
+
 def get_events(data, stations, coincidence, timestamps, get_raw_traces=False):
     """Get event data of a coincidence
 
@@ -16,11 +16,9 @@
 
 """
 
-import warnings
-
 from itertools import combinations
 
-from numpy import array, cos, isnan, mean, nan, sqrt
+from numpy import arange, array, cos, errstate, isnan, mean, meshgrid, nan, nanargmin, newaxis, sqrt
 from six.moves import zip_longest
 
 from ..simulations import ldf
@@ -450,12 +448,20 @@ class AverageIntersectionAlgorithm(BaseCoreAlgorithm):
 
 class EllipsLdfAlgorithm(BaseCoreAlgorithm):
 
-    """Simple core estimator
+    """Core estimator using the elliptic LDF
 
-    Estimates the core by center of mass of the measurements.
+    Finds the core position for which the elliptic LDF best fits the
+    measurements, by searching grids of core positions from coarse to fine.
 
     """
 
+    #: number of grid points along each axis of the search grid
+    GRID_POINTS = 41
+    #: grid sizes in m, the first is used around the initial estimates
+    GRID_SIZES = (5., 2., 1., .5)
+    #: stop refining the grid once the chi square improves less than this
+    CHI2_TOLERANCE = 1e-3
+
     @classmethod
     def reconstruct_common(cls, p, x, y, z=None, initial=None):
         """Reconstruct core position
@@ -478,89 +484,82 @@ class EllipsLdfAlgorithm(BaseCoreAlgorithm):
     def reconstruct(cls, p, x, y, theta, phi):
         """Reconstruct the number of electrons that fits best.
 
+        A coarse grid is searched around the center of mass and around the
+        average intersection.  The grid is then refined around the best
+        position, until the chi square no longer improves.
+
         :param p: detector particle density in m^-2.
         :param x,y: positions of detectors in m.
         :param theta,phi: zenith and azimuth angle in rad.
         :return: reconstructed core position, chi square, and shower size.
 
         """
-        xcmass, ycmass = CenterMassAlgorithm.reconstruct_common(p, x, y)
-        chi2best = 10 ** 99
-        xbest = xcmass
-        ybest = ycmass
-        factorbest = 1.
-        gridsize = 5.
-        xbest1, ybest1, chi2best1, factorbest1 = cls.selectbest(
-            p, x, y, xbest, ybest, factorbest, chi2best, gridsize, theta, phi)
+        gridsize = cls.GRID_SIZES[0]
+        starts = [CenterMassAlgorithm.reconstruct_common(p, x, y),
+                  AverageIntersectionAlgorithm.reconstruct_common(p, x, y)]
 
-        xlines, ylines = AverageIntersectionAlgorithm.reconstruct_common(p, x,
-                                                                         y)
+        xbest, ybest = starts[0]
         chi2best = 10 ** 99
-        xbest = xcmass
-        ybest = ycmass
         factorbest = 1.
-        xbest2, ybest2, chi2best2, factorbest2 = cls.selectbest(
-            p, x, y, xbest, ybest, factorbest, chi2best, gridsize, theta, phi)
-
-        if chi2best1 < chi2best2:
-            chi2best = chi2best1
-            xbest = xbest1
-            ybest = ybest1
-            factorbest = factorbest1
-        else:
-            chi2best = chi2best2
-            xbest = xbest2
-            ybest = ybest2
-            factorbest = factorbest2
-
-        gridsize = 2.
-        core_x, core_y, chi2best, factorbest = cls.selectbest(
-            p, x, y, xbest, ybest, factorbest, chi2best, gridsize, theta, phi)
+        for xstart, ystart in starts:
+            xbest, ybest, chi2best, factorbest = cls.selectbest(
+                p, x, y, xstart, ystart, factorbest, chi2best, gridsize,
+                theta, phi, xbest, ybest)
+
+        for gridsize in cls.GRID_SIZES[1:]:
+            chi2previous = chi2best
+            xbest, ybest, chi2best, factorbest = cls.selectbest(
+                p, x, y, xbest, ybest, factorbest, chi2best, gridsize,
+                theta, phi)
+            if chi2previous - chi2best < cls.CHI2_TOLERANCE:
+                break
 
         size = factorbest * ldf.EllipsLdf._n_electrons
 
-        return core_x, core_y, chi2best, size
+        return xbest, ybest, chi2best, size
 
-    @staticmethod
-    def selectbest(p, x, y, xstart, ystart, factorbest, chi2best, gridsize,
-                   theta, phi):
+    @classmethod
+    def selectbest(cls, p, x, y, xstart, ystart, factorbest, chi2best,
+                   gridsize, theta, phi, xbest=None, ybest=None):
         """selects the best core position in grid around (xstart, ystart).
 
+        The chi square is calculated for all grid positions at once.
+
         :param p: detector particle density in m^-2.
         :param x,y: positions of detectors in m.
-        :param xcmass,ycmass: start position of core in m.
+        :param xstart,ystart: center of the grid in m.
+        :param factorbest,chi2best: size factor and chi square of the best
+            position so far.
+        :param gridsize: distance between grid points in m.
+        :param theta,phi: zenith and azimuth angle in rad.
+        :param xbest,ybest: best position so far, defaults to the start.
+        :return: best core position, chi square and size factor.
 
         """
-        xbest = xstart
-        ybest = ystart
+        if xbest is None or ybest is None:
+            xbest, ybest = xstart, ystart
+
+        steps = (arange(cls.GRID_POINTS) - cls.GRID_POINTS // 2) * gridsize
+        xtry, ytry = meshgrid(xstart + steps, ystart + steps, indexing='ij')
+        xtry = xtry.ravel()[:, newaxis]
+        ytry = ytry.ravel()[:, newaxis]
+        p = array(p, dtype=float)
 
         a = ldf.EllipsLdf(zenith=theta, azimuth=phi)
-        for i in range(41):
-            xtry = xstart + (i - 20) * gridsize
-            for j in range(11):
-                ytry = ystart + (i - 20) * gridsize
-                xstations = array(x)
-                ystations = array(y)
-                r, angle = a.calculate_core_distance_and_angle(
-                    xstations, ystations, xtry, ytry)
-                rho = a.calculate_ldf_value(r, angle)
-
-                mmdivk = 0.
-                m = 0.
-                k = 0.
-
-                for i, j in zip(p, rho):
-                    mmdivk += 1. * i * i / j
-                    m += i
-                    k += j
-
-                sizefactor = sqrt(mmdivk / k)
-                with warnings.catch_warnings(record=True):
-                    chi2 = 2. * (sizefactor * k - m)
-                if chi2 < chi2best:
-                    factorbest = sizefactor
-                    xbest = xtry
-                    ybest = ytry
-                    chi2best = chi2
+        r, angle = a.calculate_core_distance_and_angle(array(x), array(y),
+                                                       xtry, ytry)
+        with errstate(divide='ignore', invalid='ignore'):
+            rho = a.calculate_ldf_value(r, angle)
+            k = rho.sum(axis=1)
+            sizefactor = sqrt((p * p / rho).sum(axis=1) / k)
+            chi2 = 2. * (sizefactor * k - p.sum())
+
+        if not isnan(chi2).all():
+            best = nanargmin(chi2)
+            if chi2[best] < chi2best:
+                xbest = xtry[best, 0]
+                ybest = ytry[best, 0]
+                chi2best = chi2[best]
+                factorbest = sizefactor[best]
 
         return xbest, ybest, chi2best, factorbest
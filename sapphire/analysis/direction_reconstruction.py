@@ -19,8 +19,9 @@ import warnings
 
 from itertools import combinations
 
-from numpy import (arccos, arcsin, arctan2, array, cos, cross, dot, inf, isnan, nan, pi, sin, sqrt, sum, tan,
-                   where, zeros)
+from numpy import (arange, arccos, arcsin, arctan2, argsort, array, array_equal, asarray, broadcast_arrays,
+                   broadcast_to, cos, cross, dot, errstate, fmax, full, inf, isin, isnan, ix_, minimum, nan,
+                   newaxis, ones, pi, sin, sqrt, stack, sum, take_along_axis, tan, where, zeros)
 from scipy.optimize import minimize
 from scipy.sparse.csgraph import shortest_path
 from six import itervalues
@@ -29,7 +30,9 @@ from six.moves import zip_longest
 from . import event_utils
 from ..api import Station
 from ..simulations.showerfront import CorsikaStationFront
-from ..utils import c, floor_in_base, make_relative, memoize, norm_angle, pbar, vector_length
+from ..transformations.clock import datetime_to_gps
+from ..utils import (ERR, c, floor_in_base, get_active_indices, make_relative, memoize, norm_angle, pbar,
+                     vector_length)
 
 NO_OFFSET = [0., 0., 0., 0.]
 NO_STATION_OFFSET = (0., 100.)
@@ -93,7 +96,7 @@ class EventDirectionReconstruction(object):
         return theta, phi, ids
 
     def reconstruct_events(self, events, detector_ids=None, offsets=NO_OFFSET,
-                           progress=True, initials=None):
+                           progress=True, initials=None, batch=False):
         """Reconstruct events
 
         :param events: the events table for the station from an ESD data file.
@@ -103,11 +106,18 @@ class EventDirectionReconstruction(object):
         :param progress: if True show a progress bar while reconstructing.
         :param initials: list of dictionaries with already reconstructed shower
                          parameters.
+        :param batch: if True, and the ``direct`` algorithm has a
+            ``reconstruct_batch`` method, the events are reconstructed in
+            batches of events with the same number of detections.  The
+            events should then be a table or structured array.
         :return: list of theta, phi, and detector ids.
 
         """
         if initials is None:
             initials = []
+        if batch and hasattr(self.direct, 'reconstruct_batch'):
+            return self._reconstruct_events_batch(events, detector_ids,
+                                                  offsets, progress, initials)
         events = pbar(events, show=progress)
         events_init = zip_longest(events, initials)
         angles = [self.reconstruct_event(event, detector_ids, offsets, initial)
@@ -118,6 +128,78 @@ class EventDirectionReconstruction(object):
             theta, phi, ids = ((), (), ())
         return theta, phi, ids
 
+    def _reconstruct_events_batch(self, events, detector_ids=None,
+                                  offsets=NO_OFFSET, progress=True,
+                                  initials=None):
+        """Reconstruct events from a table or array of events
+
+        Events with three detections are reconstructed at once using the
+        ``reconstruct_batch`` method of the ``direct`` algorithm.  Events
+        with more detections are reconstructed using the ``fit`` algorithm,
+        at once for each number of detections if it has a
+        ``reconstruct_batch`` method and no initials are given.  Arguments
+        and results are as for :meth:`reconstruct_events`.  Detector ids
+        which the station does not have are ignored.
+
+        """
+        n_detectors = len(self.station.detectors)
+        if detector_ids is None:
+            detector_ids = range(n_detectors)
+        detector_ids = [d_id for d_id in detector_ids if d_id < n_detectors]
+        if hasattr(events, 'read'):
+            events = events.read()
+        initials = list(initials) if initials is not None else []
+        n_events = len(events)
+        if not n_events:
+            return ((), (), ())
+
+        timestamps = events['timestamp']
+        t = array([events['t%d' % (d_id + 1)] for d_id in detector_ids],
+                  dtype=float).T
+        t[isin(t, ERR)] = nan
+        if isinstance(offsets, Station):
+            timing_offsets = offsets.detector_timing_offsets_at(timestamps)
+            t -= array([timing_offsets['offset%d' % (d_id + 1)]
+                        for d_id in detector_ids]).T
+        else:
+            t -= array(offsets, dtype=float)[detector_ids]
+        coordinates = self.station.cluster.get_detector_coordinates_at(
+            timestamps, self.station.number)[:, detector_ids]
+
+        detected = ~isnan(t)
+        n_detected = detected.sum(axis=1)
+        # Detected columns first, keeping the order of the detector ids
+        order = argsort(~detected, axis=1, kind='mergesort')
+        t = take_along_axis(t, order, axis=1)
+        coordinates = take_along_axis(coordinates, order[..., newaxis], axis=1)
+        ids = [[detector_ids[i] for i in row[:n]]
+               for row, n in zip(order.tolist(), n_detected.tolist())]
+
+        theta = full(n_events, nan)
+        phi = full(n_events, nan)
+
+        three = n_detected == 3
+        if three.any():
+            xyz = coordinates[three, :3]
+            theta[three], phi[three] = self.direct.reconstruct_batch(
+                t[three, :3], xyz[..., 0], xyz[..., 1], xyz[..., 2])
+
+        initials = initials[:n_events] + [None] * (n_events - len(initials))
+        if hasattr(self.fit, 'reconstruct_batch') and not any(initials):
+            for n in set(n_detected[n_detected > 3].tolist()):
+                selection = n_detected == n
+                xyz = coordinates[selection, :n]
+                theta[selection], phi[selection] = self.fit.reconstruct_batch(
+                    t[selection, :n], xyz[..., 0], xyz[..., 1], xyz[..., 2])
+        else:
+            for i in pbar(where(n_detected > 3)[0], show=progress):
+                n = n_detected[i]
+                x, y, z = coordinates[i, :n].T
+                theta[i], phi[i] = self.fit.reconstruct_common(
+                    list(t[i, :n]), list(x), list(y), list(z), initials[i])
+
+        return tuple(theta), tuple(phi), tuple(ids)
+
     def __repr__(self):
         return ("<%s, station: %r, direct: %r, fit: %r>" %
                 (self.__class__.__name__, self.station, self.direct, self.fit))
@@ -151,17 +233,47 @@ class CoincidenceDirectionReconstruction(object):
         :param station_numbers: list of station numbers, to only use
             events from those stations.
         :param offsets: a dictionary of either lists of detector timing
-            offsets or :class:`~sapphire.api.Station` objects for each station.
+            offsets or :class:`~sapphire.api.Station` objects for each station,
+            or a :class:`DailyStationOffsets` object.
         :param initial: dictionary with already fitted shower parameters.
         :return: list of theta, phi, and station numbers.
 
+        """
+        if initial is None:
+            initial = {}
+
+        t, x, y, z, nums = self._get_detections(
+            coincidence_events, station_numbers, offsets)
+
+        if len(t) >= 3 and 'core_x' in initial and 'core_y' in initial:
+            theta, phi = self.curved.reconstruct_common(t, x, y, z, initial)
+        elif len(t) == 3:
+            theta, phi = self.direct.reconstruct_common(t, x, y, z, initial)
+        elif len(t) > 3:
+            theta, phi = self.fit.reconstruct_common(t, x, y, z, initial)
+        else:
+            theta, phi = (nan, nan)
+
+        return theta, phi, nums
+
+    def _get_detections(self, coincidence_events, station_numbers=None,
+                        offsets=None):
+        """Get arrival times and positions of the stations in a coincidence
+
+        :param coincidence_events: a coincidence list consisting of three
+            or more (station_number, event) tuples.
+        :param station_numbers: list of station numbers, to only use
+            events from those stations.
+        :param offsets: station offsets, as for
+            :meth:`reconstruct_coincidence`.
+        :return: lists of arrival times, x, y, and z positions, and the
+            station numbers.
+
         """
         if len(coincidence_events) < 3:
-            return nan, nan, []
+            return [], [], [], [], []
         if offsets is None:
             offsets = {}
-        if initial is None:
-            initial = {}
 
         # Subtract base timestamp to prevent loss of precision
         ts0 = int(coincidence_events[0][1]['timestamp'])
@@ -188,16 +300,7 @@ class CoincidenceDirectionReconstruction(object):
                 z.append(sz)
                 nums.append(station_number)
 
-        if len(t) >= 3 and 'core_x' in initial and 'core_y' in initial:
-            theta, phi = self.curved.reconstruct_common(t, x, y, z, initial)
-        elif len(t) == 3:
-            theta, phi = self.direct.reconstruct_common(t, x, y, z, initial)
-        elif len(t) > 3:
-            theta, phi = self.fit.reconstruct_common(t, x, y, z, initial)
-        else:
-            theta, phi = (nan, nan)
-
-        return theta, phi, nums
+        return t, x, y, z, nums
 
     def reconstruct_coincidences(self, coincidences, station_numbers=None,
                                  offsets=None, progress=True, initials=None):
@@ -231,20 +334,88 @@ class CoincidenceDirectionReconstruction(object):
             theta, phi, nums = ((), (), ())
         return theta, phi, nums
 
+    def reconstruct_coincidences_batch(self, coincidences, station_numbers=None,
+                                       offsets=None, progress=True,
+                                       initials=None):
+        """Reconstruct all coincidences, solving similar coincidences at once
+
+        The arrival times and positions are first collected for each
+        coincidence.  Coincidences with the same number of detections are
+        then reconstructed at once, using the ``reconstruct_batch`` method
+        of the ``direct`` or ``fit`` algorithm.  Coincidences with a core
+        in the initials, or for algorithms without ``reconstruct_batch``,
+        are reconstructed one by one.  The results are the same as those of
+        :meth:`reconstruct_coincidences`.
+
+        :param coincidences: a list of coincidence events, each consisting
+                             of three or more (station_number, event) tuples.
+        :param station_numbers: list of station numbers, to only use
+                                events from those stations.
+        :param offsets: station offsets, as for
+                        :meth:`reconstruct_coincidence`.
+        :param progress: if True show a progress bar while collecting the
+                         detections.
+        :param initials: list of dictionaries with already reconstructed shower
+                         parameters.
+        :return: arrays of theta and phi, and list of station numbers.
+
+        """
+        if offsets is None:
+            offsets = {}
+        initials = list(initials) if initials is not None else []
+        coincidences = pbar(coincidences, show=progress)
+        detections = [self._get_detections(coincidence, station_numbers,
+                                           offsets)
+                      for coincidence in coincidences]
+        theta = full(len(detections), nan)
+        phi = full(len(detections), nan)
+
+        groups = {}
+        for i, (t, x, y, z, nums) in enumerate(detections):
+            initial = initials[i] if i < len(initials) else None
+            if initial is None:
+                initial = {}
+            if len(t) >= 3 and 'core_x' in initial and 'core_y' in initial:
+                theta[i], phi[i] = self.curved.reconstruct_common(t, x, y, z,
+                                                                  initial)
+            elif len(t) >= 3:
+                groups.setdefault(len(t), []).append(i)
+
+        for n, idx in groups.items():
+            algorithm = self.direct if n == 3 else self.fit
+            if hasattr(algorithm, 'reconstruct_batch'):
+                t, x, y, z = (array([detections[i][j] for i in idx])
+                              for j in range(4))
+                theta[idx], phi[idx] = algorithm.reconstruct_batch(t, x, y, z)
+            else:
+                for i in idx:
+                    t, x, y, z = detections[i][:4]
+                    initial = initials[i] if i < len(initials) else None
+                    theta[i], phi[i] = algorithm.reconstruct_common(
+                        t, x, y, z, initial if initial is not None else {})
+
+        return theta, phi, [detection[4] for detection in detections]
+
     def get_station_offsets(self, coincidence_events, station_numbers,
                             offsets, ts0):
-        if offsets and isinstance(next(itervalues(offsets)), Station):
+        precomputed = isinstance(offsets, DailyStationOffsets)
+        from_stations = False
+        if not precomputed and offsets:
+            from_stations = isinstance(next(itervalues(offsets)), Station)
+        if precomputed or from_stations:
             if station_numbers is None:
                 # stations in the coincidence
                 stations = list({sn for sn, _ in coincidence_events})
             else:
                 stations = station_numbers
             midnight_ts = floor_in_base(ts0, 86400)
+            if precomputed:
+                return offsets.best_offsets(stations, midnight_ts)
             offsets = self.determine_best_offsets(stations, midnight_ts,
                                                   offsets)
         return offsets
 
-    @memoize
+    @memoize(maxsize=1000)
     def determine_best_offsets(self, station_numbers, midnight_ts, offsets):
         """Determine best combined station and detector offsets
 
@@ -347,27 +518,23 @@ class CoincidenceDirectionReconstructionDetectors(
 
     """
 
-    def reconstruct_coincidence(self, coincidence_events, station_numbers=None,
-                                offsets=None, initial=None):
-        """Reconstruct a single coincidence
+    def _get_detections(self, coincidence_events, station_numbers=None,
+                        offsets=None):
+        """Get arrival times and positions of the detectors in a coincidence
 
         :param coincidence_events: a coincidence list consisting of one
                                    or more (station_number, event) tuples.
         :param station_numbers: list of station numbers, to only use
                                 events from those stations.
         :param offsets: dictionary with detector offsets for each station.
-                        These detector offsets should be relative to one
-                        detector from a specific station.
-        :param initial: dictionary with already fitted shower parameters.
-        :return: list of theta, phi, and station numbers.
+        :return: lists of arrival times, x, y, and z positions, and the
+                 station numbers.
 
         """
         if len(coincidence_events) < 1:
-            return nan, nan, []
+            return [], [], [], [], []
         if offsets is None:
             offsets = {}
-        if initial is None:
-            initial = {}
 
         # Subtract base timestamp to prevent loss of precision
         ts0 = int(coincidence_events[0][1]['timestamp'])
@@ -396,16 +563,230 @@ class CoincidenceDirectionReconstructionDetectors(
             if not all(isnan(t_detectors)):
                 nums.append(station_number)
 
-        if len(t) >= 3 and 'core_x' in initial and 'core_y' in initial:
-            theta, phi = self.curved.reconstruct_common(t, x, y, z, initial)
-        elif len(t) == 3:
-            theta, phi = self.direct.reconstruct_common(t, x, y, z, initial)
-        elif len(t) > 3:
-            theta, phi = self.fit.reconstruct_common(t, x, y, z, initial)
+        return t, x, y, z, nums
+
+
+class DailyStationOffsets(object):
+
+    """Precomputed best combined station and detector offsets per day
+
+    Instead of determining the best offsets for each coincidence, as
+    :meth:`CoincidenceDirectionReconstruction.determine_best_offsets`
+    does, the pairwise station offsets of all stations are combined into
+    a graph once per day.  The shortest paths between all stations, and
+    the station offsets along those paths, are solved once for each day.
+    The best offsets for any set of stations are then looked up.
+
+    The precomputed days can be stored in and loaded from a PyTables
+    file.  Days which have not been precomputed are computed when needed,
+    if the :class:`~sapphire.api.Station` objects are available.
+
+    Use an instance of this class as the ``offsets`` for
+    :meth:`CoincidenceDirectionReconstruction.reconstruct_coincidences`::
+
+        >>> stations = {sn: Station(sn) for sn in [501, 502, 503, 505]}
+        >>> offsets = DailyStationOffsets(stations)
+        >>> offsets.precompute(datetime.date(2016, 1, 1),
+        ...                    datetime.date(2016, 2, 1))
+        >>> offsets.store(data, '/station_offsets')
+
+    :param stations: a dictionary of :class:`~sapphire.api.Station` objects
+        for each station, or None if only stored offsets are used.
+
+    """
+
+    def __init__(self, stations=None):
+        self.stations = stations
+        if stations is not None:
+            self.station_numbers = sorted(stations.keys())
         else:
-            theta, phi = (nan, nan)
+            self.station_numbers = []
+        self._station_idx = {sn: i for i, sn in
+                             enumerate(self.station_numbers)}
+        self._days = {}
 
-        return theta, phi, nums
+    @property
+    def days(self):
+        """Sorted list of the midnight timestamps of the precomputed days"""
+
+        return sorted(self._days.keys())
+
+    def precompute(self, start, end, progress=True):
+        """Precompute the offsets for each day in a date range
+
+        :param start,end: date or datetime instances, the day of end is
+            not included.
+        :param progress: if True show a progress bar while computing.
+
+        """
+        midnight_ts = floor_in_base(datetime_to_gps(start), 86400)
+        end_ts = datetime_to_gps(end)
+        days = arange(midnight_ts, end_ts, 86400, dtype=int)
+        self._compute_days(days, progress)
+
+    def best_offsets(self, station_numbers, midnight_ts):
+        """Get the best combined station and detector offsets
+
+        The station with the smallest total offset error to the other
+        given stations is used as reference.  Intermediate stations are
+        used if that reduces the offset error.
+
+        :param station_numbers: list of stations in the coincidence.
+        :param midnight_ts: timestamp of midnight before the coincidence.
+        :return: dictionary with combined detector and station offsets for
+            each station, relative to the reference station.
+
+        """
+        if midnight_ts not in self._days:
+            if self.stations is None:
+                raise KeyError('Offsets for %d were not precomputed.' %
+                               midnight_ts)
+            self._compute_days([midnight_ts], progress=False)
+        path_errors, path_offsets, detector_offsets = self._days[midnight_ts]
+
+        idx = [self._station_idx[sn] for sn in station_numbers]
+        total_errors = path_errors[ix_(idx, idx)].sum(axis=1)
+        ref_idx = idx[total_errors.argmin()]
+
+        return {sn: (path_offsets[i, ref_idx] + detector_offsets[i]).tolist()
+                for sn, i in zip(station_numbers, idx)}
+
+    def store(self, data, group):
+        """Store the precomputed offsets in a PyTables file
+
+        :param data: the PyTables datafile.
+        :param group: the destination group, which need not exist.
+
+        """
+        days = self.days
+        values = [self._days[day] for day in days]
+        for name, value in [
+                ('station_numbers', self.station_numbers),
+                ('days', days),
+                ('path_errors', [v[0] for v in values]),
+                ('path_offsets', [v[1] for v in values]),
+                ('detector_offsets', [v[2] for v in values])]:
+            data.create_array(group, name, array(value), createparents=True)
+
+    @classmethod
+    def load(cls, data, group, stations=None):
+        """Load precomputed offsets from a PyTables file
+
+        :param data: the PyTables datafile.
+        :param group: the group containing the stored offsets.
+        :param stations: optionally a dictionary of
+            :class:`~sapphire.api.Station` objects for the same stations,
+            to compute days which were not stored.
+        :return: a :class:`DailyStationOffsets` instance.
+
+        """
+        group = data.get_node(group)
+        station_numbers = group.station_numbers.read().tolist()
+        if stations is not None and sorted(stations.keys()) != station_numbers:
+            raise ValueError('The stations do not match the stored offsets.')
+        offsets = cls(stations)
+        offsets.station_numbers = station_numbers
+        offsets._station_idx = {sn: i for i, sn in enumerate(station_numbers)}
+        for day, path_errors, path_offsets, detector_offsets in zip(
+                group.days.read().tolist(), group.path_errors.read(),
+                group.path_offsets.read(), group.detector_offsets.read()):
+            offsets._days[day] = (path_errors, path_offsets, detector_offsets)
+        return offsets
+
+    def _compute_days(self, days, progress=False):
+        """Solve the offset graphs for the given days"""
+
+        offset_matrices, error_matrices = self._pairwise_offsets(days)
+        detector_offsets = self._detector_offsets(days)
+        for i, midnight_ts in pbar(list(enumerate(days)), show=progress):
+            path_errors, predecessors = shortest_path(
+                error_matrices[i], method='FW', directed=False,
+                return_predecessors=True)
+            path_offsets = self._path_offsets(predecessors, offset_matrices[i])
+            self._days[int(midnight_ts)] = (path_errors, path_offsets,
+                                            detector_offsets[i])
+
+    def _pairwise_offsets(self, days):
+        """Get the offsets and errors between all pairs of stations
+
+        :param days: timestamps for which to get the offsets.
+        :return: offset and squared error matrices for each day.
+
+        """
+        n = len(self.station_numbers)
+        offset_matrices = zeros((len(days), n, n))
+        error_matrices = zeros((len(days), n, n))
+        for i, j in combinations(range(n), 2):
+            sn = self.station_numbers[i]
+            ref_sn = self.station_numbers[j]
+            try:
+                station_offsets = self.stations[sn].station_timing_offsets(
+                    ref_sn)
+                station_offsets = station_offsets[get_active_indices(
+                    station_offsets['timestamp'], days)]
+                o = station_offsets['offset']
+                e = station_offsets['error']
+            except Exception:
+                o, e = NO_STATION_OFFSET
+            else:
+                missing = isnan(o) & isnan(e)
+                o = where(missing, NO_STATION_OFFSET[0], o)
+                e = where(missing, NO_STATION_OFFSET[1], e)
+            offset_matrices[:, i, j] = -o
+            offset_matrices[:, j, i] = o
+            error_matrices[:, i, j] = e ** 2
+            error_matrices[:, j, i] = e ** 2
+        return offset_matrices, error_matrices
+
+    def _detector_offsets(self, days):
+        """Get the detector offsets of all stations
+
+        :param days: timestamps for which to get the offsets.
+        :return: array with the detector offsets for each day and station.
+
+        """
+        detector_offsets = zeros((len(days), len(self.station_numbers), 4))
+        for i, sn in enumerate(self.station_numbers):
+            try:
+                offsets = self.stations[sn].detector_timing_offsets_at(days)
+            except Exception:
+                detector_offsets[:, i] = nan
+            else:
+                for j in range(4):
+                    detector_offsets[:, i, j] = offsets['offset%d' % (j + 1)]
+        return detector_offsets
+
+    @staticmethod
+    def _path_offsets(predecessors, offset_matrix):
+        """Sum the station offsets along the shortest paths
+
+        :param predecessors: predecessor matrix of the shortest paths.
+        :param offset_matrix: offsets between pairs of stations.
+        :return: matrix with at [i, j] the offset of station i relative to
+            station j, via the shortest path between them.
+
+        """
+        n = len(offset_matrix)
+        has_predecessor = predecessors >= 0
+        predecessors = where(has_predecessor, predecessors, 0)
+        idx = arange(n)
+        step = where(has_predecessor,
+                     offset_matrix[idx[newaxis, :], predecessors], 0.)
+        path_offsets = zeros((n, n))
+        # extend the paths by one step towards the start each iteration
+        for _ in range(n):
+            new_path_offsets = where(
+                has_predecessor,
+                step + path_offsets[idx[:, newaxis], predecessors], 0.)
+            if array_equal(new_path_offsets, path_offsets):
+                break
+            path_offsets = new_path_offsets
+        return path_offsets
+
+    def __repr__(self):
+        return ("<%s, stations: %r, days: %d>" %
+                (self.__class__.__name__, self.station_numbers,
+                 len(self._days)))
 
 
 class BaseDirectionAlgorithm(object):
@@ -526,6 +907,59 @@ class DirectAlgorithm(BaseDirectionAlgorithm):
 
         return theta, phi
 
+    @staticmethod
+    def reconstruct_batch(t, x, y, z=None):
+        """Reconstruct angles for many 3 detection events at once
+
+        :param t: array of arrival times with shape (N, 3) in ns.
+        :param x,y: positions of detector 0, 1 and 2 in m, either a single
+            geometry with shape (3,) or one for each event (N, 3).
+        :param z: height of detectors 0, 1 and 2 is ignored.
+        :return: arrays of theta and phi, as :meth:`reconstruct`.
+
+        """
+        t = asarray(t, dtype=float)
+        x = asarray(x, dtype=float)
+        y = asarray(y, dtype=float)
+
+        dt1 = t[..., 1] - t[..., 0]
+        dt2 = t[..., 2] - t[..., 0]
+        dx1 = x[..., 1] - x[..., 0]
+        dx2 = x[..., 2] - x[..., 0]
+        dy1 = y[..., 1] - y[..., 0]
+        dy2 = y[..., 2] - y[..., 0]
+
+        r1 = vector_length(dx1, dy1)
+        r2 = vector_length(dx2, dy2)
+        phi1 = arctan2(dy1, dx1)
+        phi2 = arctan2(dy2, dx2)
+
+        phi = arctan2(-(r1 * dt2 * cos(phi1) - r2 * dt1 * cos(phi2)),
+                      (r1 * dt2 * sin(phi1) - r2 * dt1 * sin(phi2)))
+
+        with errstate(divide='ignore', invalid='ignore'):
+            sintheta1 = c * -dt1 / (r1 * cos(phi - phi1))
+            sintheta2 = c * -dt2 / (r2 * cos(phi - phi2))
+        use1 = (dt1 != 0) & (phi - phi1 != pi / 2)
+        use2 = (dt2 != 0) & (phi - phi2 != pi / 2)
+        sintheta = where(use1, sintheta1, where(use2, sintheta2, nan))
+        sintheta = where((r1 == 0) | (r2 == 0), nan, sintheta)
+        with errstate(invalid='ignore'):
+            theta = arcsin(where(abs(sintheta) <= 1, sintheta, nan))
+
+            # Limit theta to positive values, rotating phi by 180 degrees
+            negative = theta < 0
+        theta = where(negative, -theta, theta)
+        phi = where(negative, norm_angle(phi + pi), phi)
+        phi = where(isnan(theta), nan, phi)
+
+        # No time difference means shower came from zenith.
+        zenith = (dt1 == 0) & (dt2 == 0)
+        theta = where(zenith, 0., theta)
+        phi = where(zenith, 0., phi)
+
+        return theta, phi
+
     @classmethod
     def rel_theta1_errorsq(cls, theta, phi, phi1, phi2, r1=10, r2=10):
         """Fokkema2012, eq 4.23"""
@@ -698,6 +1132,40 @@ class DirectAlgorithmCartesian(BaseDirectionAlgorithm):
 
         return theta, phi
 
+    @staticmethod
+    def reconstruct_batch(t, x, y, z=None):
+        """Reconstruct angles for many 3 detection events at once
+
+        :param t: array of arrival times with shape (N, 3) in ns.
+        :param x,y: positions of detector 0, 1 and 2 in m, either a single
+            geometry with shape (3,) or one for each event (N, 3).
+        :param z: height of detectors 0, 1 and 2 is ignored.
+        :return: arrays of theta and phi, as :meth:`reconstruct`.
+
+        """
+        t = asarray(t, dtype=float)
+        x = asarray(x, dtype=float)
+        y = asarray(y, dtype=float)
+
+        dt1 = t[..., 1] - t[..., 0]
+        dt2 = t[..., 2] - t[..., 0]
+        dx1 = x[..., 1] - x[..., 0]
+        dx2 = x[..., 2] - x[..., 0]
+        dy1 = y[..., 1] - y[..., 0]
+        dy2 = y[..., 2] - y[..., 0]
+
+        ux = c * (dt2 * dx1 - dt1 * dx2)
+        uy = c * (dt2 * dy1 - dt1 * dy2)
+        vz = dx1 * dy2 - dx2 * dy1
+
+        with errstate(divide='ignore', invalid='ignore'):
+            uvzsqrt = sqrt((ux * ux + uy * uy) / (vz * vz))
+            valid = (vz != 0) & (uvzsqrt <= 1.)
+            theta = where(valid, arcsin(uvzsqrt), nan)
+        phi = where(valid, arctan2(-ux * vz, uy * vz), nan)
+
+        return theta, phi
+
 
 class DirectAlgorithmCartesian3D(BaseDirectionAlgorithm):
 
@@ -791,6 +1259,59 @@ class DirectAlgorithmCartesian3D(BaseDirectionAlgorithm):
 
         return theta, phi
 
+    @staticmethod
+    def reconstruct_batch(t, x, y, z=None):
+        """Reconstruct angles for many 3 detection events at once
+
+        :param t: array of arrival times with shape (N, 3) in ns.
+        :param x,y,z: positions of detector 0, 1 and 2 in m, either a
+            single geometry with shape (3,) or one for each event (N, 3).
+        :return: arrays of theta and phi, as :meth:`reconstruct`.
+
+        """
+        t = asarray(t, dtype=float)
+        x = asarray(x, dtype=float)
+        y = asarray(y, dtype=float)
+        if z is None:
+            z = zeros(x.shape)
+        z = asarray(z, dtype=float)
+
+        dt1 = (t[..., 1] - t[..., 0])[..., newaxis]
+        dt2 = (t[..., 2] - t[..., 0])[..., newaxis]
+        d = stack([x, y, z], axis=-1)
+        d1 = d[..., 1, :] - d[..., 0, :]
+        d2 = d[..., 2, :] - d[..., 0, :]
+
+        u = c * (dt2 * d1 - dt1 * d2)
+        v = cross(d1, d2)
+        uxv = cross(u, v)
+
+        usquared = sum(u * u, axis=-1)
+        vsquared = sum(v * v, axis=-1)
+        underroot = vsquared - usquared
+
+        with errstate(divide='ignore', invalid='ignore'):
+            term = v * sqrt(underroot)[..., newaxis]
+            nplus = (uxv + term) / vsquared[..., newaxis]
+            nmin = (uxv - term) / vsquared[..., newaxis]
+
+            phiplus = arctan2(nplus[..., 1], nplus[..., 0])
+            thetaplus = arccos(nplus[..., 2])
+            phimin = arctan2(nmin[..., 1], nmin[..., 0])
+            thetamin = arccos(nmin[..., 2])
+
+        thetaplus = where(isnan(thetaplus), pi, thetaplus)
+        thetamin = where(isnan(thetamin), pi, thetamin)
+
+        # Allow solution only if it is the only one above horizon
+        valid = (underroot > 0) & (vsquared != 0)
+        plus = valid & (thetaplus <= pi / 2.) & (thetamin > pi / 2.)
+        minus = valid & (thetaplus > pi / 2.) & (thetamin <= pi / 2.)
+        theta = where(plus, thetaplus, where(minus, thetamin, nan))
+        phi = where(plus, phiplus, where(minus, phimin, nan))
+
+        return theta, phi
+
 
 class SphereAlgorithm(object):
 
@@ -1087,6 +1608,54 @@ class RegressionAlgorithm(BaseDirectionAlgorithm):
 
         return theta, phi
 
+    @classmethod
+    def reconstruct_batch(cls, t, x, y, z=None):
+        """Reconstruct angles for many events with the same number of detections
+
+        The least squares systems of all events are solved at once.
+
+        :param t: array of arrival times with shape (N, k) in ns.
+        :param x,y: positions of the detectors in m, either a single
+            geometry with shape (k,) or one for each event (N, k).
+        :param z: height of the detectors is ignored.
+        :return: arrays of theta and phi, as :meth:`reconstruct`.
+
+        """
+        t = asarray(t, dtype=float)
+        x = broadcast_to(asarray(x, dtype=float), t.shape)
+        y = broadcast_to(asarray(y, dtype=float), t.shape)
+        valid = logic_checks_batch(t, x, y, zeros(t.shape))
+
+        k = t.shape[-1]
+        xs = x.sum(axis=-1)
+        ys = y.sum(axis=-1)
+        ts = t.sum(axis=-1)
+        xx = (x * x).sum(axis=-1)
+        yy = (y * y).sum(axis=-1)
+        tx = (t * x).sum(axis=-1)
+        ty = (t * y).sum(axis=-1)
+        xy = (x * y).sum(axis=-1)
+
+        denom = k * xy ** 2 + xs ** 2 * yy + ys ** 2 * xx
+        denom = denom - k * xx * yy - 2 * xs * ys * xy
+        denom = where(denom == 0, nan, denom)
+
+        numer = tx * (k * yy - ys ** 2) + xy * (ts * ys - k * ty)
+        numer = numer + xs * ys * ty - ts * xs * yy
+        nx = c * numer / denom
+
+        numer = ty * (k * xx - xs ** 2) + xy * (ts * xs - k * tx)
+        numer = numer + xs * ys * tx - ts * ys * xx
+        ny = c * numer / denom
+
+        with errstate(invalid='ignore'):
+            valid &= ~(nx ** 2 + ny ** 2 > 1.)
+            nz = sqrt(1 - nx ** 2 - ny ** 2)
+            theta = where(valid, arccos(nz), nan)
+        phi = where(valid, arctan2(ny, nx), nan)
+
+        return theta, phi
+
 
 class RegressionAlgorithm3D(BaseDirectionAlgorithm):
 
@@ -1153,6 +1722,50 @@ class RegressionAlgorithm3D(BaseDirectionAlgorithm):
 
         return theta, phi
 
+    @classmethod
+    def reconstruct_batch(cls, t, x, y, z=None):
+        """Reconstruct angles for many events with the same number of detections
+
+        All events are iterated at once, until each event has converged.
+
+        :param t: array of arrival times with shape (N, k) in ns.
+        :param x,y,z: positions of the detectors in m, either a single
+            geometry with shape (k,) or one for each event (N, k). The
+            height for all detectors will be set to 0 if not given.
+        :return: arrays of theta and phi, as :meth:`reconstruct`.
+
+        """
+        t = asarray(t, dtype=float)
+        x = broadcast_to(asarray(x, dtype=float), t.shape)
+        y = broadcast_to(asarray(y, dtype=float), t.shape)
+        if z is None:
+            z = zeros(t.shape)
+        z = broadcast_to(asarray(z, dtype=float), t.shape)
+
+        theta, phi = RegressionAlgorithm.reconstruct_batch(t, x, y)
+        theta[~logic_checks_batch(t, x, y, z)] = nan
+        phi[isnan(theta)] = nan
+
+        active = where(~isnan(theta))[0]
+        for _ in range(cls.MAX_ITERATIONS):
+            if not len(active):
+                break
+            theta_prev = theta[active]
+            phi_prev = phi[active]
+            nxnz = (tan(theta_prev) * cos(phi_prev))[:, newaxis]
+            nynz = (tan(theta_prev) * sin(phi_prev))[:, newaxis]
+            nz = cos(theta_prev)[:, newaxis]
+            za = z[active]
+            theta[active], phi[active] = RegressionAlgorithm.reconstruct_batch(
+                t[active] + za / (c * nz), x[active] - za * nxnz,
+                y[active] - za * nynz)
+            with errstate(invalid='ignore'):
+                active = active[abs(theta[active] - theta_prev) > 0.001]
+        theta[active] = nan
+        phi[active] = nan
+
+        return theta, phi
+
 
 class CurvedMixin(object):
 
@@ -1411,5 +2024,58 @@ def logic_checks(t, x, y, z):
     return True
 
 
+def logic_checks_batch(t, x, y, z):
+    """Check for impossible reconstructions of many events at once
+
+    Applies the same criteria as :func:`logic_checks`.
+
+    :param t: array of arrival times with shape (N, k) in ns.
+    :param x,y,z: positions of the detectors with shape (N, k) in m.
+    :return: boolean array, True for the events that pass the checks.
+
+    """
+    t, x, y, z = broadcast_arrays(t, x, y, z)
+    k = t.shape[-1]
+    valid = ones(t.shape[:-1], dtype=bool)
+
+    if k == 3:
+        for i, j in combinations(range(k), 2):
+            dx = x[..., i] - x[..., j]
+            dy = y[..., i] - y[..., j]
+            dz = z[..., i] - z[..., j]
+            # Check for identical positions
+            valid &= (dx != 0) | (dy != 0) | (dz != 0)
+            # Check if the time difference it larger than expected by c
+            dt_max = vector_length(dx, dy, dz) / c
+            valid &= ~(dt_max < abs(t[..., i] - t[..., j]))
+
+    # Check if all the positions are (almost) on a single line
+    largest_of_smallest_angles = zeros(valid.shape)
+    for i, j, l in combinations(range(k), 3):
+        dx1 = x[..., i] - x[..., j]
+        dy1 = y[..., i] - y[..., j]
+        dz1 = z[..., i] - z[..., j]
+        dx2 = x[..., i] - x[..., l]
+        dy2 = y[..., i] - y[..., l]
+        dz2 = z[..., i] - z[..., l]
+        lenvec01 = vector_length(dx1, dy1, dz1)
+        lenvec02 = vector_length(dx2, dy2, dz2)
+        lenvec12 = vector_length(dx2 - dx1, dy2 - dy1, dz2 - dz1)
+
+        area = dx1 * dy2 - dx2 * dy1 + dy1 * dz2 - dy2 * dz1
+        area = abs(area + dz1 * dx2 - dz2 * dx1)
+        valid &= ~(area < 1e-7)
+
+        with errstate(divide='ignore', invalid='ignore'):
+            smallest_angle = minimum(minimum(area / lenvec01 / lenvec02,
+                                             area / lenvec01 / lenvec12),
+                                     area / lenvec02 / lenvec12)
+        largest_of_smallest_angles = fmax(largest_of_smallest_angles,
+                                          smallest_angle)
+    valid &= ~(largest_of_smallest_angles < 0.1)
+
+    return valid
+
+
 def warning_only_three():
     warnings.warn('Only the first three detections will be used')
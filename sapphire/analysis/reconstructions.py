@@ -23,6 +23,11 @@ from __future__ import print_function
 import os
 import warnings
 
+from collections import deque
+from itertools import islice
+from math import ceil
+from multiprocessing import Pool
+
 import tables
 
 from six.moves import zip, zip_longest
@@ -62,6 +67,13 @@ class ReconstructESDEvents(object):
         >>> plt.polar(rec.reconstructions.col('azimuth'),
         ...           rec.reconstructions.col('zenith'), 'ko', alpha=0.2)
 
+    Large event tables can be reconstructed in chunks, such that an
+    interrupted reconstruction can be continued, and reconstructions can be
+    added for events that were added to the events table later::
+
+        >>> rec = ReconstructESDEvents(data, station_path, 506)
+        >>> rec.reconstruct_and_store(chunksize=100000)
+
     """
 
     def __init__(self, data, station_group, station,
@@ -107,8 +119,18 @@ class ReconstructESDEvents(object):
         self.core_x = []
         self.core_y = []
 
-    def reconstruct_and_store(self, detector_ids=None):
-        """Shorthand function to reconstruct event and store the results"""
+    def reconstruct_and_store(self, detector_ids=None, chunksize=None):
+        """Shorthand function to reconstruct event and store the results
+
+        :param detector_ids: list of detector ids to use for reconstructions.
+        :param chunksize: if given, reconstruct and store the events in
+            chunks of this many events, see
+            :meth:`reconstruct_and_store_chunks`.
+
+        """
+        if chunksize is not None:
+            self.reconstruct_and_store_chunks(detector_ids, chunksize)
+            return
 
         self.prepare_output()
         self.get_detector_offsets()
@@ -116,6 +138,96 @@ class ReconstructESDEvents(object):
         self.reconstruct_cores(detector_ids=detector_ids)
         self.store_reconstructions()
 
+    def reconstruct_and_store_chunks(self, detector_ids=None,
+                                     chunksize=100000):
+        """Reconstruct and store the events in chunks
+
+        The results of each chunk are stored and flushed before the next
+        chunk is reconstructed.  The number of reconstructed events is kept
+        in the ``reconstructed_events`` attribute of the reconstructions
+        table.  If the reconstructions table already exists, and overwrite
+        is False, the reconstructions continue after the events that were
+        already reconstructed.  This continues an interrupted
+        reconstruction, or reconstructs only the events that were added to
+        the events table since the previous reconstruction.
+
+        The results are only stored in the reconstructions table, the
+        ``theta``, ``phi``, ``detector_ids``, ``core_x``, and ``core_y``
+        attributes are not filled.
+
+        :param detector_ids: list of detector ids to use for reconstructions.
+        :param chunksize: number of events to reconstruct at a time.
+
+        """
+        start = self._resume_output()
+        if start is None:
+            self.prepare_output()
+            start = 0
+        self.get_detector_offsets()
+
+        n_events = self.events.nrows
+        chunks = range(start, n_events, chunksize)
+        for chunk_start in pbar(chunks, show=self.progress):
+            events = self.events.read(chunk_start, chunk_start + chunksize)
+            theta, phi, ids = self.direction.reconstruct_events(
+                events, detector_ids, self.offsets, progress=False,
+                batch=True)
+            initials = ({'theta': t, 'phi': p} for t, p in zip(theta, phi))
+            core_x, core_y = self.core.reconstruct_events(
+                events, detector_ids, progress=False, initials=initials)
+            for event, x, y, t, p, d_ids in zip(events, core_x, core_y, theta,
+                                                phi, ids):
+                self._store_reconstruction(event, x, y, t, p, d_ids)
+            self._set_reconstructed_events(chunk_start + len(events))
+
+    def _resume_output(self):
+        """Get the existing reconstructions table to continue
+
+        :return: the number of events that were already reconstructed, or
+            None if there is no reconstructions table to continue.
+
+        """
+        reconstructions = self._get_output()
+        if reconstructions is None or self.overwrite:
+            return None
+        if 'reconstructed_events' not in reconstructions._v_attrs:
+            return None
+
+        start = int(reconstructions._v_attrs.reconstructed_events)
+        if start > self.events.nrows:
+            matches = False
+        elif start:
+            # the last reconstruction should still belong to the same event
+            reconstruction = reconstructions[start - 1]
+            event = self.events[start - 1]
+            found = (reconstruction['id'], reconstruction['ext_timestamp'])
+            matches = found == (event['event_id'], event['ext_timestamp'])
+        else:
+            matches = True
+        if not matches:
+            raise RuntimeError("Reconstructions table for %s does not match "
+                               "the events, use overwrite to reconstruct all "
+                               "events" % self.station_group)
+        if reconstructions.nrows > start:
+            # remove the rows of an unfinished chunk
+            reconstructions.truncate(start)
+        self.reconstructions = reconstructions
+        return start
+
+    def _get_output(self):
+        """Get the reconstructions table, if it exists"""
+
+        if self.destination in self.station_group:
+            return self.station_group._f_get_child(self.destination)
+        return None
+
+    def _set_reconstructed_events(self, n):
+        """Flush the reconstructions and record the number of events"""
+
+        self.reconstructions.flush()
+        self.reconstructions._v_attrs.reconstructed_events = n
+        self.reconstructions.flush()
+
     def reconstruct_directions(self, detector_ids=None):
         """Reconstruct direction for all events
 
@@ -186,18 +298,27 @@ class ReconstructESDEvents(object):
              that object if available.
           -  else get offsets from `api.Station` object.
 
+        - else, if offsets were previously determined and stored in the
+          datafile, and overwrite is False, use those offsets.
+
         """
         try:
             self.offsets = [d.offset for d in self.station.detectors]
             if self.verbose:
                 print('Read detector offsets from station object.')
         except AttributeError:
+            stored = 'detector_offsets' in self.station_group
             if self.station_number is not None:
                 self.offsets = api.Station(self.station_number,
                                            force_fresh=self.force_fresh,
                                            force_stale=self.force_stale)
                 if self.verbose:
                     print('Reading detector offsets from public database.')
+            elif stored and not self.overwrite:
+                # Continue with the offsets determined previously
+                self.offsets = list(self.station_group.detector_offsets.read())
+                if self.verbose:
+                    print('Read detector offsets from datafile.')
             else:
                 self.offsets = determine_detector_timing_offsets(self.events,
                                                                  self.station)
@@ -233,6 +354,7 @@ class ReconstructESDEvents(object):
             self._store_reconstruction(event, core_x, core_y, theta, phi,
                                        detector_ids)
         self.reconstructions.flush()
+        self._set_reconstructed_events(self.reconstructions.nrows)
 
     def _store_reconstruction(self, event, core_x, core_y, theta, phi,
                               detector_ids):
@@ -320,6 +442,14 @@ class ReconstructESDEventsFromSource(ReconstructESDEvents):
         except tables.HDF5ExtError:
             warnings.warn('Unable to store station object, to large for HDF.')
 
+    def _get_output(self):
+        """Get the reconstructions table, if it exists"""
+
+        dest_path = os.path.join(self.dest_group, self.destination)
+        if dest_path in self.dest_data:
+            return self.dest_data.get_node(dest_path)
+        return None
+
 
 class ReconstructSimulatedEvents(ReconstructESDEvents):
 
@@ -392,12 +522,20 @@ class ReconstructESDCoincidences(object):
         >>> rec = ReconstructESDCoincidences(data, overwrite=True)
         >>> rec.reconstruct_and_store()
 
+    To use multiple processes for the reconstructions set ``workers``::
+
+        >>> rec = ReconstructESDCoincidences(data, overwrite=True, workers=8)
+        >>> rec.reconstruct_and_store()
+
     """
 
+    #: number of coincidences per task for the worker processes
+    CHUNK_SIZE = 1000
+
     def __init__(self, data, coincidences_group='/coincidences',
                  overwrite=False, progress=True, verbose=False,
                  destination='reconstructions', cluster=None,
-                 force_fresh=False, force_stale=False):
+                 force_fresh=False, force_stale=False, workers=None):
         """Initialize the class.
 
         :param data: the PyTables datafile.
@@ -407,6 +545,9 @@ class ReconstructESDCoincidences(object):
         :param verbose: if True be verbose about station metadata usage.
         :param destination: alternative name for reconstruction table.
         :param cluster: a Cluster object to use for the reconstructions.
+        :param workers: number of worker processes used for the
+            reconstructions, use None to reconstruct in this process.  Each
+            worker receives its own copy of the cluster and offsets.
 
         """
         self.data = data
@@ -418,6 +559,7 @@ class ReconstructESDCoincidences(object):
         self.destination = destination
         self.force_fresh = force_fresh
         self.force_stale = force_stale
+        self.workers = workers
         self.offsets = {}
 
         self.cq = CoincidenceQuery(data, self.coincidences_group)
@@ -433,13 +575,21 @@ class ReconstructESDCoincidences(object):
         self.core_y = []
 
     def reconstruct_and_store(self, station_numbers=None):
-        """Shorthand function to reconstruct coincidences and store results"""
+        """Shorthand function to reconstruct coincidences and store results
+
+        When using multiple workers the directions and cores are
+        reconstructed together for chunks of coincidences, and the results
+        are stored as they become available.
 
+        """
         self.prepare_output()
         self.get_station_timing_offsets()
-        self.reconstruct_directions(station_numbers=station_numbers)
-        self.reconstruct_cores(station_numbers=station_numbers)
-        self.store_reconstructions()
+        if self.workers:
+            self._reconstruct_and_store_in_pool(station_numbers)
+        else:
+            self.reconstruct_directions(station_numbers=station_numbers)
+            self.reconstruct_cores(station_numbers=station_numbers)
+            self.store_reconstructions()
 
     def reconstruct_directions(self, station_numbers=None):
         """Reconstruct direction for all events
@@ -447,11 +597,15 @@ class ReconstructESDCoincidences(object):
         :param station_numbers: list of stations to use for reconstructions.
 
         """
-        if len(self.core_x) and len(self.core_y):
-            initials = ({'core_x': x, 'core_y': y}
-                        for x, y in zip(self.core_x, self.core_y))
-        else:
-            initials = []
+        initials = self._direction_initials()
+        if self.workers:
+            self.theta, self.phi, self.station_numbers = ([], [], [])
+            for _, result in self._reconstruct_in_pool(('direction',),
+                                                       station_numbers, initials):
+                self.theta.extend(result['theta'])
+                self.phi.extend(result['phi'])
+                self.station_numbers.extend(result['station_numbers'])
+            return
         coincidences = pbar(self.cq.all_coincidences(iterator=True),
                             length=self.coincidences.nrows, show=self.progress)
         angles = self.direction.reconstruct_coincidences(
@@ -470,6 +624,13 @@ class ReconstructESDCoincidences(object):
                         for theta, phi in zip(self.theta, self.phi))
         else:
             initials = []
+        if self.workers:
+            self.core_x, self.core_y = ([], [])
+            for _, result in self._reconstruct_in_pool(('core',),
+                                                       station_numbers, initials):
+                self.core_x.extend(result['core_x'])
+                self.core_y.extend(result['core_y'])
+            return
         coincidences = pbar(self.cq.all_coincidences(iterator=True),
                             length=self.coincidences.nrows, show=self.progress)
         cores = self.core.reconstruct_coincidences(
@@ -477,6 +638,97 @@ class ReconstructESDCoincidences(object):
             progress=False, initials=initials)
         self.core_x, self.core_y = cores
 
+    def _direction_initials(self):
+        """Initial values for the direction reconstructions"""
+
+        if len(self.core_x) and len(self.core_y):
+            return ({'core_x': x, 'core_y': y}
+                    for x, y in zip(self.core_x, self.core_y))
+        else:
+            return []
+
+    def _reconstruct_in_pool(self, stages, station_numbers, initials):
+        """Reconstruct chunks of coincidences using worker processes
+
+        The direction and core reconstruction objects and the offsets are
+        sent to each worker once, when the worker is started.  The
+        coincidence events are read in chunks by this process and sent to
+        the workers.  All access to the data file happens in the main
+        thread of this process.
+
+        :param stages: the reconstructions to perform for each chunk,
+            'direction' and/or 'core', in that order.
+        :param station_numbers: list of stations to use for reconstructions.
+        :param initials: initial values for the first stage.
+        :return: generator of the coincidences and the results for each
+            chunk, in the order of the coincidences.
+
+        """
+        n_chunks = int(ceil(self.coincidences.nrows / float(self.CHUNK_SIZE)))
+        pool = Pool(self.workers, _init_reconstruction_worker,
+                    (self.direction, self.core, self.offsets))
+        try:
+            results = self._submit_chunks(pool, stages, station_numbers,
+                                          initials)
+            for coincidences, result in pbar(results, length=n_chunks,
+                                             show=self.progress):
+                yield coincidences, result
+        finally:
+            pool.close()
+            pool.join()
+
+    def _submit_chunks(self, pool, stages, station_numbers, initials):
+        """Read chunks of coincidences and submit them to the workers
+
+        A chunk is only read when fewer than twice as many chunks as there
+        are workers are being reconstructed, to not read ahead of the
+        workers.
+
+        :return: generator of the coincidences and the results for each
+            chunk, in the order of the coincidences.
+
+        """
+        initials = iter(initials)
+        pending = deque()
+        for start in range(0, self.coincidences.nrows, self.CHUNK_SIZE):
+            coincidences = self.coincidences.read(start,
+                                                  start + self.CHUNK_SIZE)
+            chunk = list(self.cq.all_events(coincidences, n=0))
+            task = (stages, chunk, station_numbers,
+                    list(islice(initials, len(chunk))))
+            pending.append(
+                (coincidences, pool.apply_async(_reconstruct_chunk, (task,))))
+            if len(pending) >= 2 * self.workers:
+                coincidences, result = pending.popleft()
+                yield coincidences, result.get()
+        while pending:
+            coincidences, result = pending.popleft()
+            yield coincidences, result.get()
+
+    def _reconstruct_and_store_in_pool(self, station_numbers=None):
+        """Reconstruct directions and cores in worker processes and store
+
+        The results for each chunk of coincidences are stored as soon as
+        they are available, in the order of the coincidences.
+
+        """
+        self.theta, self.phi, self.station_numbers = ([], [], [])
+        self.core_x, self.core_y = ([], [])
+        for coincidences, result in self._reconstruct_in_pool(
+                ('direction', 'core'), station_numbers,
+                self._direction_initials()):
+            for x, y, theta, phi, numbers, coincidence in zip(
+                    result['core_x'], result['core_y'], result['theta'],
+                    result['phi'], result['station_numbers'], coincidences):
+                self._store_reconstruction(coincidence, x, y, theta, phi,
+                                           numbers)
+            self.reconstructions.flush()
+            self.theta.extend(result['theta'])
+            self.phi.extend(result['phi'])
+            self.station_numbers.extend(result['station_numbers'])
+            self.core_x.extend(result['core_x'])
+            self.core_y.extend(result['core_y'])
+
     def prepare_output(self):
         """Prepare output table"""
 
@@ -604,7 +856,7 @@ class ReconstructESDCoincidencesFromSource(ReconstructESDCoincidences):
     def __init__(self, source_data, dest_data, source_group, dest_group,
                  overwrite=False, progress=True, verbose=False,
                  destination='reconstructions', cluster=None,
-                 force_fresh=False, force_stale=False):
+                 force_fresh=False, force_stale=False, workers=None):
         """Initialize the class.
 
         :param data: the PyTables datafile.
@@ -622,7 +874,7 @@ class ReconstructESDCoincidencesFromSource(ReconstructESDCoincidences):
         """
         super(ReconstructESDCoincidencesFromSource, self).__init__(
             source_data, source_group, overwrite, progress, verbose,
-            destination, cluster, force_fresh, force_stale)
+            destination, cluster, force_fresh, force_stale, workers)
         self.dest_data = dest_data
         self.dest_group = dest_group
 
@@ -702,3 +954,42 @@ class ReconstructSimulatedCoincidences(ReconstructESDCoincidences):
             if self.verbose:
                 print('Using cluster %s for metadata.' % self.cluster)
         return cluster
+
+
+_worker_reconstructions = {}
+
+
+def _init_reconstruction_worker(direction, core, offsets):
+    """Keep the reconstruction objects and offsets in a worker process"""
+
+    _worker_reconstructions.update(direction=direction, core=core,
+                                   offsets=offsets)
+
+
+def _reconstruct_chunk(args):
+    """Reconstruct a chunk of coincidences in a worker process
+
+    :param args: tuple of the reconstructions to perform ('direction' and/or
+        'core'), the events for each coincidence, the station numbers to
+        use, and the initial values for the first reconstruction.
+    :return: dictionary with the results of the reconstructions.
+
+    """
+    stages, coincidence_events, station_numbers, initials = args
+    results = {}
+    if 'direction' in stages:
+        direction = _worker_reconstructions['direction']
+        angles = direction.reconstruct_coincidences(
+            coincidence_events, station_numbers,
+            _worker_reconstructions['offsets'], progress=False,
+            initials=initials)
+        results['theta'], results['phi'], results['station_numbers'] = angles
+        initials = [{'theta': theta, 'phi': phi}
+                    for theta, phi in zip(results['theta'], results['phi'])]
+    if 'core' in stages:
+        core = _worker_reconstructions['core']
+        cores = core.reconstruct_coincidences(
+            coincidence_events, station_numbers, progress=False,
+            initials=initials)
+        results['core_x'], results['core_y'] = cores
+    return results
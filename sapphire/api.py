@@ -22,10 +22,17 @@
 
 """
 import datetime
+import hashlib
 import json
 import logging
+import os
+import tempfile
+import threading
+import time
 import warnings
 
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 from os import extsep, path
 
 from lazy import lazy
@@ -35,7 +42,7 @@ from six.moves.urllib.error import HTTPError, URLError
 from six.moves.urllib.request import urlopen
 
 from .transformations.clock import process_time
-from .utils import get_active_index, memoize
+from .utils import get_active_index, get_active_indices, memoize
 
 logger = logging.getLogger('api')
 
@@ -43,6 +50,213 @@ API_BASE = 'http://data.hisparc.nl/api/'
 SRC_BASE = 'http://data.hisparc.nl/show/source/'
 LOCAL_BASE = path.join(path.dirname(__file__), 'data')
 
+# os.replace is not available in Python 2, rename is atomic on POSIX
+_replace = getattr(os, 'replace', os.rename)
+
+# The warnings filters are shared by all threads.  Suppressing and issuing
+# warnings is serialized, such that concurrent retrievals (see
+# prefetch_stations) neither lose warnings nor leave filters changed.
+_warnings_lock = threading.RLock()
+
+# The SAPPHIRE_CACHE_DIR environment variable is only used if the cache is
+# not enabled or disabled explicitly.
+_cache_configured = False
+
+
+def _warn(message):
+    """Issue a warning, while no other thread is suppressing warnings"""
+
+    with _warnings_lock:
+        warnings.warn(message, stacklevel=2)
+
+
+def _genfromtxt(source, names):
+    """Read tab separated data, ignoring warnings for empty data"""
+
+    with _warnings_lock:
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore')
+            return genfromtxt(source, delimiter='\t', dtype=None, names=names)
+
+
+class ResponseCache(object):
+
+    """Cache for data retrieved from the HiSPARC servers
+
+    Responses are kept in memory, shared by all API instances in the
+    process, and optionally in a directory on disk, shared by all
+    processes using the same directory.  Entries expire `ttl` seconds
+    after they were retrieved.  When more than `max_entries` entries are
+    cached the least recently used entries are evicted.
+
+    Files on disk are written to a temporary file which is then renamed,
+    such that other processes never read a partially written entry.
+
+    """
+
+    def __init__(self, directory=None, ttl=86400, max_entries=1000):
+        """Initialize the cache
+
+        :param directory: path to the directory for the on-disk cache, if
+            None responses are only cached in memory.
+        :param ttl: time in seconds for which a response remains valid.
+        :param max_entries: maximum number of responses to keep, both in
+            memory and on disk.
+
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not path.isdir(directory):
+                    raise
+
+    def get(self, url):
+        """Get a cached response
+
+        :param url: the url of the response.
+        :return: the response, or None if it is not cached or expired.
+
+        """
+        with self._lock:
+            entry = self._entries.pop(url, None)
+            if entry is not None and self._is_fresh(entry[0]):
+                self._entries[url] = entry
+                return entry[1]
+        if self.directory is None:
+            return None
+
+        cache_path = self._path(url)
+        try:
+            with open(cache_path) as cached:
+                retrieved, data = json.load(cached)
+            # mark as recently used
+            os.utime(cache_path, None)
+        except (IOError, OSError, ValueError):
+            return None
+        if not self._is_fresh(retrieved):
+            return None
+        self._store_in_memory(url, retrieved, data)
+        return data
+
+    def set(self, url, data):
+        """Store a response in the cache
+
+        :param url: the url of the response.
+        :param data: the response, a string.
+
+        """
+        retrieved = time.time()
+        self._store_in_memory(url, retrieved, data)
+        if self.directory is None:
+            return
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as tmp:
+                json.dump([retrieved, data], tmp)
+            _replace(tmp_path, self._path(url))
+        except (IOError, OSError):
+            logger.debug('Unable to write cache entry for: ' + url)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        self._evict_from_disk()
+
+    def clear(self):
+        """Remove all entries from the cache"""
+
+        with self._lock:
+            self._entries.clear()
+        for cache_path in self._cache_files():
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+
+    def _is_fresh(self, retrieved):
+        return time.time() - retrieved < self.ttl
+
+    def _store_in_memory(self, url, retrieved, data):
+        with self._lock:
+            self._entries.pop(url, None)
+            self._entries[url] = (retrieved, data)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return path.join(self.directory, key + extsep + 'json')
+
+    def _cache_files(self):
+        if self.directory is None:
+            return []
+        return [path.join(self.directory, name)
+                for name in os.listdir(self.directory)
+                if name.endswith(extsep + 'json')]
+
+    def _evict_from_disk(self):
+        """Remove the least recently used files if the cache is too large"""
+
+        cache_paths = self._cache_files()
+        if len(cache_paths) <= self.max_entries:
+            return
+        last_used = []
+        for cache_path in cache_paths:
+            try:
+                last_used.append((path.getmtime(cache_path), cache_path))
+            except OSError:
+                # removed by another process
+                pass
+        last_used.sort()
+        for _, cache_path in last_used[:len(last_used) - self.max_entries]:
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+
+
+def enable_cache(directory=None, ttl=86400, max_entries=1000):
+    """Cache the data retrieved from the HiSPARC servers
+
+    All API instances in this process will use the cache.  Use the same
+    directory in multiple processes, for instance workers, to share the
+    cache between them.  The on-disk cache can also be enabled by setting
+    the ``SAPPHIRE_CACHE_DIR`` environment variable.
+
+    :param directory: path to the directory for the on-disk cache, if
+        None responses are only cached in memory.
+    :param ttl: time in seconds for which a response remains valid.
+    :param max_entries: maximum number of responses to keep.
+    :return: the new :class:`ResponseCache`.
+
+    """
+    global _cache_configured
+    _cache_configured = True
+    API.cache = ResponseCache(directory, ttl, max_entries)
+    return API.cache
+
+
+def disable_cache():
+    """Stop caching the data retrieved from the HiSPARC servers"""
+
+    global _cache_configured
+    _cache_configured = True
+    API.cache = None
+
+
+def _configure_cache_from_environment():
+    """Enable the cache set by ``SAPPHIRE_CACHE_DIR``, unless configured"""
+
+    if not _cache_configured and 'SAPPHIRE_CACHE_DIR' in os.environ:
+        enable_cache(os.environ['SAPPHIRE_CACHE_DIR'])
+
 
 class API(object):
 
@@ -53,8 +267,14 @@ class API(object):
     Support is also provided for the retrieval of Source TSV data, which
     is returned as NumPy arrays.
 
+    The data retrieved from the server can be cached, see
+    :func:`enable_cache`.
+
     """
 
+    #: Shared :class:`ResponseCache` for the retrieved data, None to disable.
+    cache = None
+
     urls = {"stations": 'stations/',
             "stations_in_subcluster": 'subclusters/{subcluster_number}/',
             "subclusters": 'subclusters/',
@@ -122,7 +342,7 @@ class API(object):
         try:
             if self.force_stale:
                 raise Exception
-            json_data = self._retrieve_url(urlpath)
+            json_data = self._retrieve_cached_url(urlpath)
             data = json.loads(json_data)
         except Exception:
             if self.force_fresh:
@@ -138,7 +358,7 @@ class API(object):
                 raise Exception('Couldn\'t get requested data from server '
                                 'nor find it locally.')
             if not self.force_stale:
-                warnings.warn('Using local data. Possibly outdated.')
+                _warn('Using local data. Possibly outdated.')
 
         return data
 
@@ -155,32 +375,50 @@ class API(object):
         try:
             if self.force_stale:
                 raise Exception
-            tsv_data = self._retrieve_url(urlpath, base=SRC_BASE)
+            tsv_data = self._retrieve_cached_url(urlpath, base=SRC_BASE)
         except Exception:
             if self.force_fresh:
                 raise Exception('Couldn\'t get requested data from server.')
             localpath = path.join(LOCAL_BASE,
                                   urlpath.strip('/') + extsep + 'tsv')
             try:
-                with warnings.catch_warnings():
-                    warnings.filterwarnings('ignore')
-                    data = genfromtxt(localpath, delimiter='\t', dtype=None,
-                                      names=names)
+                data = _genfromtxt(localpath, names)
             except Exception:
                 if self.force_stale:
                     raise Exception('Couldn\'t find requested data locally.')
                 raise Exception('Couldn\'t get requested data from server '
                                 'nor find it locally.')
             if not self.force_stale:
-                warnings.warn('Using local data. Possibly outdated.')
+                _warn('Using local data. Possibly outdated.')
         else:
-            with warnings.catch_warnings():
-                warnings.filterwarnings('ignore')
-                data = genfromtxt(BytesIO(tsv_data.encode('utf-8')),
-                                  delimiter='\t', dtype=None, names=names)
+            data = _genfromtxt(BytesIO(tsv_data.encode('utf-8')), names)
 
         return atleast_1d(data)
 
+    def _retrieve_cached_url(self, urlpath, base=API_BASE):
+        """Get data from the cache or else retrieve it from the server
+
+        If fresh data is forced the cache is not read, but the retrieved
+        data is stored in the cache.
+
+        :param urlpath: the urlpath (after the base) to retrieve.
+        :param base: the base url.
+        :return: the data as a string.
+
+        """
+        _configure_cache_from_environment()
+        cache = self.cache
+        if cache is None:
+            return self._retrieve_url(urlpath, base=base)
+        url = base + urlpath
+        if not self.force_fresh:
+            data = cache.get(url)
+            if data is not None:
+                return data
+        data = self._retrieve_url(urlpath, base=base)
+        cache.set(url, data)
+        return data
+
     @staticmethod
     def _retrieve_url(urlpath, base=API_BASE):
         """Open a HiSPARC API URL and read the data
@@ -527,7 +765,7 @@ class Station(API):
             raise Exception('Can not force fresh and stale simultaneously.')
         if station not in Network(force_fresh=force_fresh,
                                   force_stale=force_stale).station_numbers():
-            warnings.warn('Possibly invalid station, or without config.')
+            _warn('Possibly invalid station, or without config.')
         self.force_fresh = force_fresh
         self.force_stale = force_stale
         self.station = station
@@ -763,6 +1001,17 @@ class Station(API):
                       ('master', 'slave', 'master_fpga', 'slave_fpga')]
         return electronic
 
+    def electronics_at(self, timestamps):
+        """Get electronics version data for many timestamps at once
+
+        :param timestamps: array of timestamps.
+        :return: array with the values valid at each timestamp, with the
+            same fields as :attr:`electronics`.
+
+        """
+        electronics = self.electronics
+        return electronics[get_active_indices(electronics['timestamp'], timestamps)]
+
     @lazy
     def voltages(self):
         """Get the PMT voltage data
@@ -789,6 +1038,17 @@ class Station(API):
         voltage = [voltages[idx]['voltage%d' % i] for i in range(1, 5)]
         return voltage
 
+    def voltages_at(self, timestamps):
+        """Get PMT voltage data for many timestamps at once
+
+        :param timestamps: array of timestamps.
+        :return: array with the values valid at each timestamp, with the
+            same fields as :attr:`voltages`.
+
+        """
+        voltages = self.voltages
+        return voltages[get_active_indices(voltages['timestamp'], timestamps)]
+
     @lazy
     def currents(self):
         """Get the PMT current data
@@ -815,6 +1075,17 @@ class Station(API):
         current = [currents[idx]['current%d' % i] for i in range(1, 5)]
         return current
 
+    def currents_at(self, timestamps):
+        """Get PMT current data for many timestamps at once
+
+        :param timestamps: array of timestamps.
+        :return: array with the values valid at each timestamp, with the
+            same fields as :attr:`currents`.
+
+        """
+        currents = self.currents
+        return currents[get_active_indices(currents['timestamp'], timestamps)]
+
     @lazy
     def gps_locations(self):
         """Get the GPS location data
@@ -845,6 +1116,17 @@ class Station(API):
                     'altitude': locations[idx]['altitude']}
         return location
 
+    def gps_locations_at(self, timestamps):
+        """Get GPS locations for many timestamps at once
+
+        :param timestamps: array of timestamps.
+        :return: array with the values valid at each timestamp, with the
+            same fields as :attr:`gps_locations`.
+
+        """
+        gps_locations = self.gps_locations
+        return gps_locations[get_active_indices(gps_locations['timestamp'], timestamps)]
+
     @lazy
     def triggers(self):
         """Get the trigger config data
@@ -878,6 +1160,17 @@ class Station(API):
                    for t in ('n_low', 'n_high', 'and_or', 'external')]
         return thresholds, trigger
 
+    def triggers_at(self, timestamps):
+        """Get trigger configs for many timestamps at once
+
+        :param timestamps: array of timestamps.
+        :return: array with the values valid at each timestamp, with the
+            same fields as :attr:`triggers`.
+
+        """
+        triggers = self.triggers
+        return triggers[get_active_indices(triggers['timestamp'], timestamps)]
+
     @lazy
     def station_layouts(self):
         """Get the station layout data
@@ -911,6 +1204,17 @@ class Station(API):
                           for i in range(1, 5)]
         return station_layout
 
+    def station_layouts_at(self, timestamps):
+        """Get station layout data for many timestamps at once
+
+        :param timestamps: array of timestamps.
+        :return: array with the values valid at each timestamp, with the
+            same fields as :attr:`station_layouts`.
+
+        """
+        station_layouts = self.station_layouts
+        return station_layouts[get_active_indices(station_layouts['timestamp'], timestamps)]
+
     @lazy
     def detector_timing_offsets(self):
         """Get the detector timing offsets data
@@ -941,6 +1245,17 @@ class Station(API):
 
         return detector_timing_offset
 
+    def detector_timing_offsets_at(self, timestamps):
+        """Get detector timing offset data for many timestamps at once
+
+        :param timestamps: array of timestamps.
+        :return: array with the values valid at each timestamp, with the
+            same fields as :attr:`detector_timing_offsets`.
+
+        """
+        detector_timing_offsets = self.detector_timing_offsets
+        return detector_timing_offsets[get_active_indices(detector_timing_offsets['timestamp'], timestamps)]
+
     @memoize
     def station_timing_offsets(self, reference_station):
         """Get the station timing offset relative to reference_station
@@ -992,3 +1307,72 @@ class Station(API):
         return ("%s(%d, force_fresh=%s, force_stale=%s)" %
                 (self.__class__.__name__, self.station,
                  self.force_fresh, self.force_stale))
+
+
+class _UnavailableStation(object):
+
+    """Placeholder for a station which could not be created
+
+    Accessing any attribute, other than the station number, raises the
+    exception that occurred when creating the station.
+
+    """
+
+    def __init__(self, station, exception):
+        self.station = station
+        self.exception = exception
+
+    def __getattr__(self, name):
+        raise self.exception
+
+    def __repr__(self):
+        return "%s(%r, %r)" % (self.__class__.__name__, self.station,
+                               self.exception)
+
+
+def prefetch_stations(stations, attributes=('info', 'gps_locations',
+                                            'station_layouts',
+                                            'detector_timing_offsets'),
+                      workers=8, force_fresh=False, force_stale=False):
+    """Get Station objects with data retrieved concurrently
+
+    The stations are created and the requested lazy attributes are
+    retrieved by a pool of threads.  Attributes which can not be retrieved
+    are skipped, such that accessing them later will try again and raise
+    the usual exceptions.  Stations which can not be created are replaced
+    by a placeholder which raises the exception that occurred when
+    accessing its attributes.
+
+    :param stations: list of station numbers.
+    :param attributes: names of the lazy Station attributes to retrieve.
+    :param workers: maximum number of concurrent retrievals.
+    :param force_fresh,force_stale: passed on to :class:`Station`.
+    :return: list of :class:`Station` objects, in the order of stations.
+
+    Example::
+
+        >>> stations = prefetch_stations([501, 502, 503])
+        >>> [station.gps_location() for station in stations]
+
+    """
+    def prefetch(station):
+        try:
+            station = Station(station, force_fresh=force_fresh,
+                              force_stale=force_stale)
+        except Exception as exception:
+            return _UnavailableStation(station, exception)
+        for attribute in attributes:
+            try:
+                getattr(station, attribute)
+            except Exception:
+                pass
+        return station
+
+    if not stations:
+        return []
+    pool = ThreadPool(min(workers, len(stations)))
+    try:
+        return pool.map(prefetch, stations)
+    finally:
+        pool.close()
+        pool.join()
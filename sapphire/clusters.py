@@ -130,7 +130,7 @@ class Detector(object):
         lla = self.station.cluster.lla
         enu = self.get_coordinates()
 
-        transform = geographic.FromWGS84ToENUTransformation(lla)
+        transform = geographic.enu_transformation(lla)
         latitude, longitude, altitude = transform.enu_to_lla(enu)
 
         return latitude, longitude, altitude
@@ -339,7 +339,7 @@ class Station(object):
         x, y, z, alpha = self.get_coordinates()
         enu = (x, y, z)
 
-        transform = geographic.FromWGS84ToENUTransformation(lla)
+        transform = geographic.enu_transformation(lla)
         latitude, longitude, altitude = transform.enu_to_lla(enu)
         latitude = latitude if abs(latitude) > 1e-7 else 0.
         longitude = longitude if abs(longitude) > 1e-7 else 0.
@@ -393,10 +393,181 @@ class Station(object):
                  self.cluster))
 
 
+class ClusterGeometry(object):
+
+    """Positions of all stations and detectors of a cluster in arrays
+
+    The positions of the stations and detectors, relative to the cluster
+    and station respectively, are concatenated into flat arrays.  The
+    timestamps at which any position changes define the configuration
+    epochs.  For each epoch the index of the active position of every
+    station and detector is precomputed, such that finding the positions
+    for a timestamp only requires a single search in the epochs.
+
+    :param stations: list of :class:`Station` objects.
+
+    """
+
+    def __init__(self, stations):
+        detectors = [detector for station in stations
+                     for detector in station.detectors]
+        timestamps = [[0]]
+        timestamps.extend(station.timestamps for station in stations)
+        timestamps.extend(detector.timestamps for detector in detectors)
+        self.epochs = np.unique(np.concatenate(timestamps))
+
+        self.station_index, self.station_offsets = self._index_table(
+            stations)
+        self.station_x, self.station_y, self.station_z, self.station_angle = [
+            self._concatenate(stations, attribute)
+            for attribute in ('x', 'y', 'z', 'angle')]
+
+        self.detector_index, self.detector_offsets = self._index_table(
+            detectors)
+        self.detector_x, self.detector_y, self.detector_z = [
+            self._concatenate(detectors, attribute)
+            for attribute in ('x', 'y', 'z')]
+        #: Index of the station of each detector.
+        self.detector_station = np.array(
+            [station_idx for station_idx, station in enumerate(stations)
+             for _ in station.detectors], dtype=int)
+
+        #: Station numbers, in order of the stations.
+        self.station_numbers = np.array([station.number
+                                         for station in stations])
+        #: Indices of the detectors of each station, padded with -1.
+        n_detectors = [len(station.detectors) for station in stations]
+        self.station_detectors = -np.ones(
+            (len(stations), max(n_detectors + [0])), dtype=int)
+        first = 0
+        for station_idx, n in enumerate(n_detectors):
+            self.station_detectors[station_idx, :n] = range(first, first + n)
+            first += n
+
+    def _index_table(self, objects):
+        """Active position index of each object for each epoch
+
+        :return: array of shape (epochs, objects) with the active position
+            indices and the offsets of the positions of each object in the
+            flat position arrays.
+
+        """
+        table = np.zeros((len(self.epochs), len(objects)), dtype=np.int32)
+        offsets = np.zeros(len(objects), dtype=int)
+        offset = 0
+        for i, obj in enumerate(objects):
+            indices = np.searchsorted(obj.timestamps, self.epochs, 'right')
+            table[:, i] = np.maximum(indices - 1, 0)
+            offsets[i] = offset
+            offset += len(obj.timestamps)
+        return table, offsets
+
+    @staticmethod
+    def _concatenate(objects, attribute):
+        return np.array([value for obj in objects
+                         for value in getattr(obj, attribute)], dtype=float)
+
+    def epoch(self, timestamp):
+        """Get the configuration epoch for timestamps
+
+        :param timestamp: timestamp in seconds, or array of timestamps.
+        :return: index of the epoch, or array of indices.
+
+        """
+        return np.maximum(
+            np.searchsorted(self.epochs, timestamp, 'right') - 1, 0)
+
+    def station_idx(self, station_numbers):
+        """Get the index of stations from their numbers
+
+        :param station_numbers: station number or array of numbers.
+        :return: index or array of indices of the stations.
+
+        """
+        station_numbers = np.asarray(station_numbers)
+        order = np.argsort(self.station_numbers, kind='mergesort')
+        sorted_numbers = self.station_numbers[order]
+        idx = np.searchsorted(sorted_numbers, station_numbers)
+        idx = np.minimum(idx, len(order) - 1)
+        if not len(order) or np.any(sorted_numbers[idx] != station_numbers):
+            raise KeyError('Unknown station number(s) in %s.' %
+                           str(station_numbers))
+        return order[idx]
+
+    def station_coordinates(self, epoch, cluster_coordinates,
+                            station_idx=None):
+        """Get the coordinates of stations
+
+        :param epoch: index of the configuration epoch, or an array of
+            indices matching station_idx.
+        :param cluster_coordinates: x, y, z, alpha of the cluster.
+        :param station_idx: array of station indices, by default all
+            stations.
+        :return: array with x, y, z, alpha for each station.
+
+        """
+        if station_idx is None:
+            station_idx = np.arange(len(self.station_offsets))
+        x0, y0, z0, alpha = cluster_coordinates
+        idx = self.station_index[epoch, station_idx]
+        idx += self.station_offsets[station_idx]
+        sina = np.sin(alpha)
+        cosa = np.cos(alpha)
+        x = self.station_x[idx]
+        y = self.station_y[idx]
+        return np.stack((x0 + x * cosa - y * sina,
+                         y0 + x * sina + y * cosa,
+                         z0 + self.station_z[idx],
+                         alpha + self.station_angle[idx]), axis=-1)
+
+    def detector_coordinates(self, epoch, cluster_coordinates,
+                             station_idx=None):
+        """Get the coordinates of detectors
+
+        :param epoch: index of the configuration epoch, or an array of
+            indices matching station_idx.
+        :param cluster_coordinates: x, y, z, alpha of the cluster.
+        :param station_idx: array of station indices.  If None the
+            coordinates of all detectors are returned in a flat array.
+        :return: array with x, y, z for each detector, in order of the
+            stations and the detectors in each station.  For an array of
+            station indices the shape is (stations, detectors, 3), with
+            NaN for stations with fewer detectors.
+
+        """
+        if station_idx is None:
+            detectors = np.arange(len(self.detector_station))
+            stations = self.station_coordinates(epoch, cluster_coordinates,
+                                                self.detector_station)
+        else:
+            epoch = np.asarray(epoch)[..., np.newaxis]
+            detectors = self.station_detectors[station_idx]
+            stations = self.station_coordinates(
+                epoch, cluster_coordinates,
+                np.asarray(station_idx)[..., np.newaxis])
+            missing = detectors < 0
+            detectors = np.where(missing, 0, detectors)
+        x0, y0, z0, alpha = np.moveaxis(stations, -1, 0)
+        idx = self.detector_index[epoch, detectors]
+        idx += self.detector_offsets[detectors]
+        sina = np.sin(alpha)
+        cosa = np.cos(alpha)
+        x = self.detector_x[idx]
+        y = self.detector_y[idx]
+        coordinates = np.stack((x0 + x * cosa - y * sina,
+                                y0 + x * sina + y * cosa,
+                                z0 + self.detector_z[idx]), axis=-1)
+        if station_idx is not None:
+            coordinates[missing] = np.nan
+        return coordinates
+
+
 class BaseCluster(object):
     """Base class for HiSPARC clusters"""
 
     _stations = None
+    _geometry = None
+    _epoch = None
 
     def __init__(self, position=(0, 0, 0), angle=0,
                  lla=(52.35592417, 4.95114402, 56.10234594)):
@@ -424,8 +595,120 @@ class BaseCluster(object):
 
         """
         self._timestamp = timestamp
-        for station in self.stations:
-            station._update_timestamp(self._timestamp)
+        self._set_epoch(self.geometry.epoch(timestamp))
+
+    @property
+    def geometry(self):
+        """The :class:`ClusterGeometry` of the stations in this cluster
+
+        It is rebuilt when stations are added.  Modify the positions of
+        stations or detectors only through the cluster, or reset
+        :attr:`_geometry` to None afterwards.
+
+        """
+        if self._geometry is None:
+            self._geometry = ClusterGeometry(self.stations or [])
+            self._epoch = None
+            self._set_epoch(self._geometry.epoch(self._timestamp))
+        return self._geometry
+
+    def _set_epoch(self, epoch):
+        """Update the active position index of all stations and detectors
+
+        :param epoch: index of the configuration epoch.
+
+        """
+        if epoch == self._epoch:
+            return
+        self._epoch = epoch
+        stations = self.stations or []
+        station_index = self._geometry.station_index[epoch].tolist()
+        detector_index = iter(self._geometry.detector_index[epoch].tolist())
+        for station, index in zip(stations, station_index):
+            station.index = index
+            for detector in station.detectors:
+                detector.index = next(detector_index)
+
+    def get_station_coordinates(self):
+        """Get the coordinates of all stations at once
+
+        :return: array with x, y, z, alpha for each station.
+
+        """
+        geometry = self.geometry
+        return geometry.station_coordinates(self._epoch,
+                                            self.get_coordinates())
+
+    def get_detector_coordinates(self):
+        """Get the coordinates of all detectors at once
+
+        :return: array with x, y, z for each detector, in order of the
+            stations and the detectors in each station.
+
+        """
+        geometry = self.geometry
+        return geometry.detector_coordinates(self._epoch,
+                                             self.get_coordinates())
+
+    def get_station_coordinates_at(self, timestamps, station_numbers):
+        """Get station coordinates for many timestamps at once
+
+        This does not change the timestamp set for the cluster.
+
+        :param timestamps: array of timestamps in seconds.
+        :param station_numbers: array of station numbers, matching the
+            timestamps.  Either may also be a single value.
+        :return: array with x, y, z, alpha for each timestamp.
+
+        """
+        geometry = self.geometry
+        timestamps, station_numbers = np.broadcast_arrays(timestamps,
+                                                          station_numbers)
+        return geometry.station_coordinates(
+            geometry.epoch(timestamps), self.get_coordinates(),
+            geometry.station_idx(station_numbers))
+
+    def get_detector_coordinates_at(self, timestamps, station_numbers):
+        """Get detector coordinates for many timestamps at once
+
+        This does not change the timestamp set for the cluster.
+
+        :param timestamps: array of timestamps in seconds.
+        :param station_numbers: array of station numbers, matching the
+            timestamps.  Either may also be a single value.
+        :return: array of shape (timestamps, detectors, 3) with x, y, z for
+            each detector of the station.  The coordinates of missing
+            detectors, for stations with fewer detectors, are NaN.
+
+        """
+        geometry = self.geometry
+        timestamps, station_numbers = np.broadcast_arrays(timestamps,
+                                                          station_numbers)
+        return geometry.detector_coordinates(
+            geometry.epoch(timestamps), self.get_coordinates(),
+            geometry.station_idx(station_numbers))
+
+    def calc_center_of_mass_coordinates_at(self, timestamps,
+                                           station_numbers):
+        """Calculate station centers for many timestamps at once
+
+        :param timestamps: array of timestamps in seconds.
+        :param station_numbers: array of station numbers, matching the
+            timestamps.  Either may also be a single value.
+        :return: array with x, y, z of the center of mass of the detectors
+            of the station for each timestamp.
+
+        """
+        detectors = self.get_detector_coordinates_at(timestamps,
+                                                     station_numbers)
+        return np.nanmean(detectors, axis=-2)
+
+    def __getstate__(self):
+        # The geometry is rebuilt when needed, do not pickle it
+        state = self.__dict__.copy()
+        state.pop('_geometry', None)
+        state.pop('_epoch', None)
+        return state
 
     def _add_station(self, position, angle=None, detectors=None,
                      station_timestamps=None, detector_timestamps=None,
@@ -467,6 +750,7 @@ class BaseCluster(object):
         self._stations.append(Station(self, station_id, position, angle,
                                       detectors, station_timestamps,
                                       detector_timestamps, number))
+        self._geometry = None
 
     def set_center_off_mass_at_origin(self):
         """Set the cluster center of mass to (0, 0, 0)"""
@@ -535,7 +819,7 @@ class BaseCluster(object):
         x, y, z, alpha = self.get_coordinates()
         enu = (x, y, z)
 
-        transform = geographic.FromWGS84ToENUTransformation(lla)
+        transform = geographic.enu_transformation(lla)
         latitude, longitude, altitude = transform.enu_to_lla(enu)
 
         return latitude, longitude, altitude
@@ -798,6 +1082,9 @@ class HiSPARCStations(CompassStations):
         location data, otherwise an exception will be raised. Stations
         with missing location data will be excluded. Does not apply
         to missing detector positions.
+    :param workers: if given, the station data is retrieved concurrently
+        using at most this number of requests at once.  By default the
+        stations are retrieved one at a time.
 
     Example::
 
@@ -806,19 +1093,30 @@ class HiSPARCStations(CompassStations):
     """
 
     def __init__(self, stations, skip_missing=False, force_fresh=False,
-                 force_stale=False):
+                 force_stale=False, workers=None):
         super(HiSPARCStations, self).__init__()
 
         missing_gps = []
         missing_detectors = []
         reference_required = True
 
-        for station in stations:
+        if workers is None:
+            station_infos = [None] * len(stations)
+        else:
+            station_infos = api.prefetch_stations(
+                stations, workers=workers, force_fresh=force_fresh,
+                force_stale=force_stale)
+
+        for station, station_info in zip(stations, station_infos):
             try:
-                station_info = api.Station(station, force_fresh=force_fresh,
-                                           force_stale=force_stale)
+                if station_info is None:
+                    station_info = api.Station(station,
+                                               force_fresh=force_fresh,
+                                               force_stale=force_stale)
                 locations = station_info.gps_locations
-                llas = locations[['latitude', 'longitude', 'altitude']]
+                llas = np.column_stack((locations['latitude'],
+                                        locations['longitude'],
+                                        locations['altitude']))
                 station_ts = locations['timestamp']
             except Exception:
                 if skip_missing:
@@ -833,14 +1131,12 @@ class HiSPARCStations(CompassStations):
             if reference_required:
                 # Get latest GPS location of first station with locations
                 # as reference
-                self.lla = llas[-1]
-                transformation = geographic.FromWGS84ToENUTransformation(
-                    self.lla)
+                self.lla = tuple(llas[-1])
+                transformation = geographic.enu_transformation(self.lla)
                 reference_required = False
 
             # Station locations in ENU
-            enu = [transformation.transform(lla) for lla in llas]
-            enu = [list(coordinate) for coordinate in zip(*enu)]
+            enu = transformation.transform(llas).T.tolist()
 
             try:
                 detectors = station_info.station_layouts
@@ -889,7 +1185,7 @@ class ScienceParkCluster(HiSPARCStations):
     """
 
     def __init__(self, stations=None, skip_missing=False, force_fresh=False,
-                 force_stale=False):
+                 force_stale=False, workers=None):
         if stations is None:
             network = api.Network(force_fresh, force_stale)
             stations = [sn for sn in network.station_numbers(subcluster=500)
@@ -897,19 +1193,21 @@ class ScienceParkCluster(HiSPARCStations):
         else:
             stations = [sn for sn in stations if 500 < sn < 600]
         super(ScienceParkCluster, self).__init__(stations, skip_missing,
-                                                 force_fresh, force_stale)
+                                                 force_fresh, force_stale,
+                                                 workers)
 
 
 class HiSPARCNetwork(HiSPARCStations):
 
     """A cluster containing all station from the HiSPARC network"""
 
-    def __init__(self, force_fresh=False, force_stale=False):
+    def __init__(self, force_fresh=False, force_stale=False, workers=None):
         network = api.Network(force_fresh, force_stale)
         stations = network.station_numbers()
         skip_missing = True  # Likely some station without GPS location
         super(HiSPARCNetwork, self).__init__(stations, skip_missing,
-                                             force_fresh, force_stale)
+                                             force_fresh, force_stale,
+                                             workers)
 
     def __repr__(self):
         return "<%s>" % self.__class__.__name__
@@ -928,3 +1226,4 @@ def flatten_cluster(cluster):
         station.z = [0.] * len(station.z)
         for detector in station.detectors:
             detector.z = [0.] * len(detector.z)
+    cluster._geometry = None
@@ -19,16 +19,19 @@ import datetime
 import itertools
 import os.path
 import re
+import threading
 import time
 
 from codecs import iterdecode
+from multiprocessing.pool import ThreadPool
 
+import numpy as np
 import tables
 
 from progressbar import ETA, Bar, Percentage, ProgressBar
 from six import itervalues
-from six.moves.http_client import BadStatusLine
-from six.moves.urllib.parse import urlencode
+from six.moves.http_client import BadStatusLine, HTTPConnection, HTTPSConnection
+from six.moves.urllib.parse import urlencode, urljoin, urlsplit
 from six.moves.urllib.request import urlopen
 
 from . import api, storage
@@ -40,6 +43,15 @@ SINGLES_URL = BASE + '{station_number:d}/singles/?{query}'
 LIGHTNING_URL = BASE + 'knmi/lightning/{lightning_type:d}/?{query}'
 COINCIDENCES_URL = BASE + 'network/coincidences/?{query}'
 
+#: Number of TSV lines which are parsed and stored at once.
+BLOCKSIZE = 10000
+
+#: Number of redirects which are followed when fetching data.
+MAX_REDIRECTS = 5
+
+# Connections to the data server, one per thread
+_connections = threading.local()
+
 
 def quick_download(station_number, date=None):
     """Quickly download some data
@@ -106,30 +118,17 @@ def load_data(file, group, tsv_file, type='events'):
         >>> sapphire.esd.load_data(data, '/s501', 'events-s501-20130910.tsv')
 
     """
-    if type == 'events':
-        table = _get_or_create_events_table(file, group)
-        read_and_store_class = _read_line_and_store_event_class
-    elif type == 'weather':
-        table = _get_or_create_weather_table(file, group)
-        read_and_store_class = _read_line_and_store_weather_class
-    elif type == 'singles':
-        table = _get_or_create_singles_table(file, group)
-        read_and_store_class = _read_line_and_store_singles_class
-    elif type == 'lightning':
-        table = _get_or_create_lightning_table(file, group)
-        read_and_store_class = _read_line_and_store_lightning_class
-    else:
-        raise ValueError("Data type not recognized.")
+    table, read_and_store_class = _get_table_and_writer(file, group, type)
 
     with open(tsv_file, 'rb') as data:
         reader = csv.reader(iterdecode(data, 'utf-8'), delimiter='\t')
         with read_and_store_class(table) as writer:
-            for line in reader:
-                writer.store_line(line)
+            for lines in _read_blocks(reader):
+                writer.store_lines(lines)
 
 
 def download_data(file, group, station_number, start=None, end=None,
-                  type='events', progress=True):
+                  type='events', progress=True, incremental=False):
     """Download event summary data
 
     :param file: the PyTables datafile handler.
@@ -142,6 +141,8 @@ def download_data(file, group, station_number, start=None, end=None,
     :param type: the datatype to download, either 'events', 'weather',
         or 'singles'.
     :param progress: if True show a progressbar while downloading.
+    :param incremental: if True only download the parts of the interval
+        which are not yet covered by data in the existing table.
 
     If group is None, use '/s<station_number>' as a default.
 
@@ -159,6 +160,27 @@ def download_data(file, group, station_number, start=None, end=None,
         >>> sapphire.esd.download_data(data, '/s501', 501,
         ...     datetime.datetime(2013, 9, 1), datetime.datetime(2013, 9, 2))
 
+    In incremental mode the downloaded intervals are recorded in the
+    ``downloaded_intervals`` attribute of the table, as a list of (start,
+    end) timestamps.  Only the parts of the interval which are not yet
+    recorded are downloaded.  This avoids duplicate events when refreshing
+    a file, for example to add the latest day to data of a longer period::
+
+        >>> sapphire.esd.download_data(data, '/s501', 501,
+        ...     datetime.datetime(2013, 9, 1), datetime.datetime(2013, 9, 3),
+        ...     incremental=True)
+
+    For tables without this attribute, for example after a download which
+    was not incremental, the data between the first and last timestamp in
+    the table is assumed to be downloaded.  An incremental download which
+    fails is removed from the table, such that it can simply be retried.
+
+    The table is kept in order of time.  Data from before existing data
+    is merged into the table, the rows after it are moved and their event
+    ids renumbered.  This would invalidate references to these events, so
+    this is refused if the group is used by coincidences or contains
+    analysis results, like reconstructions.
+
     """
     # sensible default for group name
     if group is None:
@@ -175,26 +197,32 @@ def download_data(file, group, station_number, start=None, end=None,
     if end is None:
         end = start + datetime.timedelta(days=1)
 
+    if incremental:
+        table, _ = _get_table_and_writer(file, group, type)
+        intervals = _uncovered_intervals(_get_downloaded_intervals(table),
+                                         start, end)
+        for interval_start, interval_end in intervals:
+            nrows = table.nrows
+            first_timestamp = calendar.timegm(interval_start.utctimetuple())
+            if nrows and first_timestamp <= table[nrows - 1]['timestamp']:
+                _check_not_referenced(file, table)
+            try:
+                download_data(file, group, station_number, interval_start,
+                              interval_end, type, progress)
+            except Exception:
+                # remove the incomplete download
+                table.remove_rows(nrows)
+                table.flush()
+                raise
+            _merge_new_rows(table, nrows)
+            _add_downloaded_interval(
+                table, first_timestamp,
+                calendar.timegm(interval_end.utctimetuple()))
+        return
+
     # build and open url, create tables and set read function
-    query = urlencode({'start': start, 'end': end})
-    if type == 'events':
-        url = EVENTS_URL.format(station_number=station_number, query=query)
-        table = _get_or_create_events_table(file, group)
-        read_and_store = _read_line_and_store_event_class
-    elif type == 'weather':
-        url = WEATHER_URL.format(station_number=station_number, query=query)
-        table = _get_or_create_weather_table(file, group)
-        read_and_store = _read_line_and_store_weather_class
-    elif type == 'singles':
-        url = SINGLES_URL.format(station_number=station_number, query=query)
-        table = _get_or_create_singles_table(file, group)
-        read_and_store = _read_line_and_store_singles_class
-    elif type == 'lightning':
-        url = LIGHTNING_URL.format(lightning_type=station_number, query=query)
-        table = _get_or_create_lightning_table(file, group)
-        read_and_store = _read_line_and_store_lightning_class
-    else:
-        raise ValueError("Data type not recognized.")
+    url = _get_data_url(station_number, start, end, type)
+    table, read_and_store = _get_table_and_writer(file, group, type)
 
     try:
         data = urlopen(url)
@@ -211,12 +239,13 @@ def download_data(file, group, station_number, start=None, end=None,
         pbar = ProgressBar(max_value=1.,
                            widgets=[Percentage(), Bar(), ETA()]).start()
 
-    # loop over lines in tsv as they come streaming in
+    # loop over blocks of lines in tsv as they come streaming in
     prev_update = time.time()
     reader = csv.reader(iterdecode(data, 'utf-8'), delimiter='\t')
     with read_and_store(table) as writer:
-        for line in reader:
-            timestamp = writer.store_line(line)
+        for lines in _read_blocks(reader):
+            timestamp = writer.store_lines(lines)
+            line = lines[-1]
             # update progressbar every 0.5 seconds
             if (progress and time.time() - prev_update > 0.5 and
                     not timestamp == 0.):
@@ -225,6 +254,320 @@ def download_data(file, group, station_number, start=None, end=None,
     if progress:
         pbar.finish()
 
+    _check_download_complete(line)
+
+
+def _get_downloaded_intervals(table):
+    """Get the intervals which are downloaded into a table
+
+    For tables without the ``downloaded_intervals`` attribute the data
+    between the first and last timestamp in the table is assumed to be
+    downloaded.  This interval is then stored in the attribute.
+
+    :param table: PyTables table with a timestamp column.
+    :return: list of (start, end) timestamps.
+
+    """
+    if 'downloaded_intervals' not in table.attrs:
+        if not table.nrows:
+            return []
+        timestamps = table.col('timestamp')
+        table.attrs.downloaded_intervals = [(int(timestamps.min()),
+                                             int(timestamps.max()) + 1)]
+    return table.attrs.downloaded_intervals
+
+
+def _uncovered_intervals(intervals, start, end):
+    """Determine the parts of an interval not covered by other intervals
+
+    :param intervals: list of (start, end) timestamps of the downloaded
+        intervals.
+    :param start,end: datetime instances defining the interval.
+    :return: list of (start, end) tuples of datetime instances.
+
+    """
+    t_start = calendar.timegm(start.utctimetuple())
+    t_end = calendar.timegm(end.utctimetuple())
+
+    bounds = []
+    uncovered_start = t_start
+    for covered_start, covered_end in sorted(intervals):
+        if covered_start > uncovered_start:
+            bounds.append((uncovered_start, min(covered_start, t_end)))
+        uncovered_start = max(uncovered_start, covered_end)
+        if uncovered_start >= t_end:
+            break
+    if t_end > uncovered_start:
+        bounds.append((uncovered_start, t_end))
+
+    return [(datetime.datetime.utcfromtimestamp(int(interval_start)),
+             datetime.datetime.utcfromtimestamp(int(interval_end)))
+            for interval_start, interval_end in bounds]
+
+
+def _add_downloaded_interval(table, start, end):
+    """Record an interval as downloaded in the table attributes
+
+    Overlapping and adjacent intervals are merged.
+
+    :param table: PyTables table in which the data was stored.
+    :param start,end: timestamps of the downloaded interval.
+
+    """
+    if 'downloaded_intervals' in table.attrs:
+        intervals = list(table.attrs.downloaded_intervals)
+    else:
+        intervals = []
+    merged = []
+    for interval_start, interval_end in sorted(intervals + [(start, end)]):
+        if merged and interval_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], interval_end))
+        else:
+            merged.append((int(interval_start), int(interval_end)))
+    table.attrs.downloaded_intervals = merged
+
+
+def _check_not_referenced(file, table):
+    """Check that the rows of a table may be moved
+
+    Raises a RuntimeError if the table is referenced by coincidences (via
+    an ``s_index`` containing its group), or if its group contains other
+    nodes than the downloaded data tables, like reconstructions.
+
+    :param file: the PyTables datafile handler.
+    :param table: PyTables table of downloaded data.
+
+    """
+    group = table._v_parent
+    references = [node._v_pathname for node in group
+                  if node._v_name not in ('events', 'weather', 'singles',
+                                          'lightning')]
+    path = group._v_pathname.encode('utf-8')
+    for s_index in file.walk_nodes('/', 'VLArray'):
+        if s_index.name == 's_index' and path in s_index.read():
+            references.append(s_index._v_parent._v_pathname)
+    if references:
+        raise RuntimeError("Data before existing data can not be added to "
+                           "%s, because it is used by %s. Remove these "
+                           "first, or use a new group." %
+                           (table._v_pathname, ', '.join(references)))
+
+
+def _merge_new_rows(table, nrows):
+    """Move rows appended to a table into order of time
+
+    The appended rows are sorted, only the rows after the first appended
+    row are read and rewritten.  Their event ids are renumbered, such
+    that they stay equal to the row numbers.
+
+    :param table: PyTables table with a timestamp column.
+    :param nrows: number of rows in the table before appending.
+
+    """
+    if 'ext_timestamp' in table.colnames:
+        sort_column = 'ext_timestamp'
+    else:
+        sort_column = 'timestamp'
+    if nrows == 0 or table.nrows == nrows:
+        return
+    first_new = table.read(nrows, field=sort_column).min()
+    if table[nrows - 1][sort_column] <= first_new:
+        return
+
+    start = np.searchsorted(table.read(0, nrows, field=sort_column),
+                            first_new, side='right')
+    rows = table.read(start)
+    rows = rows[rows[sort_column].argsort(kind='mergesort')]
+    if 'event_id' in table.colnames:
+        rows['event_id'] = np.arange(start, start + len(rows))
+    table.modify_rows(start, start + len(rows), rows=rows)
+    table.flush()
+
+
+def download_multiple_data(file, station_numbers, start, end, type='events',
+                           group='/s{station_number:d}', workers=4,
+                           progress=True):
+    """Download event summary data for multiple stations and days
+
+    The interval is split into days, the data for each station and day is
+    downloaded separately.  The downloads are performed concurrently by
+    a pool of threads, each reusing its connection to the server.  For
+    each station the days are stored in order of time.
+
+    Completed days are recorded in the ``downloaded_intervals`` attribute
+    of the table, like incremental downloads by :func:`download_data`.  If
+    a download is interrupted, calling this function again only downloads
+    the parts of the days which are missing.  The data of a day which is
+    not completely stored is removed from the table.  Tables without this
+    attribute and data before existing data are handled as described for
+    incremental downloads by :func:`download_data`.
+
+    :param file: the PyTables datafile handler.
+    :param station_numbers: list of HiSPARC station numbers for which to get
+        data.  For lightning data these are the lightning types.
+    :param start: a datetime instance defining the start of the search
+        interval.
+    :param end: a datetime instance defining the end of the search
+        interval.
+    :param type: the datatype to download, either 'events', 'weather',
+        'singles' or 'lightning'.
+    :param group: the PyTables destination group for each station, formatted
+        with the station number.
+    :param workers: maximum number of concurrent downloads.
+    :param progress: if True show a progressbar while downloading.
+
+    Example::
+
+        >>> import tables
+        >>> import datetime
+        >>> import sapphire.esd
+        >>> data = tables.open_file('data.h5', 'w')
+        >>> sapphire.esd.download_multiple_data(data, [501, 502],
+        ...     datetime.datetime(2013, 9, 1), datetime.datetime(2013, 10, 1))
+
+    """
+    days = _split_in_days(start, end)
+
+    tables_and_writers = {}
+    downloads = []
+    for station_number in station_numbers:
+        station_group = group.format(station_number=station_number)
+        table, read_and_store = _get_table_and_writer(file, station_group,
+                                                      type)
+        tables_and_writers[station_number] = (table, read_and_store)
+        downloaded_intervals = _get_downloaded_intervals(table)
+        if table.nrows:
+            last_timestamp = table[table.nrows - 1]['timestamp']
+        for day_start, day_end in days:
+            for interval_start, interval_end in _uncovered_intervals(
+                    downloaded_intervals, day_start, day_end):
+                t_start = calendar.timegm(interval_start.utctimetuple())
+                if table.nrows and t_start <= last_timestamp:
+                    _check_not_referenced(file, table)
+                downloads.append((
+                    t_start, calendar.timegm(interval_end.utctimetuple()),
+                    station_number,
+                    _get_data_url(station_number, interval_start,
+                                  interval_end, type)))
+    # download days in order of time, every station in a day at once
+    downloads.sort()
+
+    if progress and downloads:
+        pbar = ProgressBar(max_value=len(downloads),
+                           widgets=[Percentage(), Bar(), ETA()]).start()
+
+    # limit the number of downloads waiting to be stored
+    in_flight = threading.Semaphore(2 * workers)
+    stopped = threading.Event()
+
+    def urls():
+        for _, _, _, url in downloads:
+            in_flight.acquire()
+            if stopped.is_set():
+                return
+            yield url
+
+    pool = ThreadPool(workers)
+    try:
+        results = pool.imap(_fetch_tsv, urls())
+        for i, ((t_start, t_end, station_number, _), data) in enumerate(
+                zip(downloads, results)):
+            in_flight.release()
+            table, read_and_store = tables_and_writers[station_number]
+            data = data.decode('utf-8').splitlines()
+            # only store complete downloads, such that the day can be retried
+            _check_download_complete(next(csv.reader(data[-1:] or ['#'],
+                                                     delimiter='\t')))
+            reader = csv.reader(data, delimiter='\t')
+            nrows = table.nrows
+            try:
+                with read_and_store(table) as writer:
+                    for lines in _read_blocks(reader):
+                        writer.store_lines(lines)
+                _merge_new_rows(table, nrows)
+                _add_downloaded_interval(table, t_start, t_end)
+            except BaseException:
+                # remove the partially stored day
+                table.remove_rows(nrows)
+                table.flush()
+                raise
+            if progress:
+                pbar.update(i + 1)
+    finally:
+        stopped.set()
+        in_flight.release()
+        pool.terminate()
+        pool.join()
+
+    if progress and downloads:
+        pbar.finish()
+
+
+def _split_in_days(start, end):
+    """Split an interval in intervals ending at midnight
+
+    :return: list of (start, end) tuples of datetime instances.
+
+    """
+    days = []
+    while start < end:
+        midnight = datetime.datetime.combine(start.date(), datetime.time())
+        day_end = min(midnight + datetime.timedelta(days=1), end)
+        days.append((start, day_end))
+        start = day_end
+    return days
+
+
+def _fetch_tsv(url, max_redirects=MAX_REDIRECTS):
+    """Fetch data from the server
+
+    Each thread keeps a connection open to the server, which is reused
+    for subsequent requests.  Redirects are followed.
+
+    :param url: the url from which to get the data.
+    :param max_redirects: maximum number of redirects to follow.
+    :return: the complete response body.
+
+    """
+    scheme, netloc, path, query, _ = urlsplit(url)
+    if not hasattr(_connections, 'connections'):
+        _connections.connections = {}
+    if (scheme, netloc) not in _connections.connections:
+        if scheme == 'https':
+            connection = HTTPSConnection(netloc, timeout=1800)
+        else:
+            connection = HTTPConnection(netloc, timeout=1800)
+        _connections.connections[(scheme, netloc)] = connection
+    connection = _connections.connections[(scheme, netloc)]
+
+    try:
+        connection.request('GET', '%s?%s' % (path, query))
+        response = connection.getresponse()
+    except (BadStatusLine, IOError):
+        # The server may have closed the connection, retry once
+        connection.close()
+        connection.request('GET', '%s?%s' % (path, query))
+        response = connection.getresponse()
+
+    data = response.read()
+    if response.status in [301, 302, 303, 307, 308]:
+        if max_redirects <= 0:
+            raise Exception('Failed to download data, too many redirects '
+                            'for %s.' % url)
+        return _fetch_tsv(urljoin(url, response.getheader('Location')),
+                          max_redirects - 1)
+    elif response.status != 200:
+        raise Exception('Failed to download data, server responded with '
+                        'status %d for %s.' % (response.status, url))
+    return data
+
+
+def _check_download_complete(line):
+    """Check if the last line of a TSV download indicates success
+
+    :param line: the last line of the download.
+
+    """
     if line[0][0] == '#':
         if len(line[0]) == 1:
             # No events recieved, and no success line
@@ -452,6 +795,55 @@ def download_coincidences(file, group='', cluster=None, stations=None,
     file.flush()
 
 
+def _get_data_url(station_number, start, end, type):
+    """Get the url to download data of a type
+
+    :param station_number: station number, or lightning type for lightning
+        data.
+    :param start,end: datetime instances defining the interval.
+    :param type: the datatype, either 'events', 'weather', 'singles' or
+        'lightning'.
+
+    """
+    query = urlencode({'start': start, 'end': end})
+    if type == 'events':
+        return EVENTS_URL.format(station_number=station_number, query=query)
+    elif type == 'weather':
+        return WEATHER_URL.format(station_number=station_number, query=query)
+    elif type == 'singles':
+        return SINGLES_URL.format(station_number=station_number, query=query)
+    elif type == 'lightning':
+        return LIGHTNING_URL.format(lightning_type=station_number, query=query)
+    else:
+        raise ValueError("Data type not recognized.")
+
+
+def _get_table_and_writer(file, group, type):
+    """Get or create the table for a datatype and its writer class
+
+    :param file: the PyTables datafile handler.
+    :param group: the PyTables destination group, which need not exist.
+    :param type: the datatype, either 'events', 'weather', 'singles' or
+        'lightning'.
+    :return: table and the class to store TSV lines in that table.
+
+    """
+    if type == 'events':
+        return (_get_or_create_events_table(file, group),
+                _read_line_and_store_event_class)
+    elif type == 'weather':
+        return (_get_or_create_weather_table(file, group),
+                _read_line_and_store_weather_class)
+    elif type == 'singles':
+        return (_get_or_create_singles_table(file, group),
+                _read_line_and_store_singles_class)
+    elif type == 'lightning':
+        return (_get_or_create_lightning_table(file, group),
+                _read_line_and_store_lightning_class)
+    else:
+        raise ValueError("Data type not recognized.")
+
+
 def _read_or_get_station_groups(file, group):
     """Get station numbers from existing cluster attribute or a new set
 
@@ -683,6 +1075,21 @@ def _create_lightning_table(file, group):
                              createparents=True)
 
 
+def _read_blocks(reader, blocksize=BLOCKSIZE):
+    """Read lines from a TSV reader in blocks
+
+    :param reader: csv reader for the TSV data.
+    :param blocksize: maximum number of lines per block.
+    :return: generator yielding non-empty lists of lines.
+
+    """
+    while True:
+        lines = list(itertools.islice(reader, blocksize))
+        if not lines:
+            break
+        yield lines
+
+
 def _read_lines_and_store_coincidence(file, c_group, coincidence,
                                       station_groups):
     """Read TSV lines and store coincidence
@@ -735,12 +1142,25 @@ class _read_line_and_store_event_class(object):
     """Store lines of event data from the ESD
 
     Use this contextmanager to store events from a TSV file into a PyTables
-    table.
+    table.  Lines can be stored one at a time using :meth:`store_line`, or
+    in blocks using :meth:`store_lines`.
 
     :param table: a PyTables Table object in which to store the data.
 
     """
 
+    #: Number of columns in the TSV data.
+    n_tsv_columns = 23
+
+    #: Table column and the corresponding TSV column(s).
+    tsv_columns = [('timestamp', 2),
+                   ('nanoseconds', 3),
+                   ('pulseheights', slice(4, 8)),
+                   ('integrals', slice(8, 12)),
+                   ('n1', 12), ('n2', 13), ('n3', 14), ('n4', 15),
+                   ('t1', 16), ('t2', 17), ('t3', 18), ('t4', 19),
+                   ('t_trigger', 20)]
+
     def __init__(self, table):
         self.table = table
         self.event_counter = len(self.table)
@@ -748,6 +1168,44 @@ class _read_line_and_store_event_class(object):
     def __enter__(self):
         return self
 
+    def store_lines(self, lines):
+        """Store a block of lines at once
+
+        The lines are converted to a structured array matching the table,
+        which is then appended to the table at once.
+
+        :param lines: list of lines to store, each a list of strings (one
+                      element per column).  Comment lines are ignored.
+        :return: timestamp of the last stored event, or 0 if the lines only
+                 contained comments.
+
+        """
+        lines = [line[:self.n_tsv_columns] for line in lines
+                 if line and not line[0].startswith('#')]
+        if not lines:
+            return 0.
+        values = np.array(lines)
+
+        events = np.zeros(len(lines), dtype=self.table.dtype)
+        events['event_id'] = np.arange(self.event_counter,
+                                       self.event_counter + len(lines))
+        for column, tsv_column in self.tsv_columns:
+            # convert via int64 or float64, like the int and float builtins
+            if events.dtype[column].base.kind == 'f':
+                events[column] = values[:, tsv_column].astype(np.float64)
+            else:
+                events[column] = values[:, tsv_column].astype(np.int64)
+        if 'ext_timestamp' in events.dtype.names:
+            seconds = events['timestamp'].astype(np.uint64)
+            nanoseconds = events['nanoseconds']
+            events['ext_timestamp'] = seconds * np.uint64(1e9) + nanoseconds
+
+        self.table.append(events)
+        self.event_counter += len(events)
+        self.table.flush()
+
+        return int(events['timestamp'][-1])
+
     def store_line(self, line):
         """Store a single line
 
@@ -803,6 +1261,23 @@ class _read_line_and_store_weather_class(_read_line_and_store_event_class):
 
     """Store lines of weather data from the ESD"""
 
+    n_tsv_columns = 17
+    tsv_columns = [('timestamp', 2),
+                   ('temp_inside', 3),
+                   ('temp_outside', 4),
+                   ('humidity_inside', 5),
+                   ('humidity_outside', 6),
+                   ('barometer', 7),
+                   ('wind_dir', 8),
+                   ('wind_speed', 9),
+                   ('solar_rad', 10),
+                   ('uv', 11),
+                   ('evapotranspiration', 12),
+                   ('rain_rate', 13),
+                   ('heat_index', 14),
+                   ('dew_point', 15),
+                   ('wind_chill', 16)]
+
     def store_line(self, line):
         # ignore comment lines
         if line[0][0] == '#':
@@ -850,6 +1325,17 @@ class _read_line_and_store_singles_class(_read_line_and_store_event_class):
 
     """Store lines of singles data from the ESD"""
 
+    n_tsv_columns = 11
+    tsv_columns = [('timestamp', 2),
+                   ('mas_ch1_low', 3),
+                   ('mas_ch1_high', 4),
+                   ('mas_ch2_low', 5),
+                   ('mas_ch2_high', 6),
+                   ('slv_ch1_low', 7),
+                   ('slv_ch1_high', 8),
+                   ('slv_ch2_low', 9),
+                   ('slv_ch2_high', 10)]
+
     def store_line(self, line):
         # ignore comment lines
         if line[0][0] == '#':
@@ -889,6 +1375,13 @@ class _read_line_and_store_lightning_class(_read_line_and_store_event_class):
 
     """Store lines of lightning data from the ESD"""
 
+    n_tsv_columns = 7
+    tsv_columns = [('timestamp', 2),
+                   ('nanoseconds', 3),
+                   ('latitude', 4),
+                   ('longitude', 5),
+                   ('current', 6)]
+
     def store_line(self, line):
         # ignore comment lines
         if line[0][0] == '#':
@@ -18,6 +18,11 @@ MIP = 3.38  # MeV
 
 ELECTRON_REST_MASS_MeV = 0.5109989  # MeV
 
+# Photon energy grid of the precomputed Compton recoil table [MeV]
+COMPTON_TABLE_ENERGIES = np.logspace(-3, 5, 161)
+# Number of quantiles in the precomputed Compton recoil table
+COMPTON_TABLE_QUANTILES = 1001
+
 
 def compton_edge(gamma_energy):
     """Calculate Compton edge for a given photon energy
@@ -85,6 +90,79 @@ def energy_transfer_cross_section(gamma_energy, recoil_energy):
             (s / (1 - s)) * (s - 2 / gamma)))
 
 
+def compton_energy_transfer_table(gamma_energies=COMPTON_TABLE_ENERGIES,
+                                  n_quantiles=COMPTON_TABLE_QUANTILES):
+    """Tabulate the inverse cumulative distribution of the energy transfer
+
+    For each photon energy the cumulative distribution of the energy
+    transfer is calculated in the same way as in
+    :func:`compton_energy_transfer`. The inverse of each distribution is
+    sampled at equally spaced quantiles.
+
+    :param gamma_energies: photon energies [MeV].
+    :param n_quantiles: number of quantiles between 0 and 1 (inclusive).
+    :return: array with shape (len(gamma_energies), n_quantiles) of the
+             transfered energies as fraction of the compton edge.
+
+    """
+    gamma_energies = np.asarray(gamma_energies, dtype=float)
+    fractions = np.arange(1000) / 1000
+    edges = compton_edge(gamma_energies)[:, np.newaxis]
+    recoil_energies = edges * np.linspace(0, 1, 1000)
+
+    # electron energy distributions
+    electron_energy = energy_transfer_cross_section(
+        gamma_energies[:, np.newaxis], recoil_energies)
+    cumulative_energy = np.cumsum(electron_energy, axis=1)
+    total_energy = cumulative_energy[:, -1:]
+    normalised_energy_distribution = cumulative_energy / total_energy
+
+    quantiles = np.linspace(0, 1, n_quantiles)
+    return np.array([np.interp(quantiles, distribution, fractions)
+                     for distribution in normalised_energy_distribution])
+
+
+COMPTON_TABLE = compton_energy_transfer_table()
+
+
+def compton_energy_transfer_batch(gamma_energies):
+    """Calculate the energy transfers from photons to electrons
+
+    Vectorized equivalent of :func:`compton_energy_transfer`. Instead of
+    calculating the cumulative distribution for each photon, random
+    energy transfers are drawn from the precomputed inverse cumulative
+    distributions in :data:`COMPTON_TABLE`, interpolated in both the
+    quantile and the (logarithm of the) photon energy. Energies outside
+    the table are clipped to its range.
+
+    :param gamma_energies: array of photon energies [MeV].
+    :return: array of transfered energies [MeV].
+
+    """
+    gamma_energies = np.asarray(gamma_energies, dtype=float)
+    log_energies = np.log10(COMPTON_TABLE_ENERGIES)
+    n_energies, n_quantiles = COMPTON_TABLE.shape
+
+    # fractional index in the energy axis of the table
+    position = np.interp(np.log10(gamma_energies), log_energies,
+                         np.arange(n_energies))
+    idx = np.minimum(position.astype(int), n_energies - 2)
+    weight = position - idx
+
+    # fractional index in the quantile axis of the table
+    quantile = np.random.random(gamma_energies.shape) * (n_quantiles - 1)
+    jdx = np.minimum(quantile.astype(int), n_quantiles - 2)
+    qweight = quantile - jdx
+
+    lower = (1 - qweight) * COMPTON_TABLE[idx, jdx]
+    lower += qweight * COMPTON_TABLE[idx, jdx + 1]
+    upper = (1 - qweight) * COMPTON_TABLE[idx + 1, jdx]
+    upper += qweight * COMPTON_TABLE[idx + 1, jdx + 1]
+    conversion_factor = (1 - weight) * lower + weight * upper
+
+    return compton_edge(gamma_energies) * conversion_factor
+
+
 def max_energy_deposit_in_mips(depth, scintillator_depth):
     """Maximum energy transfer from electron to scintillator
 
@@ -151,6 +229,55 @@ def simulate_detector_mips_gammas(p, theta):
     return mips
 
 
+def simulate_detector_mips_gammas_batch(p, theta):
+    """Simulate detection of gammas
+
+    Vectorized equivalent of :func:`simulate_detector_mips_gammas`. The
+    interaction depths are sampled for all gammas at once and the
+    Compton energy transfers are drawn using
+    :func:`compton_energy_transfer_batch`.
+
+    :param p: the momenta of the gammas as array, in eV.
+    :param theta: angles of incidence of the gammas as array, in radians.
+    :return: the simulated detector signal (in mips).
+
+    """
+    # p [eV] and E [MeV]
+    energies = np.asarray(p, dtype=float) / 1e6
+    theta = np.asarray(theta, dtype=float)
+
+    # project depth onto direction of incident particle
+    scintillator_depth = np.minimum(SCINTILLATOR_THICKNESS / np.cos(theta),
+                                    MAX_DEPTH)
+
+    # Calculate interaction points.
+    # If depth > scintillator depth there is no interaction.
+    depth_compton = np.random.exponential(compton_mean_free_path(energies))
+    depth_pair = np.random.exponential(pair_mean_free_path(energies))
+
+    interaction = depth_pair <= scintillator_depth
+    interaction |= depth_compton <= scintillator_depth
+    compton = interaction & (depth_compton < depth_pair)
+    pair = interaction & ~compton & (energies > 1.022)
+
+    # Compton scattering
+    # kinetic energy transfered to electron by compton scattering
+    energy_deposit = compton_energy_transfer_batch(energies[compton]) / MIP
+    max_deposit = max_energy_deposit_in_mips(depth_compton[compton],
+                                             scintillator_depth[compton])
+    mips = np.minimum(max_deposit, energy_deposit).sum()
+
+    # Pair production: Two "electrons"
+    # 1.022 MeV used for creation of two particles
+    # all the rest is electron kinetic energy
+    energy_deposit = (energies[pair] - 1.022) / MIP
+    max_deposit = max_energy_deposit_in_mips(depth_pair[pair],
+                                             scintillator_depth[pair])
+    mips += np.minimum(max_deposit, energy_deposit).sum()
+
+    return mips
+
+
 def pair_mean_free_path(gamma_energy):
     """Mean free path pair production
 
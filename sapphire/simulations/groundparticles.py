@@ -26,7 +26,7 @@ import tables
 from ..corsika.corsika_queries import CorsikaQuery
 from ..utils import c, closest_in_list, norm_angle, pbar, vector_length
 from .detector import ErrorlessSimulation, HiSPARCSimulation
-from .gammas import simulate_detector_mips_gammas
+from .gammas import simulate_detector_mips_gammas_batch
 
 
 class GroundParticlesSimulation(HiSPARCSimulation):
@@ -358,7 +358,7 @@ class GroundParticlesGammaSimulation(GroundParticlesSimulation):
         theta = np.arccos(abs(particles['p_z']) /
                           p_gamma)
 
-        mips = simulate_detector_mips_gammas(p_gamma, theta)
+        mips = simulate_detector_mips_gammas_batch(p_gamma, theta)
 
         return mips
 
@@ -6,8 +6,9 @@ import unittest
 import tables
 
 from mock import Mock, patch, sentinel
-from numpy import uint64
+from numpy import array, concatenate, random, sort, uint64, unique, zeros
 
+from sapphire import storage
 from sapphire.analysis import coincidences
 from sapphire.tests.validate_results import validate_results
 
@@ -50,11 +51,12 @@ class CoincidencesTests(unittest.TestCase):
         station2.col.return_value = [uint64(1400000002000000510), uint64(1400000030000000000)][::-1]
         stations = [station1, station2]
         timestamps = self.c._retrieve_timestamps(stations)
-        self.assertEqual(timestamps,
+        self.assertEqual(timestamps.dtype, coincidences.TIMESTAMPS_DTYPE)
+        self.assertEqual(timestamps.tolist(),
                          [(uint64(1400000002000000050), 0, 0), (uint64(1400000002000000510), 1, 1),
                           (uint64(1400000018000000500), 0, 1), (uint64(1400000030000000000), 1, 0)])
         # Shift both
-        timestamps = self.c._retrieve_timestamps(stations, shifts=[1, 17])
+        timestamps = self.c._retrieve_timestamps(stations, shifts=[1, 17]).tolist()
         self.assertEqual(timestamps,
                          [(uint64(1400000003000000050), 0, 0), (uint64(1400000019000000500), 0, 1),
                           (uint64(1400000019000000510), 1, 1), (uint64(1400000047000000000), 1, 0)])
@@ -62,27 +64,26 @@ class CoincidencesTests(unittest.TestCase):
         self.assertRaises(TypeError, self.c._retrieve_timestamps, stations, shifts=['', ''])
         self.assertRaises(TypeError, self.c._retrieve_timestamps, stations, shifts=['', 90])
         # Different length shifts
-        timestamps = self.c._retrieve_timestamps(stations, shifts=[110])
+        timestamps = self.c._retrieve_timestamps(stations, shifts=[110]).tolist()
         self.assertEqual(timestamps,
                          [(uint64(1400000002000000510), 1, 1), (uint64(1400000030000000000), 1, 0),
                           (uint64(1400000112000000050), 0, 0), (uint64(1400000128000000500), 0, 1)])
-        timestamps = self.c._retrieve_timestamps(stations, shifts=[None, 60])
+        timestamps = self.c._retrieve_timestamps(stations, shifts=[None, 60]).tolist()
         self.assertEqual(timestamps,
                          [(uint64(1400000002000000050), 0, 0), (uint64(1400000018000000500), 0, 1),
                           (uint64(1400000062000000510), 1, 1), (uint64(1400000090000000000), 1, 0)])
         # Subsecond shifts
-        timestamps = self.c._retrieve_timestamps(stations, shifts=[3e-9, 5e-9])
+        timestamps = self.c._retrieve_timestamps(stations, shifts=[3e-9, 5e-9]).tolist()
         self.assertEqual(timestamps,
                          [(uint64(1400000002000000053), 0, 0), (uint64(1400000002000000515), 1, 1),
                           (uint64(1400000018000000503), 0, 1), (uint64(1400000030000000005), 1, 0)])
         # Using limits
-        timestamps = self.c._retrieve_timestamps(stations, limit=1)
+        timestamps = self.c._retrieve_timestamps(stations, limit=1).tolist()
         self.assertEqual(timestamps,
                          [(uint64(1400000002000000050), 0, 0), (uint64(1400000030000000000), 1, 0)])
-        # This should fail but does not
-        self.assertEqual(timestamps,
-                         [(1400000002000000049, 0, 0), (1400000030000000000, 1, 0)])
-        # Using uint64 does work correctly
+        # Compare using integers, no loss of precision
+        self.assertNotEqual(timestamps,
+                            [(1400000002000000049, 0, 0), (1400000030000000000, 1, 0)])
         self.assertNotEqual(timestamps,
                             [(uint64(1400000002000000049), 0, 0), (uint64(1400000030000000000), 1, 0)])
         self.assertNotEqual(timestamps,
@@ -90,9 +91,9 @@ class CoincidencesTests(unittest.TestCase):
 
     def test__do_search_coincidences(self):
         # [(timestamp, station_idx, event_idx), ..]
-        timestamps = [(uint64(0), 0, 0), (uint64(0), 1, 0), (uint64(10), 1, 1),
-                      (uint64(15), 2, 0), (uint64(100), 1, 2), (uint64(200), 2, 1),
-                      (uint64(250), 0, 1), (uint64(251), 0, 2)]
+        timestamps = array([(0, 0, 0), (0, 1, 0), (10, 1, 1), (15, 2, 0),
+                            (100, 1, 2), (200, 2, 1), (250, 0, 1), (251, 0, 2)],
+                           dtype=coincidences.TIMESTAMPS_DTYPE)
 
         c = self.c._do_search_coincidences(timestamps, window=6)
         expected_coincidences = [[0, 1], [2, 3], [6, 7]]
@@ -107,6 +108,158 @@ class CoincidencesTests(unittest.TestCase):
         self.assertEqual(c, expected_coincidences)
 
 
+class CoincidenceWindowsTests(unittest.TestCase):
+
+    def test_coincidence_windows(self):
+        ext_timestamps = [0, 0, 10, 15, 100, 200, 250, 251]
+        starts, stops = coincidences.coincidence_windows(ext_timestamps, 6)
+        self.assertEqual(list(starts), [0, 2, 6])
+        self.assertEqual(list(stops), [2, 4, 8])
+        starts, stops = coincidences.coincidence_windows(ext_timestamps, 150)
+        self.assertEqual(list(starts), [0, 4, 5])
+        self.assertEqual(list(stops), [5, 6, 8])
+        starts, stops = coincidences.coincidence_windows(ext_timestamps, 0)
+        self.assertEqual(len(starts), 0)
+        starts, stops = coincidences.coincidence_windows([], 10)
+        self.assertEqual(len(starts), 0)
+
+    def test_identical_to_nested_loop(self):
+        """Compare to a direct implementation of the original search"""
+
+        random.seed(42)
+        ext_timestamps = array(sorted(random.randint(0, 100000, 2000)),
+                               dtype=uint64)
+        for window in [1, 50, 200, 1000]:
+            expected = []
+            prev = []
+            for i in range(len(ext_timestamps)):
+                c = [i]
+                for j in range(i + 1, len(ext_timestamps)):
+                    if ext_timestamps[j] - ext_timestamps[i] < window:
+                        c.append(j)
+                    else:
+                        break
+                if len(c) > 1 and not all(u in prev for u in c):
+                    expected.append(c)
+                    prev = c
+            starts, stops = coincidences.coincidence_windows(ext_timestamps,
+                                                             window)
+            result = [list(range(start, stop))
+                      for start, stop in zip(starts, stops)]
+            self.assertEqual(result, expected)
+
+
+class IterCoincidencesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.data = self.open_data()
+        random.seed(42)
+        self.event_tables = []
+        for station in range(3):
+            event_table = self.data.create_table('/s%d' % station, 'events',
+                                                 storage.EventObservables,
+                                                 createparents=True)
+            events = zeros(random.randint(100, 500), dtype=event_table.dtype)
+            events['ext_timestamp'] = sorted(random.randint(0, 10 ** 6,
+                                                            len(events)))
+            events['ext_timestamp'] += uint64(1400000000000000000)
+            event_table.append(events)
+            self.event_tables.append(event_table)
+        self.c = coincidences.Coincidences(self.data, None, [],
+                                           progress=False)
+
+    def tearDown(self):
+        self.data.close()
+
+    def open_data(self):
+        return tables.open_file('iter_coincidences.h5', 'w',
+                                driver='H5FD_CORE',
+                                driver_core_backing_store=0)
+
+    def test_identical_to_search_in_memory(self):
+        for window, shifts, limit in [(100, None, None), (2000, None, 50),
+                                      (500, [None, 1e-6, -3e-6], None)]:
+            timestamps = self.c._retrieve_timestamps(self.event_tables,
+                                                     shifts, limit)
+            c_index = self.c._do_search_coincidences(timestamps, window)
+            expected = [timestamps[c].tolist() for c in c_index]
+            for chunksize in [1, 13, 1000]:
+                c_index, timestamps = self.c._stream_coincidences(
+                    self.event_tables, window, shifts, limit, chunksize)
+                result = [timestamps[c].tolist() for c in c_index]
+                self.assertEqual(result, expected)
+                # events shared by coincidences are only included once
+                self.assertEqual(len(unique(timestamps)), len(timestamps))
+
+    def test_events_do_not_share_memory(self):
+        # the yielded events should not keep the chunk buffers alive
+        for _, events in coincidences.iter_coincidences(self.event_tables,
+                                                        2000, chunksize=13):
+            self.assertIsNone(events.base)
+
+    def test_unsorted_events(self):
+        events = self.event_tables[0].read()
+        self.event_tables[0].modify_rows(0, 2, rows=events[1::-1])
+        generator = coincidences.iter_coincidences(self.event_tables, 1000)
+        self.assertRaises(RuntimeError, list, generator)
+
+
+class IterCoincidencesInSlicesTests(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.data_path = tempfile.mkstemp('.h5')
+        os.close(fd)
+        self.data = tables.open_file(self.data_path, 'w')
+        random.seed(42)
+        self.event_tables = []
+        for station in range(3):
+            event_table = self.data.create_table('/s%d' % station, 'events',
+                                                 storage.EventObservables,
+                                                 createparents=True)
+            events = zeros(random.randint(100, 500), dtype=event_table.dtype)
+            events['ext_timestamp'] = sorted(random.randint(0, 10 ** 6,
+                                                            len(events)))
+            events['ext_timestamp'] += uint64(1400000000000000000)
+            event_table.append(events)
+            self.event_tables.append(event_table)
+        self.c = coincidences.Coincidences(self.data, None,
+                                           ['/s0', '/s1', '/s2'],
+                                           progress=False)
+
+    def tearDown(self):
+        self.data.close()
+        os.remove(self.data_path)
+
+    def test_identical_to_serial_search(self):
+        # slices both shorter and longer than the window
+        for window, shifts, limit, slice_length in [
+                (100, None, None, 1e-5), (20000, None, 50, 1e-5),
+                (500, [None, 1e-6, -3e-6], None, 86400)]:
+            c_index, timestamps = self.c._search_coincidences(window, shifts,
+                                                              limit)
+            expected = [timestamps[c].tolist() for c in c_index]
+            c_index, timestamps = self.c._search_coincidences(
+                window, shifts, limit, workers=2, slice_length=slice_length)
+            result = [timestamps[c].tolist() for c in c_index]
+            self.assertEqual(result, expected)
+            # events shared by coincidences are only included once
+            self.assertEqual(len(unique(timestamps)), len(timestamps))
+
+    def test_no_events(self):
+        event_tables = [self.data.create_table('/empty', 'events',
+                                               storage.EventObservables,
+                                               createparents=True)]
+        self.assertEqual(list(coincidences.iter_coincidences_in_slices(
+            event_tables, 1000, workers=2)), [])
+
+    def test_unsorted_events(self):
+        events = self.event_tables[0].read()
+        self.event_tables[0].modify_rows(0, 2, rows=events[1::-1])
+        generator = coincidences.iter_coincidences_in_slices(
+            self.event_tables, 1000, workers=1, slice_length=1e-4)
+        self.assertRaises(RuntimeError, list, generator)
+
+
 class CoincidencesESDTests(CoincidencesTests):
 
     @patch.object(coincidences.tables, 'open_file')
@@ -120,25 +273,124 @@ class CoincidencesESDTests(CoincidencesTests):
     @patch.object(coincidences.CoincidencesESD, 'store_coincidences')
     def test_search_and_store_coincidences(self, mock_store, mock_search):
         self.c.search_and_store_coincidences()
-        mock_search.assert_called_with(window=10000)
+        mock_search.assert_called_with(window=10000, workers=None,
+                                       slice_length=86400)
         mock_store.assert_called_with(station_numbers=None)
         self.c.search_and_store_coincidences(sentinel.window,
-                                             sentinel.station_numbers)
-        mock_search.assert_called_with(window=sentinel.window)
+                                             sentinel.station_numbers,
+                                             sentinel.workers,
+                                             sentinel.slice_length)
+        mock_search.assert_called_with(window=sentinel.window,
+                                       workers=sentinel.workers,
+                                       slice_length=sentinel.slice_length)
         mock_store.assert_called_with(station_numbers=sentinel.station_numbers)
 
     @patch.object(coincidences.CoincidencesESD, '_search_coincidences')
     def test_search_coincidences(self, mock__search):
         mock__search.return_value = (sentinel.c_index, sentinel.timestamps)
         self.c.search_coincidences()
-        mock__search.assert_called_with(10000, None, None)
+        mock__search.assert_called_with(10000, None, None, None, None, 86400)
         self.assertEqual(self.c._src_timestamps, sentinel.timestamps)
         self.assertEqual(self.c._src_c_index, sentinel.c_index)
 
         self.c.search_coincidences(sentinel.window, sentinel.shifts,
                                    sentinel.limit)
         mock__search.assert_called_with(sentinel.window, sentinel.shifts,
-                                        sentinel.limit)
+                                        sentinel.limit, None, None, 86400)
+
+
+class CoincidencesESDAppendTests(unittest.TestCase):
+
+    def setUp(self):
+        self.data = tables.open_file('append_coincidences.h5', 'w',
+                                     driver='H5FD_CORE',
+                                     driver_core_backing_store=0)
+        self.station_groups = ['/s501', '/s502', '/s503']
+        random.seed(42)
+        self.events = []
+        for station_group in self.station_groups:
+            events = self.data.create_table(station_group, 'events',
+                                            storage.EventObservables,
+                                            createparents=True)
+            # three days with events shortly after noon
+            noons = [(1400000000 + day * 86400 + 43200) * 10 ** 9
+                     for day in range(3)]
+            ext_timestamps = [random.randint(0, 10 ** 6, 200) + noon
+                              for noon in noons]
+            rows = zeros(600, dtype=events.dtype)
+            rows['ext_timestamp'] = sorted(concatenate(ext_timestamps))
+            rows['timestamp'] = rows['ext_timestamp'] // 10 ** 9
+            rows['nanoseconds'] = rows['ext_timestamp'] % 10 ** 9
+            self.events.append(rows)
+
+    def tearDown(self):
+        self.data.close()
+
+    def search_in_parts(self, bounds):
+        """Append the events in parts, searching after each part
+
+        :param bounds: ext_timestamps at which the events are split.
+
+        """
+        for start, end in zip([0] + bounds, bounds + [2 ** 64 - 1]):
+            for events, station_group in zip(self.events, self.station_groups):
+                ext_timestamps = events['ext_timestamp']
+                is_part = ext_timestamps >= uint64(start)
+                is_part &= ext_timestamps < uint64(end)
+                self.data.get_node(station_group, 'events').append(
+                    events[is_part])
+            c = coincidences.CoincidencesESD(self.data, '/coincidences',
+                                             self.station_groups,
+                                             progress=False, append=True)
+            c.search_and_append_coincidences(window=5000,
+                                             station_numbers=[501, 502, 503])
+
+    def assert_same_as_full_search(self):
+        c = coincidences.CoincidencesESD(self.data, '/full',
+                                         self.station_groups, progress=False)
+        c.search_and_store_coincidences(window=5000,
+                                        station_numbers=[501, 502, 503])
+
+        appended = self.data.root.coincidences
+        full = self.data.root.full
+        self.assertGreater(len(full.coincidences), 0)
+        for column in ['id', 'ext_timestamp', 'N', 's501', 's502', 's503']:
+            self.assertEqual(appended.coincidences.col(column).tolist(),
+                             full.coincidences.col(column).tolist())
+        self.assertEqual([c.tolist() for c in appended.c_index.read()],
+                         [c.tolist() for c in full.c_index.read()])
+
+    def test_search_and_append_coincidences(self):
+        self.search_in_parts([(1400000000 + day * 86400) * 10 ** 9
+                              for day in [1, 2]])
+        self.assert_same_as_full_search()
+
+    def test_new_events_in_last_coincidence(self):
+        # split the events after the second event of a coincidence of at
+        # least three events, the new events extend the last coincidence
+        ext_timestamps = sort(concatenate(self.events)['ext_timestamp'])
+        starts, stops = coincidences.coincidence_windows(ext_timestamps, 5000)
+        is_split = stops - starts >= 3
+        is_split &= ext_timestamps[starts + 1] < ext_timestamps[starts + 2]
+        split = ext_timestamps[starts[is_split][0] + 2]
+        self.search_in_parts([int(split)])
+        self.assert_same_as_full_search()
+
+    def test_different_station_groups(self):
+        for events, station_group in zip(self.events, self.station_groups):
+            self.data.get_node(station_group, 'events').append(events)
+        c = coincidences.CoincidencesESD(self.data, '/coincidences',
+                                         self.station_groups, progress=False)
+        c.search_and_store_coincidences()
+        c = coincidences.CoincidencesESD(self.data, '/coincidences',
+                                         self.station_groups[:2],
+                                         progress=False, append=True)
+        self.assertRaises(RuntimeError, c.search_and_append_coincidences)
+        c = coincidences.CoincidencesESD(self.data, '/coincidences',
+                                         self.station_groups,
+                                         progress=False, append=True)
+        self.assertRaises(RuntimeError, c.search_and_append_coincidences,
+                          station_numbers=[501, 502, 503])
 
 
 class CoincidencesDataTests(unittest.TestCase):
@@ -192,6 +444,15 @@ class CoincidencesESDDataTests(CoincidencesDataTests):
             c.search_and_store_coincidences(station_numbers=[501, 502])
         validate_results(self, self.get_testdata_path(), self.data_path)
 
+    def test_coincidencesesd_output_parallel(self):
+        with tables.open_file(self.data_path, 'a') as data:
+            c = coincidences.CoincidencesESD(data, '/coincidences',
+                                             ['/station_501', '/station_502'],
+                                             progress=False)
+            c.search_and_store_coincidences(station_numbers=[501, 502],
+                                            workers=2, slice_length=60)
+        validate_results(self, self.get_testdata_path(), self.data_path)
+
     def get_testdata_path(self):
         dir_path = os.path.dirname(__file__)
         return os.path.join(dir_path, TEST_DATA_ESD)
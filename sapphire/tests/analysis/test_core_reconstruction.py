@@ -1,6 +1,10 @@
 import unittest
 
+from mock import sentinel
+from numpy import array
+
 from sapphire.analysis import core_reconstruction
+from sapphire.simulations import ldf
 
 
 class BaseAlgorithm(object):
@@ -44,6 +48,32 @@ class EllipsLdfAlgorithmTest(unittest.TestCase, BaseAlgorithm):
     def setUp(self):
         self.algorithm = core_reconstruction.EllipsLdfAlgorithm()
 
+    def test_ldf_core(self):
+        """Find the core of densities given by the LDF"""
+
+        x = (0., 10., 5., 60., 70., 65., -40., -30., -35.)
+        y = (0., 0., 8.66, 50., 50., 58.66, 40., 40., 48.66)
+        for core_x, core_y, theta, phi in [(20., 30., 0., 0.), (-10., 15., .4, 1.), (45., 5., .3, -2.)]:
+            shower = ldf.EllipsLdf(zenith=theta, azimuth=phi)
+            r, angle = shower.calculate_core_distance_and_angle(array(x), array(y), core_x, core_y)
+            p = shower.calculate_ldf_value(r, angle)
+            result = self.algorithm.reconstruct(p, x, y, theta, phi)
+            self.assertAlmostEqual(result[0], core_x, delta=2.)
+            self.assertAlmostEqual(result[1], core_y, delta=2.)
+            self.assertAlmostEqual(result[3] / ldf.EllipsLdf._n_electrons, 1., 1)
+
+    def test_selectbest(self):
+        """Best grid position is only used if it improves chi square"""
+
+        x = (0., 10., 5.)
+        y = (0., 0., 8.66)
+        p = (1., 2., 3.)
+        result = self.algorithm.selectbest(p, x, y, 5., 3., 1., 10 ** 99, 2., 0., 0.)
+        self.assertNotEqual(result[:2], (5., 3.))
+        self.assertTrue(result[2] < 10 ** 99)
+        self.assertEqual(self.algorithm.selectbest(p, x, y, 5., 3., sentinel.factor, -1., 2., 0., 0.),
+                         (5., 3., -1., sentinel.factor))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,16 @@
+import datetime
 import unittest
 import warnings
 
+from itertools import combinations
+
+import tables
+
 from mock import MagicMock, Mock, patch, sentinel
-from numpy import arcsin, arctan, array, isnan, nan, pi, sqrt
+from numpy import arcsin, arctan, array, cos, dot, isnan, nan, pi, random, sin, sqrt, zeros
+from numpy.testing import assert_allclose
 
+from sapphire import api, clusters
 from sapphire.analysis import direction_reconstruction
 from sapphire.simulations.showerfront import ConeFront
 
@@ -96,6 +103,59 @@ class EventDirectionReconstructionTest(unittest.TestCase):
                          ((), (), ()))
         self.assertEqual(mock_reconstruct_event.call_count, 2)
 
+    def test_reconstruct_events_batch(self):
+        station = clusters.SingleDiamondStation().stations[0]
+        dirrec = direction_reconstruction.EventDirectionReconstruction(station)
+        random.seed(42)
+        events = zeros(200, dtype=[('timestamp', 'u4'), ('t1', 'f4'), ('t2', 'f4'), ('t3', 'f4'), ('t4', 'f4')])
+        events['timestamp'] = 1400000000
+        for d_id in range(4):
+            t = random.uniform(0, 30, len(events))
+            t[random.uniform(size=len(events)) < .3] = -999
+            events['t%d' % (d_id + 1)] = t
+        for detector_ids in [None, [0, 2, 3]]:
+            for offsets in [direction_reconstruction.NO_OFFSET, [1., 2., 3., 4.]]:
+                theta, phi, ids = dirrec.reconstruct_events(events, detector_ids, offsets, progress=False,
+                                                            batch=True)
+                self.assertEqual(len(theta), len(events))
+                for event, result in zip(events, zip(theta, phi, ids)):
+                    expected = dirrec.reconstruct_event(event, detector_ids, offsets)
+                    assert_allclose(result[:2], expected[:2], atol=1e-10)
+                    self.assertEqual(result[2], expected[2])
+        self.assertEqual(dirrec.reconstruct_events(events[:0], progress=False, batch=True), ((), (), ()))
+
+    def test_reconstruct_events_batch_initials(self):
+        station = clusters.SingleDiamondStation().stations[0]
+        dirrec = direction_reconstruction.EventDirectionReconstruction(station)
+        dirrec.fit = Mock(spec=['reconstruct_batch', 'reconstruct_common'])
+        dirrec.fit.reconstruct_common.return_value = (0.1, 0.2)
+        events = zeros(2, dtype=[('timestamp', 'u4'), ('t1', 'f4'), ('t2', 'f4'), ('t3', 'f4'), ('t4', 'f4')])
+        events['timestamp'] = 1400000000
+        initials = [{'core_x': 1., 'core_y': 2.}, {'core_x': 3., 'core_y': 4.}]
+        dirrec.reconstruct_events(events, progress=False, initials=iter(initials), batch=True)
+        self.assertFalse(dirrec.fit.reconstruct_batch.called)
+        self.assertEqual([call[0][4] for call in dirrec.fit.reconstruct_common.call_args_list], initials)
+
+    def test_reconstruct_events_batch_two_detectors(self):
+        station = clusters.SingleTwoDetectorStation().stations[0]
+        dirrec = direction_reconstruction.EventDirectionReconstruction(station)
+        events = zeros(10, dtype=[('timestamp', 'u4'), ('t1', 'f4'), ('t2', 'f4'), ('t3', 'f4'), ('t4', 'f4')])
+        events['timestamp'] = 1400000000
+        events['t1'] = 10.
+        events['t2'] = 20.
+        events['t3'] = -1
+        events['t4'] = -1
+        for detector_ids in [None, [0, 1, 2, 3]]:
+            for offsets in [direction_reconstruction.NO_OFFSET, [1., 2., 3., 4.]]:
+                theta, phi, ids = dirrec.reconstruct_events(events, detector_ids, offsets, progress=False,
+                                                            batch=True)
+                self.assertTrue(isnan(theta).all())
+                self.assertTrue(isnan(phi).all())
+                for event, result in zip(events, ids):
+                    expected = dirrec.reconstruct_event(event, detector_ids, offsets)
+                    self.assertEqual(result, expected[2])
+                    self.assertEqual(result, [0, 1])
+
 
 class CoincidenceDirectionReconstructionTest(unittest.TestCase):
 
@@ -297,6 +357,53 @@ class CoincidenceDirectionReconstructionTest(unittest.TestCase):
         self.assertEqual(offsets, [1., 2., 3., 4.])
 
 
+class CoincidenceDirectionReconstructionBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cluster = clusters.SimpleCluster()
+        self.cluster._add_station((100, 300, 5), 0)
+        self.cluster._add_station((-200, 100, -3), 1.)
+        self.coincidences = self.make_coincidences(self.cluster, 100)
+
+    @staticmethod
+    def make_coincidences(cluster, n):
+        """Create coincidences of plane showers hitting random stations"""
+
+        random.seed(42)
+        ts = 1400000000
+        coincidences = []
+        for _ in range(n):
+            theta = random.uniform(0, 1.)
+            phi = random.uniform(-pi, pi)
+            direction = array([sin(theta) * cos(phi), sin(theta) * sin(phi), cos(theta)])
+            n_stations = random.randint(2, len(cluster.stations) + 1)
+            coincidence = []
+            for station in random.permutation(cluster.stations)[:n_stations]:
+                event = {'timestamp': ts, 'ext_timestamp': ts * int(1e9), 't_trigger': 0.}
+                for id, detector in enumerate(station.detectors):
+                    delay = -dot(detector.get_coordinates(), direction) / 0.299792458
+                    event['t%d' % (id + 1)] = 2000. + delay + random.normal(0, 2)
+                coincidence.append((station.number, event))
+            coincidences.append(coincidence)
+        return coincidences
+
+    def test_reconstruct_coincidences_batch(self):
+        for reconstruction in [direction_reconstruction.CoincidenceDirectionReconstruction,
+                               direction_reconstruction.CoincidenceDirectionReconstructionDetectors]:
+            dirrec = reconstruction(self.cluster)
+            initials = [{'core_x': 10., 'core_y': 20.}] + [{}] * 10
+            for station_numbers, initials in [(None, None), ([0, 1, 3, 4, 5], initials)]:
+                theta, phi, nums = dirrec.reconstruct_coincidences_batch(self.coincidences, station_numbers,
+                                                                         progress=False, initials=initials)
+                expected = dirrec.reconstruct_coincidences(self.coincidences, station_numbers, progress=False,
+                                                           initials=initials)
+                assert_allclose(theta, expected[0], atol=1e-9)
+                assert_allclose(phi, expected[1], atol=1e-9)
+                self.assertEqual(nums, list(expected[2]))
+                self.assertFalse(isnan(theta).all())
+        self.assertEqual(len(dirrec.reconstruct_coincidences_batch([], progress=False)[0]), 0)
+
+
 class CoincidenceDirectionReconstructionDetectorsTest(CoincidenceDirectionReconstructionTest):
 
     def setUp(self):
@@ -403,6 +510,79 @@ class CoincidenceDirectionReconstructionDetectorsTest(CoincidenceDirectionRecons
         self.assertEqual(mock_reconstruct_coincidence.call_count, 2)
 
 
+class DailyStationOffsetsTest(unittest.TestCase):
+
+    def setUp(self):
+        station_numbers = [501, 502, 503, 505, 508, 510]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.stations = {sn: api.Station(sn, force_stale=True)
+                             for sn in station_numbers}
+        self.offsets = direction_reconstruction.DailyStationOffsets(
+            self.stations)
+        self.offsets.precompute(datetime.date(2015, 3, 1),
+                                datetime.date(2015, 3, 4), progress=False)
+        self.dirrec = direction_reconstruction.CoincidenceDirectionReconstruction(
+            sentinel.cluster)
+
+    def assert_same_offsets(self, offsets, midnight_ts):
+        for n in [2, 3, 6]:
+            for station_numbers in combinations(sorted(self.stations), n):
+                station_numbers = list(station_numbers)
+                best = offsets.best_offsets(station_numbers, midnight_ts)
+                expected = self.dirrec.determine_best_offsets(
+                    station_numbers, midnight_ts, self.stations)
+                self.assertEqual(list(best.keys()), list(expected.keys()))
+                for sn in station_numbers:
+                    assert_allclose(best[sn], expected[sn])
+
+    def test_best_offsets(self):
+        self.assertEqual(self.offsets.days,
+                         [1425168000, 1425254400, 1425340800])
+        for midnight_ts in self.offsets.days:
+            self.assert_same_offsets(self.offsets, midnight_ts)
+
+    def test_compute_missing_day(self):
+        self.assert_same_offsets(self.offsets, 1420070400)
+        self.assertIn(1420070400, self.offsets.days)
+
+    def test_store_and_load(self):
+        with tables.open_file('offsets.h5', 'w', driver='H5FD_CORE',
+                              driver_core_backing_store=0) as data:
+            self.offsets.store(data, '/offsets')
+            loaded = direction_reconstruction.DailyStationOffsets.load(
+                data, '/offsets')
+        self.assertEqual(loaded.station_numbers,
+                         self.offsets.station_numbers)
+        self.assertEqual(loaded.days, self.offsets.days)
+        self.assert_same_offsets(loaded, self.offsets.days[1])
+        self.assertRaises(KeyError, loaded.best_offsets, [501, 502],
+                          1420070400)
+
+    def test_get_station_offsets(self):
+        coincidence_events = [(501, None), (502, None), (503, None)]
+        result = self.dirrec.get_station_offsets(
+            coincidence_events, None, self.offsets, 1425168000 + 100)
+        expected = self.dirrec.determine_best_offsets([501, 502, 503],
+                                                      1425168000, self.stations)
+        self.assertEqual(sorted(result.keys()), [501, 502, 503])
+        for sn in expected:
+            assert_allclose(result[sn], expected[sn])
+
+    def test__path_offsets(self):
+        predecessors = array([[-9999, 0, 1],
+                              [1, -9999, 1],
+                              [1, 2, -9999]])
+        offset_matrix = array([[0, -1, -1],
+                               [1, 0, -1],
+                               [1, 1, 0]])
+        path_offsets = direction_reconstruction.DailyStationOffsets._path_offsets(
+            predecessors, offset_matrix)
+        self.assertEqual(path_offsets.tolist(), [[0, 1, 2],
+                                                 [-1, 0, 1],
+                                                 [-2, -1, 0]])
+
+
 class BaseAlgorithm(object):
 
     """Use this class to check the different algorithms
@@ -596,6 +776,37 @@ class AltitudeAlgorithm(FlatAlgorithm):
         self.assertAlmostEqual(theta, zenith, 5)
 
 
+class BatchAlgorithm(object):
+
+    """Use this class to check the batch reconstruction of algorithms
+
+    This reconstructs single events using the reconstruct_batch method, so
+    the other algorithm tests can be reused. Moreover it checks that many
+    events are reconstructed the same as by reconstruct_common.
+
+    """
+
+    def call_reconstruct(self, t, x, y, z, initial=None):
+        theta, phi = self.algorithm.reconstruct_batch([t], x, y, z)
+        return theta[0], phi[0]
+
+    def test_batch_matches_reconstruct_common(self):
+        random.seed(42)
+        t = random.uniform(-40, 40, (500, 3))
+        t[:10] = 0.
+        x = (0., 10., 5.)
+        y = (0., 0., 8.66)
+        z = (0., 1., -.5)
+        theta, phi = self.algorithm.reconstruct_batch(t, x, y, z)
+        expected = array([self.algorithm.reconstruct_common(event, x, y, z) for event in t])
+        assert_allclose(theta, expected[:, 0], atol=1e-12)
+        assert_allclose(phi, expected[:, 1], atol=1e-12)
+
+        # One detector geometry for each event
+        result = self.algorithm.reconstruct_batch(t, [x] * len(t), [y] * len(t), [z] * len(t))
+        assert_allclose(result, (theta, phi))
+
+
 class DirectAltitudeAlgorithm(DirectAlgorithm, AltitudeAlgorithm):
 
     """Test algorithm that uses only 3 detectors and has altitude support."""
@@ -754,6 +965,24 @@ class DirectAlgorithmCartesian3DTest(unittest.TestCase,
         self.algorithm = direction_reconstruction.DirectAlgorithmCartesian3D()
 
 
+class DirectAlgorithmBatchTest(unittest.TestCase, BatchAlgorithm, FlatAlgorithm):
+
+    def setUp(self):
+        self.algorithm = direction_reconstruction.DirectAlgorithm()
+
+
+class DirectAlgorithmCartesianBatchTest(unittest.TestCase, BatchAlgorithm, FlatAlgorithm):
+
+    def setUp(self):
+        self.algorithm = direction_reconstruction.DirectAlgorithmCartesian()
+
+
+class DirectAlgorithmCartesian3DBatchTest(unittest.TestCase, BatchAlgorithm, AltitudeAlgorithm):
+
+    def setUp(self):
+        self.algorithm = direction_reconstruction.DirectAlgorithmCartesian3D()
+
+
 class FitAlgorithm3DTest(unittest.TestCase, MultiAltitudeAlgorithm):
 
     def setUp(self):
@@ -772,6 +1001,18 @@ class RegressionAlgorithm3DTest(unittest.TestCase, MultiAltitudeAlgorithm):
         self.algorithm = direction_reconstruction.RegressionAlgorithm3D()
 
 
+class RegressionAlgorithmBatchTest(unittest.TestCase, BatchAlgorithm, MultiAlgorithm):
+
+    def setUp(self):
+        self.algorithm = direction_reconstruction.RegressionAlgorithm()
+
+
+class RegressionAlgorithm3DBatchTest(unittest.TestCase, BatchAlgorithm, MultiAltitudeAlgorithm):
+
+    def setUp(self):
+        self.algorithm = direction_reconstruction.RegressionAlgorithm3D()
+
+
 class CurvedRegressionAlgorithmTest(unittest.TestCase, CurvedAlgorithm):
 
     def setUp(self):
@@ -1,11 +1,16 @@
 import os
 import unittest
+import warnings
 
 import tables
 
 from mock import MagicMock, patch, sentinel
+from numpy import concatenate, isnan, random, zeros
+from numpy.testing import assert_array_equal
 
+from sapphire import clusters
 from sapphire.analysis import reconstructions
+from sapphire.simulations.showerfront import FlatFrontSimulation
 
 TEST_DATA_FILE = '../simulations/test_data/groundparticles_sim.h5'
 
@@ -161,6 +166,85 @@ class ReconstructESDEventsFromSourceTest(ReconstructESDEventsTest):
         pass
 
 
+class ReconstructESDEventsChunksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = tables.open_file('reconstructions.h5', 'w', driver='H5FD_CORE', driver_core_backing_store=0)
+        random.seed(42)
+        sim = FlatFrontSimulation(clusters.SingleDiamondStation(), self.data, '/', 100, progress=False)
+        sim.run()
+        self.group = '/cluster_simulations/station_0'
+        self.events = self.data.get_node(self.group, 'events')
+        self.expected = self.reconstruct('expected')
+
+    def tearDown(self):
+        self.data.close()
+
+    def reconstruct(self, destination, chunksize=None, overwrite=False):
+        rec = reconstructions.ReconstructSimulatedEvents(self.data, self.group, 0, overwrite=overwrite, progress=False,
+                                                         destination=destination)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            rec.reconstruct_and_store(chunksize=chunksize)
+        return self.data.get_node(self.group, destination)
+
+    def assert_same_reconstructions(self, result):
+        expected = self.expected.read()
+        result = result.read()
+        for name in expected.dtype.names:
+            assert_array_equal(result[name], expected[name])
+
+    def test_chunks(self):
+        self.assertEqual(self.expected._v_attrs.reconstructed_events, 100)
+        self.assertFalse(isnan(self.expected.col('zenith')).all())
+        result = self.reconstruct('chunks', chunksize=30)
+        self.assertEqual(result._v_attrs.reconstructed_events, 100)
+        self.assert_same_reconstructions(result)
+
+    def test_continue_interrupted(self):
+        result = self.reconstruct('chunks', chunksize=30)
+        # Interrupted while storing the third chunk
+        result.truncate(75)
+        result.modify_column(60, 75, column=zeros(15), colname='zenith')
+        result._v_attrs.reconstructed_events = 60
+        result = self.reconstruct('chunks', chunksize=30)
+        self.assert_same_reconstructions(result)
+
+        # Existing table without progress can not be continued
+        del result._v_attrs.reconstructed_events
+        self.assertRaises(RuntimeError, self.reconstruct, 'chunks', chunksize=30)
+        result = self.reconstruct('chunks', chunksize=30, overwrite=True)
+        self.assert_same_reconstructions(result)
+
+    def test_append_new_events(self):
+        new_events = self.events.read(70)
+        self.events.truncate(70)
+        result = self.reconstruct('chunks', chunksize=30)
+        self.assertEqual(result.nrows, 70)
+        self.events.append(new_events)
+        self.events.flush()
+        result = self.reconstruct('chunks', chunksize=30)
+        self.assertEqual(result._v_attrs.reconstructed_events, 100)
+        self.assert_same_reconstructions(result)
+
+        # Events no longer match the reconstructions
+        self.events.modify_column(99, 100, column=[1], colname='ext_timestamp')
+        self.assertRaises(RuntimeError, self.reconstruct, 'chunks', chunksize=30)
+
+    def test_two_detector_station(self):
+        data = tables.open_file('two.h5', 'w', driver='H5FD_CORE', driver_core_backing_store=0)
+        self.addCleanup(data.close)
+        sim = FlatFrontSimulation(clusters.SingleTwoDetectorStation(), data, '/', 10, progress=False)
+        sim.run()
+        rec = reconstructions.ReconstructSimulatedEvents(data, self.group, 0, progress=False)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            rec.reconstruct_and_store()
+        result = data.get_node(self.group, 'reconstructions')
+        self.assertEqual(result.nrows, 10)
+        self.assertTrue(isnan(result.col('zenith')).all())
+
+
 class ReconstructSimulatedEventsTest(unittest.TestCase):
 
     def setUp(self):
@@ -222,6 +306,7 @@ class ReconstructESDCoincidencesTest(unittest.TestCase):
         self.assertEqual(rec.progress, sentinel.progress)
         self.assertFalse(rec.verbose)
         self.assertEqual(rec.destination, sentinel.destination)
+        self.assertIsNone(rec.workers)
         self.assertEqual(rec.offsets, {})
 
         self.cq.assert_called_once_with(self.data, rec.coincidences_group)
@@ -341,6 +426,74 @@ class ReconstructESDCoincidencesTest(unittest.TestCase):
         self.rec.reconstructions.row.append.assert_called_once_with()
 
 
+class ReconstructESDCoincidencesWorkersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = tables.open_file('reconstructions.h5', 'w', driver='H5FD_CORE', driver_core_backing_store=0)
+        random.seed(42)
+        sim = FlatFrontSimulation(clusters.SimpleCluster(), self.data, '/', 50, progress=False)
+        sim.run()
+
+    def tearDown(self):
+        self.data.close()
+
+    def reconstruct(self, workers, destination):
+        rec = reconstructions.ReconstructSimulatedCoincidences(self.data, progress=False, destination=destination,
+                                                               workers=workers)
+        rec.CHUNK_SIZE = 7
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            rec.reconstruct_and_store()
+        return rec, self.data.get_node('/coincidences', destination).read()
+
+    def test_workers(self):
+        rec, expected = self.reconstruct(None, 'reconstructions')
+        rec_workers, result = self.reconstruct(2, 'reconstructions_workers')
+        self.assertEqual(len(result), 50)
+        self.assertFalse(isnan(result['zenith']).all())
+        for name in expected.dtype.names:
+            assert_array_equal(result[name], expected[name])
+        assert_array_equal(rec_workers.theta, rec.theta)
+        self.assertEqual(list(rec_workers.station_numbers), list(rec.station_numbers))
+
+        rec_workers.theta, rec_workers.core_x, rec_workers.core_y = ([], [], [])
+        rec_workers.reconstruct_directions()
+        assert_array_equal(rec_workers.theta, rec.theta)
+        rec_workers.reconstruct_cores()
+        assert_array_equal(rec_workers.core_x, rec.core_x)
+
+    def test_submit_chunks_bounded(self):
+        """Chunks are read only when few enough are being reconstructed"""
+
+        rec = reconstructions.ReconstructSimulatedCoincidences(self.data, progress=False, workers=1)
+        rec.CHUNK_SIZE = 7
+        pending = []
+        max_pending = []
+
+        class Result(object):
+            def __init__(self, task):
+                self.task = task
+
+            def get(self):
+                pending.remove(self)
+                return self.task
+
+        class Pool(object):
+            def apply_async(self, function, args):
+                result = Result(args[0])
+                pending.append(result)
+                max_pending.append(len(pending))
+                return result
+
+        chunks = list(rec._submit_chunks(Pool(), ('direction',), None, []))
+        self.assertEqual(len(chunks), 8)
+        self.assertEqual(max(max_pending), 2)
+        self.assertEqual(pending, [])
+        coincidences = self.data.root.coincidences.coincidences.read()
+        assert_array_equal(concatenate([c['id'] for c, _ in chunks]), coincidences['id'])
+        self.assertEqual(sum(len(task[1]) for _, task in chunks), 50)
+
+
 class ReconstructESDCoincidencesFromSourceTest(ReconstructESDCoincidencesTest):
 
     @patch.object(reconstructions, 'CoincidenceQuery')
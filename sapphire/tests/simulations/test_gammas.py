@@ -1,8 +1,10 @@
+import random
 import unittest
 
 import numpy as np
 
 from mock import patch
+from scipy.stats import ks_2samp
 
 from sapphire.simulations import gammas
 
@@ -57,6 +59,91 @@ class GammasTest(unittest.TestCase):
         for gamma_energy in [3., 10., 100.]:
             self.assertAlmostEqual(gammas.compton_energy_transfer(gamma_energy), 0.)
 
+    def test_compton_energy_transfer_table(self):
+        table = gammas.compton_energy_transfer_table([1., 10.], 11)
+        self.assertEqual(table.shape, (2, 11))
+        self.assertTrue((np.diff(table, axis=1) >= 0).all())
+        np.testing.assert_allclose(table[:, 0], 0.)
+        np.testing.assert_allclose(table[:, -1], 0.999)
+
+    @patch.object(np.random, 'random')
+    def test_compton_energy_transfer_batch(self, mock_random):
+        gamma_energies = np.array([0.01, 0.3, 3.7, 10., 123., 5000.])
+        edges = gammas.compton_edge(gamma_energies)
+        for r in np.linspace(0, 1, 21):
+            mock_random.return_value = r * np.ones(len(gamma_energies))
+            transfers = gammas.compton_energy_transfer_batch(gamma_energies)
+            for gamma_energy, edge, transfer in zip(gamma_energies, edges,
+                                                    transfers):
+                mock_random.return_value = r
+                expected = gammas.compton_energy_transfer(gamma_energy)
+                self.assertAlmostEqual(transfer / edge, expected / edge,
+                                       places=2)
+
+    @patch.object(np.random, 'exponential')
+    def test_simulate_detector_mips_gammas_batch(self, mock_exponential):
+        p = np.array([10e6, 10e6, 0.5e6])
+        theta = np.array([0., 1., 0.])
+
+        # no interaction, also not in projected depth
+        mock_exponential.side_effect = [np.array([1e6, 4]), np.array([1e3, 5])]
+        self.assertEqual(gammas.simulate_detector_mips_gammas_batch(p[:2], theta[:2]), 0)
+
+        # pair production, not enough energy for the low energy gamma
+        mock_exponential.side_effect = [np.array([1e3, 1e3, 1e3]), np.array([1., 1., 1.])]
+        mips = gammas.simulate_detector_mips_gammas_batch(p, theta)
+        expected = sum(gammas.max_energy_deposit_in_mips(1., depth) for depth in [2., 2. / np.cos(1.)])
+        self.assertAlmostEqual(mips, expected)
+
+        # compton scattering limited by the remaining scintillator depth
+        mock_exponential.side_effect = [np.array([1.9, 1.9, 1.9]), np.array([1e3, 1e3, 1e3])]
+        mips = gammas.simulate_detector_mips_gammas_batch(p, theta)
+        self.assertLessEqual(mips, 3 * gammas.MAX_E / gammas.MIP)
+        self.assertGreater(mips, 0)
+
+    def test_simulate_detector_mips_gammas_batch_statistics(self):
+        np.random.seed(1)
+        random.seed(1)
+        n = 20000
+        energies = np.exp(np.random.uniform(np.log(.1), np.log(1000), n))
+        p = energies * 1e6
+        theta = np.random.uniform(0, 1.3, n)
+        mips = gammas.simulate_detector_mips_gammas(p, theta)
+        mips_batch = gammas.simulate_detector_mips_gammas_batch(p, theta)
+        self.assertAlmostEqual(mips_batch / mips, 1., delta=0.1)
+
+    def test_simulate_detector_mips_gammas_batch_distribution(self):
+        # compare the signals of single gammas, not only their total
+        np.random.seed(2)
+        random.seed(2)
+        n = 10000
+        energies = np.exp(np.random.uniform(np.log(.1), np.log(1000), n))
+        p = energies * 1e6
+        theta = np.random.uniform(0, 1.3, n)
+        mips = np.array([gammas.simulate_detector_mips_gammas(p[i:i + 1], theta[i:i + 1])
+                         for i in range(n)])
+        mips_batch = np.array([gammas.simulate_detector_mips_gammas_batch(p[i:i + 1], theta[i:i + 1])
+                               for i in range(n)])
+        detected = mips[mips > 0]
+        detected_batch = mips_batch[mips_batch > 0]
+        self.assertAlmostEqual(len(detected_batch) / len(detected), 1., delta=0.15)
+        self.assertGreater(ks_2samp(detected, detected_batch).pvalue, 0.01)
+
+    def test_compton_energy_transfer_batch_distribution(self):
+        # cumulative distribution of the energy transfer as fraction of the
+        # compton edge, as used by compton_energy_transfer
+        np.random.seed(1)
+        fractions = np.arange(1000) / 1000
+        for gamma_energy in [0.01, 0.3, 3., 30., 300., 3000.]:
+            recoil_energies = gammas.compton_edge(gamma_energy) * np.linspace(0, 1, 1000)
+            cumulative = np.cumsum(gammas.energy_transfer_cross_section(gamma_energy, recoil_energies))
+            expected = cumulative / cumulative[-1]
+
+            transfers = gammas.compton_energy_transfer_batch(np.full(100000, gamma_energy))
+            transfers = np.sort(transfers / gammas.compton_edge(gamma_energy))
+            result = np.searchsorted(transfers, fractions + 1e-9, side='right') / len(transfers)
+            self.assertLess(abs(result - expected).max(), 0.02)
+
     def test_energy_transfer_cross_section(self):
         # The plot from github.com/tomkooij/lio-project/photons/check_sapphire_gammas.py
         # has been checked with Evans (1955) p. 693 figure 5.1
@@ -1,3 +1,6 @@
+import os
+import shutil
+import tempfile
 import unittest
 import warnings
 
@@ -7,7 +10,7 @@ from time import time
 
 import six
 
-from mock import patch, sentinel
+from mock import Mock, patch, sentinel
 from numpy.testing import assert_allclose, assert_equal
 from six.moves.urllib.error import HTTPError, URLError
 
@@ -59,6 +62,90 @@ class APITests(unittest.TestCase):
         self.assertEqual(len(warned), 1)
 
 
+class ResponseCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = api.ResponseCache(self.directory, ttl=60, max_entries=2)
+
+    def test_get_and_set(self):
+        self.assertIsNone(self.cache.get('url1'))
+        self.cache.set('url1', 'data1')
+        self.assertEqual(self.cache.get('url1'), 'data1')
+
+    def test_shared_on_disk(self):
+        self.cache.set('url1', 'data1')
+        other_cache = api.ResponseCache(self.directory)
+        self.assertEqual(other_cache.get('url1'), 'data1')
+        memory_cache = api.ResponseCache()
+        memory_cache.set('url2', 'data2')
+        self.assertEqual(memory_cache.get('url2'), 'data2')
+        self.assertIsNone(other_cache.get('url2'))
+
+    def test_expiry(self):
+        self.cache.set('url1', 'data1')
+        with patch.object(api.time, 'time', return_value=time() + 61):
+            self.assertIsNone(self.cache.get('url1'))
+            self.assertIsNone(api.ResponseCache(self.directory,
+                                                ttl=60).get('url1'))
+
+    def test_lru_eviction(self):
+        self.cache.set('url1', 'data1')
+        self.cache.set('url2', 'data2')
+        # make url1 most recently used, on disk as well
+        self.cache.get('url1')
+        old = time() - 10
+        os.utime(self.cache._path('url2'), (old, old))
+        self.cache.set('url3', 'data3')
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        self.assertFalse(os.path.exists(self.cache._path('url2')))
+        self.assertEqual(list(self.cache._entries), ['url1', 'url3'])
+        self.assertIsNone(self.cache.get('url2'))
+
+    def test_clear(self):
+        self.cache.set('url1', 'data1')
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('url1'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @patch.object(api.API, '_retrieve_url')
+    def test_api_uses_cache(self, mock_retrieve_url):
+        mock_retrieve_url.return_value = '{"number": 501}'
+        api.enable_cache(self.directory)
+        self.addCleanup(api.disable_cache)
+
+        self.assertEqual(api.API()._get_json('station/501/'), {'number': 501})
+        self.assertEqual(api.API()._get_json('station/501/'), {'number': 501})
+        self.assertEqual(mock_retrieve_url.call_count, 1)
+
+        # fresh data bypasses the cache, but updates it
+        mock_retrieve_url.return_value = '{"number": 502}'
+        self.assertEqual(api.API(force_fresh=True)._get_json('station/501/'),
+                         {'number': 502})
+        self.assertEqual(mock_retrieve_url.call_count, 2)
+        self.assertEqual(api.API()._get_json('station/501/'), {'number': 502})
+
+        # stale data never uses the server or the cache
+        stale = api.API(force_stale=True)._get_json('station/501/')
+        self.assertEqual(stale['name'], 'Nikhef')
+        self.assertEqual(mock_retrieve_url.call_count, 2)
+
+    @patch.object(api.API, '_retrieve_url')
+    def test_cache_from_environment(self, mock_retrieve_url):
+        mock_retrieve_url.return_value = '{"number": 501}'
+        self.addCleanup(api.disable_cache)
+        with patch.dict(os.environ, {'SAPPHIRE_CACHE_DIR': self.directory}), \
+                patch.object(api, '_cache_configured', False):
+            api.API()._get_json('station/501/')
+            self.assertEqual(api.API.cache.directory, self.directory)
+            self.assertEqual(len(os.listdir(self.directory)), 1)
+
+            # explicitly disabling the cache is not overridden
+            api.disable_cache()
+            api.API()._get_json('station/501/')
+            self.assertIsNone(api.API.cache)
+
+
 @unittest.skipUnless(api.API.check_connection(), "Internet connection required")
 class APITestsLive(unittest.TestCase):
     def setUp(self):
@@ -474,6 +561,41 @@ class StationTests(unittest.TestCase):
                                  data2['voltage3'], data2['voltage4']])
         self.assertEqual(data, data1)
 
+    def test_values_at_timestamps(self):
+        timestamps = [0, 1378771200, 1420070400, FUTURE]
+        voltages = self.station.voltages_at(timestamps)
+        self.assertEqual(voltages.dtype, self.station.voltages.dtype)
+        for timestamp, voltage in zip(timestamps, voltages):
+            self.assertEqual(self.station.voltage(timestamp),
+                             [voltage['voltage%d' % i] for i in range(1, 5)])
+        for timestamp, current in zip(timestamps,
+                                      self.station.currents_at(timestamps)):
+            self.assertEqual(self.station.current(timestamp),
+                             [current['current%d' % i] for i in range(1, 5)])
+        for timestamp, electronic in zip(
+                timestamps, self.station.electronics_at(timestamps)):
+            self.assertEqual(self.station.electronic(timestamp),
+                             list(electronic)[1:])
+        for timestamp, location in zip(
+                timestamps, self.station.gps_locations_at(timestamps)):
+            self.assertEqual(self.station.gps_location(timestamp),
+                             {'latitude': location['latitude'],
+                              'longitude': location['longitude'],
+                              'altitude': location['altitude']})
+        for timestamp, trigger in zip(timestamps,
+                                      self.station.triggers_at(timestamps)):
+            self.assertEqual(self.station.trigger(timestamp)[1],
+                             list(trigger)[-4:])
+        for timestamp, layout in zip(
+                timestamps, self.station.station_layouts_at(timestamps)):
+            assert_equal(self.station.station_layout(timestamp),
+                         [list(layout)[i:i + 4] for i in range(1, 17, 4)])
+        for timestamp, offset in zip(
+                timestamps,
+                self.station.detector_timing_offsets_at(timestamps)):
+            assert_equal(self.station.detector_timing_offset(timestamp),
+                         list(offset)[1:])
+
     def test_laziness_currents(self):
         self.laziness_of_attribute('currents')
 
@@ -671,5 +793,42 @@ class StaleStationTests(StationTests):
         self.assertRaises(Exception, self.station.temperature, 2013, 1, 1)
 
 
+class PrefetchStationsTests(unittest.TestCase):
+    def test_prefetch_stations(self):
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter('always')
+            stations = api.prefetch_stations([501, 0, 502], workers=2,
+                                             force_stale=True)
+        self.assertEqual([station.station for station in stations],
+                         [501, 0, 502])
+        for station in (stations[0], stations[2]):
+            for attribute in ('info', 'gps_locations', 'station_layouts'):
+                self.assertIn(attribute, station.__dict__)
+            self.assertEqual(station.gps_locations.tolist(),
+                             api.Station(station.station, force_stale=True)
+                             .gps_locations.tolist())
+        # missing data is not prefetched and raises when used
+        self.assertNotIn('gps_locations', stations[1].__dict__)
+        self.assertRaises(Exception, getattr, stations[1], 'gps_locations')
+
+    def test_no_stations(self):
+        self.assertEqual(api.prefetch_stations([]), [])
+
+    @patch.object(api, 'Station')
+    def test_failed_station(self, mock_station):
+        error = KeyError('Unknown station')
+
+        def station(number, **kwargs):
+            if number == 0:
+                raise error
+            return Mock(station=number)
+
+        mock_station.side_effect = station
+        stations = api.prefetch_stations([501, 0, 502], workers=2)
+        self.assertEqual([station.station for station in stations], [501, 0, 502])
+        self.assertRaises(KeyError, getattr, stations[1], 'gps_locations')
+        self.assertIs(stations[1].exception, error)
+
+
 if __name__ == '__main__':
     unittest.main()
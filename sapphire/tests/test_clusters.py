@@ -6,7 +6,7 @@ import warnings
 from math import atan2, pi, sqrt
 
 from mock import Mock, patch, sentinel
-from numpy import array, nan
+from numpy import array, isnan, nan
 from numpy.testing import assert_array_almost_equal
 
 from sapphire import clusters
@@ -315,13 +315,99 @@ class BaseClusterTests(unittest.TestCase):
                                             detector_list, None, None, number)
 
     def test_set_timestamp(self):
-        with patch('sapphire.clusters.Station'):
-            cluster = clusters.BaseCluster()
-            cluster._add_station(sentinel.position)
-            self.assertEqual(cluster._timestamp, 2147483647)
-            cluster.set_timestamp(sentinel.timestamp)
-            self.assertEqual(cluster._timestamp, sentinel.timestamp)
-            cluster.stations[0]._update_timestamp.assert_called_with(sentinel.timestamp)
+        cluster = clusters.BaseCluster()
+        cluster._add_station(([0, 1, 2], [0, 1, 2], [0, 1, 2]), [0, 0, 0],
+                             [((0, 0, 0), 'UD'), ((1, 0, 0), 'UD')],
+                             station_timestamps=[0, 10, 20],
+                             detector_timestamps=[0])
+        cluster._add_station((5, 5, 5), 0,
+                             [(([0, 1], [0, 1], [0, 1]), 'UD')],
+                             detector_timestamps=[0, 15])
+        self.assertEqual(cluster._timestamp, 2147483647)
+        self.assertEqual(cluster.geometry.epochs.tolist(), [0, 10, 15, 20])
+        for timestamp, indices in [(-1, [0, 0, 0, 0, 0]),
+                                   (5, [0, 0, 0, 0, 0]),
+                                   (10, [1, 0, 0, 0, 0]),
+                                   (15, [1, 0, 0, 0, 1]),
+                                   (25, [2, 0, 0, 0, 1])]:
+            cluster.set_timestamp(timestamp)
+            self.assertEqual(cluster._timestamp, timestamp)
+            station_indices = [station.index for station in cluster.stations]
+            detector_indices = [detector.index for station in cluster.stations
+                                for detector in station.detectors]
+            self.assertEqual(station_indices + detector_indices, indices)
+
+    def test_set_timestamp_like_stations(self):
+        """Vectorized set_timestamp matches the per station indices"""
+        cluster = clusters.BaseCluster()
+        cluster._add_station(([0, 1, 2], [0, 1, 2], [0, 1, 2]), [0, 1, 2],
+                             station_timestamps=[3, 10, 20],
+                             detector_timestamps=[5])
+        cluster._add_station((1, 2, 3), 0, station_timestamps=[7])
+        for timestamp in range(-2, 30):
+            cluster.set_timestamp(timestamp)
+            coordinates = cluster.get_station_coordinates()
+            detector_coordinates = cluster.get_detector_coordinates()
+            idx = 0
+            for i, station in enumerate(cluster.stations):
+                index = station.index
+                station._update_timestamp(timestamp)
+                self.assertEqual(index, station.index)
+                assert_array_almost_equal(coordinates[i],
+                                          station.get_coordinates())
+                for detector in station.detectors:
+                    assert_array_almost_equal(detector_coordinates[idx],
+                                              detector.get_coordinates())
+                    idx += 1
+
+    def test_coordinates_at_timestamps(self):
+        cluster = clusters.BaseCluster((1, 2, 0), pi / 3)
+        cluster._add_station(([0, 10], [0, 0], [0, 1]), [0, pi / 2],
+                             [((1, 0, 0), 'UD'), ((0, 1, 0), 'UD')],
+                             station_timestamps=[0, 10], number=501)
+        cluster._add_station((5, 5, 5), 0,
+                             [(([0, 3], [0, 0], [0, 0]), 'UD')],
+                             detector_timestamps=[0, 15], number=502)
+        timestamps = array([-5, 5, 12, 20, 20])
+        numbers = array([501, 501, 501, 502, 501])
+        cluster.set_timestamp(100)
+
+        coordinates = cluster.get_station_coordinates_at(timestamps, numbers)
+        detectors = cluster.get_detector_coordinates_at(timestamps, numbers)
+        centers = cluster.calc_center_of_mass_coordinates_at(timestamps,
+                                                             numbers)
+        self.assertEqual(coordinates.shape, (5, 4))
+        self.assertEqual(detectors.shape, (5, 2, 3))
+        self.assertTrue(isnan(detectors[3, 1]).all())
+        for i, (timestamp, number) in enumerate(zip(timestamps, numbers)):
+            cluster.set_timestamp(timestamp)
+            station = cluster.get_station(number)
+            assert_array_almost_equal(coordinates[i],
+                                      station.get_coordinates())
+            for j, detector in enumerate(station.detectors):
+                assert_array_almost_equal(detectors[i, j],
+                                          detector.get_coordinates())
+            assert_array_almost_equal(
+                centers[i], station.calc_center_of_mass_coordinates())
+
+        # single station or timestamp
+        assert_array_almost_equal(
+            cluster.get_station_coordinates_at(timestamps, 502),
+            cluster.get_station_coordinates_at(timestamps, [502] * 5))
+        assert_array_almost_equal(
+            cluster.get_station_coordinates_at(5, numbers),
+            cluster.get_station_coordinates_at([5] * 5, numbers))
+        self.assertRaises(KeyError, cluster.get_station_coordinates_at,
+                          timestamps, 503)
+
+    def test_geometry_rebuilt_after_add_station(self):
+        cluster = clusters.BaseCluster()
+        cluster._add_station((0, 0, 0), 0)
+        self.assertEqual(len(cluster.get_station_coordinates()), 1)
+        cluster._add_station((1, 0, 0), 0)
+        assert_array_almost_equal(cluster.get_station_coordinates()[:, 0],
+                                  [0, 1])
+        self.assertNotIn('_geometry', cluster.__getstate__())
 
     def test_attributes(self):
         with patch('sapphire.clusters.Station') as mock_station:
@@ -421,6 +507,14 @@ class BaseClusterTests(unittest.TestCase):
         self.assertAlmostEqual(x, 0)
         self.assertAlmostEqual(y, 0)
 
+    def test_calc_center_of_mass_coordinates_after_moving_detector(self):
+        cluster = clusters.BaseCluster()
+        cluster._add_station((0, 0), 0, [((-10, 0), 'LR'), ((10, 0), 'LR')])
+        cluster.get_detector_coordinates()
+        cluster.stations[0].detectors[1].x = [30.]
+        center = cluster.calc_center_of_mass_coordinates()
+        assert_array_almost_equal(center, [10., 0., 0.])
+
     def test_set_center_off_mass_at_origin(self):
         cluster = clusters.BaseCluster()
         cluster._add_station((0, 0), 0, [((0, 5 * sqrt(3)), 'UD'),
@@ -615,6 +709,25 @@ class HiSPARCStationTests(unittest.TestCase):
         cluster.set_coordinates(0, 0, 0, 0)
         self.assertEqual(cluster.get_station(508).get_coordinates(), (0., 0., 0., 0.))
 
+    def test_skip_station_that_can_not_be_created(self):
+        station = clusters.api.Station
+
+        def create_station(number, **kwargs):
+            if number == 510:
+                raise Exception('Failed to get network information')
+            return station(number, **kwargs)
+
+        for workers in [None, 2]:
+            with patch.object(clusters.api, 'Station', side_effect=create_station):
+                with warnings.catch_warnings(record=True) as warned:
+                    warnings.simplefilter('always')
+                    cluster = clusters.HiSPARCStations([501, 508, 510], skip_missing=True, force_stale=True,
+                                                       workers=workers)
+                self.assertIn('510', str(warned[-1].message))
+                self.assertEqual([s.number for s in cluster.stations], [501, 508])
+                self.assertRaises(KeyError, clusters.HiSPARCStations, [501, 510], force_stale=True,
+                                  workers=workers)
+
     def test_missing_gps_not_allowed(self):
         """Making cluster with station without GPS coords raises exception"""
         with self.assertRaises(KeyError):
@@ -1,14 +1,25 @@
+import calendar
+import csv
+import datetime
 import os
+import threading
 import unittest
 
+from codecs import iterdecode
+
+import numpy as np
 import tables
 
 from mock import ANY, MagicMock, patch, sentinel
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
+from six.moves.urllib.parse import parse_qs
 
 from sapphire import api, esd
-from sapphire.tests.esd_load_data import (create_tempfile_path, perform_download_coincidences,
-                                          perform_esd_download_data, perform_load_coincidences,
-                                          perform_load_data, test_data_coincidences_path, test_data_path)
+from sapphire.tests.esd_load_data import (create_tempfile_path, events_source, lightning_source,
+                                          perform_download_coincidences, perform_esd_download_data,
+                                          perform_load_coincidences, perform_load_data, singles_source,
+                                          test_data_coincidences_path, test_data_path, weather_source)
 from sapphire.tests.validate_results import validate_results
 
 
@@ -120,6 +131,44 @@ class ESDTest(unittest.TestCase):
         validate_results(self, test_data_path, output_path)
         os.remove(output_path)
 
+    @patch.object(esd, 'urlopen')
+    def test_download_data_output(self, mock_urlopen):
+        """Download data from recorded tsv and verify the output"""
+
+        def recorded_tsv(url, *args, **kwargs):
+            for data_type, source in [('events', events_source),
+                                      ('weather', weather_source),
+                                      ('singles', singles_source),
+                                      ('lightning', lightning_source)]:
+                if '/%s/' % data_type in url:
+                    return open(source, 'rb')
+
+        mock_urlopen.side_effect = recorded_tsv
+        output_path = create_tempfile_path()
+        perform_esd_download_data(output_path)
+        validate_results(self, test_data_path, output_path)
+        os.remove(output_path)
+
+    def test_store_lines(self):
+        """Storing blocks of lines is equal to storing single lines"""
+
+        with open(events_source, 'rb') as data:
+            lines = list(csv.reader(iterdecode(data, 'utf-8'), delimiter='\t'))
+        with tables.open_file('store_lines.h5', 'w', driver='H5FD_CORE',
+                              driver_core_backing_store=0) as data:
+            table = esd._create_events_table(data, '/lines')
+            with esd._read_line_and_store_event_class(table) as writer:
+                for line in lines:
+                    writer.store_line(line)
+            table = esd._create_events_table(data, '/blocks')
+            with esd._read_line_and_store_event_class(table) as writer:
+                for block in esd._read_blocks(iter(lines), blocksize=7):
+                    timestamp = writer.store_lines(block)
+            self.assertEqual(timestamp, data.root.lines.events[-1]['timestamp'])
+            for column in table.colnames:
+                self.assertEqual(data.root.blocks.events.col(column).tolist(),
+                                 data.root.lines.events.col(column).tolist())
+
     @patch.object(esd.api, 'Network', side_effect=StaleNetwork)
     def test_load_coincidences_output(self, mock_esd_api_network):
         """Load coincidences tsv into hdf5 and verify the output"""
@@ -160,5 +209,323 @@ class ESDTest(unittest.TestCase):
         os.remove(output_path)
 
 
+class RecordedEventsHandler(BaseHTTPRequestHandler):
+
+    """Serve the recorded events which are in the requested interval"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # noqa: N802
+        path, query = self.path.split('?')
+        station_number = int(path.split('/')[2])
+        query = parse_qs(query)
+        start, end = [calendar.timegm(datetime.datetime.strptime(
+                      query[key][0], '%Y-%m-%d %H:%M:%S').utctimetuple())
+                      for key in ['start', 'end']]
+        self.server.requests.append((station_number, start))
+        if self.server.redirects:
+            # Simulate a moved server
+            self.server.redirects -= 1
+            self.send_response(302)
+            self.send_header('Location', self.path)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        lines = []
+        with open(events_source) as data:
+            for line in data:
+                if line.startswith('#'):
+                    lines.append(line)
+                elif start <= int(line.split('\t')[2]) < end:
+                    lines.append(line)
+        if station_number in self.server.incomplete:
+            # Simulate an interrupted download
+            self.server.incomplete.remove(station_number)
+            lines = lines[:-1]
+        body = ''.join(lines).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class RecordedEventsServerTestCase(unittest.TestCase):
+
+    """Serve recorded events from a local server instead of the ESD"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0),
+                                          RecordedEventsHandler)
+        self.server.requests = []
+        self.server.incomplete = set()
+        self.server.redirects = 0
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        url = ('http://127.0.0.1:%d/data/{station_number:d}/events/?{query}' %
+               self.server.server_address[1])
+        patcher = patch.object(esd, 'EVENTS_URL', url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.data = tables.open_file('download_multiple.h5', 'w',
+                                     driver='H5FD_CORE',
+                                     driver_core_backing_store=0)
+        esd.load_data(self.data, '/expected', events_source)
+        self.start = datetime.datetime(2011, 12, 31)
+        self.end = datetime.datetime(2012, 1, 2)
+        self.days = [calendar.timegm(self.start.utctimetuple()) + offset
+                     for offset in [0, 86400]]
+
+    def tearDown(self):
+        self.data.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class DownloadMultipleDataTest(RecordedEventsServerTestCase):
+
+    def validate_events(self, station_numbers):
+        expected = self.data.root.expected.events
+        for station_number in station_numbers:
+            events = self.data.get_node('/s%d' % station_number, 'events')
+            for column in expected.colnames:
+                self.assertEqual(events.col(column).tolist(),
+                                 expected.col(column).tolist())
+            self.assertEqual(events.attrs.downloaded_intervals,
+                             [(self.days[0], self.days[1] + 86400)])
+
+    def test_download_multiple_data(self):
+        esd.download_multiple_data(self.data, [501, 502], self.start,
+                                   self.end, workers=2, progress=False)
+        self.assertEqual(sorted(self.server.requests),
+                         [(501, self.days[0]), (501, self.days[1]),
+                          (502, self.days[0]), (502, self.days[1])])
+        self.validate_events([501, 502])
+
+    def test_resume_download(self):
+        self.server.incomplete.add(502)
+        self.assertRaises(Exception, esd.download_multiple_data, self.data,
+                          [501, 502], self.start, self.end, workers=1,
+                          progress=False)
+        self.assertEqual(
+            self.data.root.s501.events.attrs.downloaded_intervals,
+            [(self.days[0], self.days[1])])
+        self.assertNotIn('downloaded_intervals',
+                         self.data.root.s502.events.attrs)
+
+        del self.server.requests[:]
+        esd.download_multiple_data(self.data, [501, 502], self.start,
+                                   self.end, workers=2, progress=False)
+        self.assertEqual(sorted(self.server.requests),
+                         [(501, self.days[1]), (502, self.days[0]),
+                          (502, self.days[1])])
+        self.validate_events([501, 502])
+
+    def test_download_rest_of_day(self):
+        middle = datetime.datetime(2012, 1, 1, 0, 0, 30)
+        esd.download_multiple_data(self.data, [501], middle, self.end,
+                                   workers=1, progress=False)
+        del self.server.requests[:]
+        esd.download_multiple_data(self.data, [501], self.start, self.end,
+                                   workers=2, progress=False)
+        self.assertEqual(sorted(self.server.requests),
+                         [(501, self.days[0]), (501, self.days[1])])
+        self.validate_events([501])
+
+    def test_download_into_table_without_intervals(self):
+        esd.download_data(self.data, '/s501', 501, self.start, self.end,
+                          progress=False)
+        esd.download_multiple_data(self.data, [501], self.start, self.end,
+                                   workers=2, progress=False)
+        self.validate_events([501])
+
+    def test_download_earlier_data_in_use(self):
+        middle = datetime.datetime(2012, 1, 1, 0, 0, 30)
+        esd.download_multiple_data(self.data, [501], middle, self.end,
+                                   workers=1, progress=False)
+        self.data.create_group('/s501', 'reconstructions')
+        del self.server.requests[:]
+        self.assertRaises(RuntimeError, esd.download_multiple_data,
+                          self.data, [501], self.start, self.end, workers=1,
+                          progress=False)
+        self.assertEqual(self.server.requests, [])
+
+    def test_follow_redirects(self):
+        self.server.redirects = esd.MAX_REDIRECTS
+        esd.download_multiple_data(self.data, [501], self.start, self.end,
+                                   workers=1, progress=False)
+        self.validate_events([501])
+
+    def test_too_many_redirects(self):
+        self.server.redirects = esd.MAX_REDIRECTS + 1
+        self.assertRaises(Exception, esd.download_multiple_data, self.data,
+                          [501], datetime.datetime(2012, 1, 1), self.end,
+                          workers=1, progress=False)
+        self.assertEqual(self.server.requests,
+                         [(501, self.days[1])] * (esd.MAX_REDIRECTS + 1))
+
+    def test_interrupted_while_storing(self):
+        with patch.object(esd, '_add_downloaded_interval') as mock_add:
+            mock_add.side_effect = KeyboardInterrupt
+            self.assertRaises(KeyboardInterrupt, esd.download_multiple_data,
+                              self.data, [501], self.start, self.end,
+                              workers=1, progress=False)
+        self.assertEqual(self.data.root.s501.events.nrows, 0)
+        esd.download_multiple_data(self.data, [501], self.start, self.end,
+                                   workers=1, progress=False)
+        self.validate_events([501])
+
+    def test_split_in_days(self):
+        start = datetime.datetime(2016, 1, 1, 12)
+        end = datetime.datetime(2016, 1, 3, 6)
+        self.assertEqual(esd._split_in_days(start, end),
+                         [(start, datetime.datetime(2016, 1, 2)),
+                          (datetime.datetime(2016, 1, 2),
+                           datetime.datetime(2016, 1, 3)),
+                          (datetime.datetime(2016, 1, 3), end)])
+        self.assertEqual(esd._split_in_days(end, start), [])
+
+
+class IncrementalDownloadDataTest(RecordedEventsServerTestCase):
+
+    def setUp(self):
+        super(IncrementalDownloadDataTest, self).setUp()
+        self.start = datetime.datetime(2012, 1, 1)
+        self.middle = datetime.datetime(2012, 1, 1, 0, 0, 30)
+        self.end = datetime.datetime(2012, 1, 1, 0, 1)
+        self.timestamps = self.data.root.expected.events.col('timestamp')
+
+    def download(self, start, end, incremental=False):
+        esd.download_data(self.data, '/s501', 501, start, end,
+                          progress=False, incremental=incremental)
+
+    def validate_events(self):
+        expected = self.data.root.expected.events
+        events = self.data.root.s501.events
+        for column in expected.colnames:
+            self.assertEqual(events.col(column).tolist(),
+                             expected.col(column).tolist())
+
+    def test_download_new_data(self):
+        self.download(self.start, self.middle)
+        del self.server.requests[:]
+        self.download(self.start, self.end, incremental=True)
+        self.assertEqual(self.server.requests,
+                         [(501, calendar.timegm(self.middle.timetuple()))])
+        self.validate_events()
+        self.assertEqual(self.data.root.s501.events.attrs.downloaded_intervals,
+                         [(calendar.timegm(self.start.timetuple()),
+                           calendar.timegm(self.end.timetuple()))])
+
+    def test_download_earlier_data(self):
+        self.download(self.middle, self.end)
+        del self.server.requests[:]
+        self.download(self.start, self.end, incremental=True)
+        self.assertEqual(self.server.requests,
+                         [(501, calendar.timegm(self.start.timetuple()))])
+        self.validate_events()
+
+    def test_download_earlier_data_in_use(self):
+        self.download(self.middle, self.end)
+        del self.server.requests[:]
+        s_index = self.data.create_vlarray('/coincidences', 's_index',
+                                           tables.VLStringAtom(),
+                                           createparents=True)
+        s_index.append(b'/s501')
+        events = self.data.root.s501.events.read()
+        self.assertRaises(RuntimeError, self.download, self.start, self.end,
+                          incremental=True)
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(self.data.root.s501.events.col('event_id').tolist(),
+                         events['event_id'].tolist())
+
+        self.data.remove_node('/coincidences', recursive=True)
+        self.data.create_group('/s501', 'reconstructions')
+        self.assertRaises(RuntimeError, self.download, self.start, self.end,
+                          incremental=True)
+
+    def test_merge_new_rows(self):
+        table = esd._get_or_create_events_table(self.data, '/merge')
+        rows = np.zeros(6, dtype=table.dtype)
+        rows['event_id'] = range(6)
+        rows['timestamp'] = [1, 2, 5, 6, 3, 4]
+        rows['ext_timestamp'] = rows['timestamp'].astype(np.uint64) * 1000000000
+        table.append(rows)
+        esd._merge_new_rows(table, 4)
+        self.assertEqual(table.col('timestamp').tolist(), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(table.col('event_id').tolist(), list(range(6)))
+
+    def test_download_into_empty_table(self):
+        self.download(self.start, self.end, incremental=True)
+        self.assertEqual(len(self.server.requests), 1)
+        self.validate_events()
+
+    def test_nothing_to_download(self):
+        self.download(self.start, self.end)
+        del self.server.requests[:]
+        self.download(self.start, self.end, incremental=True)
+        self.download(self.middle, self.end, incremental=True)
+        self.assertEqual(self.server.requests, [])
+        self.validate_events()
+
+    def test_download_into_table_without_intervals(self):
+        self.download(self.start, self.end)
+        del self.server.requests[:]
+        first = datetime.datetime.utcfromtimestamp(self.timestamps.min())
+        last = datetime.datetime.utcfromtimestamp(self.timestamps.max())
+        self.download(first, last + datetime.timedelta(seconds=1),
+                      incremental=True)
+        self.assertEqual(self.server.requests, [])
+        self.validate_events()
+
+    def test_failed_download_is_removed(self):
+        self.download(self.start, self.middle)
+        del self.server.requests[:]
+        self.server.incomplete.add(501)
+        self.assertRaises(Exception, self.download, self.start, self.end,
+                          incremental=True)
+        self.download(self.start, self.end, incremental=True)
+        self.assertEqual(self.server.requests,
+                         [(501, calendar.timegm(self.middle.timetuple()))] * 2)
+        self.validate_events()
+
+    def test_uncovered_intervals(self):
+        intervals = [(100, 200), (10, 16), (150, 201)]
+        start = datetime.datetime.utcfromtimestamp(0)
+
+        def dt(t):
+            return start + datetime.timedelta(seconds=t)
+
+        self.assertEqual(esd._uncovered_intervals(intervals, dt(0), dt(300)),
+                         [(dt(0), dt(10)), (dt(16), dt(100)),
+                          (dt(201), dt(300))])
+        self.assertEqual(esd._uncovered_intervals(intervals, dt(12), dt(150)),
+                         [(dt(16), dt(100))])
+        self.assertEqual(esd._uncovered_intervals(intervals, dt(300), dt(400)),
+                         [(dt(300), dt(400))])
+        self.assertEqual(esd._uncovered_intervals([], dt(0), dt(300)),
+                         [(dt(0), dt(300))])
+
+    def test_add_downloaded_interval(self):
+        events = self.data.root.expected.events
+        esd._add_downloaded_interval(events, 100, 200)
+        esd._add_downloaded_interval(events, 10, 16)
+        esd._add_downloaded_interval(events, 200, 250)
+        self.assertEqual(events.attrs.downloaded_intervals,
+                         [(10, 16), (100, 250)])
+        esd._add_downloaded_interval(events, 0, 300)
+        self.assertEqual(events.attrs.downloaded_intervals, [(0, 300)])
+
+
 if __name__ == '__main__':
     unittest.main()
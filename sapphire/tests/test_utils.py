@@ -5,7 +5,7 @@ import unittest
 
 import progressbar
 
-from numpy import exp, pi, random, sqrt
+from numpy import array, exp, pi, random, sqrt
 from six import StringIO
 
 from sapphire import utils
@@ -93,6 +93,94 @@ class ActiveIndexTests(unittest.TestCase):
                         (3, 5.)]:
             self.assertEqual(utils.get_active_index(timestamps, ts), idx)
 
+    def test_get_active_indices(self):
+        """Array version returns the same indices as get_active_index"""
+
+        timestamps = [1., 2., 3., 4.]
+        values = [0., 1., 1.5, 2., 2.1, 4., 5.]
+        self.assertEqual(utils.get_active_indices(timestamps, values).tolist(),
+                         [utils.get_active_index(timestamps, value)
+                          for value in values])
+
+
+class MemoCacheTests(unittest.TestCase):
+
+    def test_cache(self):
+        cache = utils.MemoCache(maxsize=2)
+        self.assertRaises(KeyError, cache.get, 'a')
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        # 'b' is the least recently used value
+        cache.set('c', 3)
+        self.assertRaises(KeyError, cache.get, 'b')
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.info(), utils.CacheInfo(2, 2, 2, 2))
+        cache.clear()
+        self.assertEqual(cache.info(), utils.CacheInfo(0, 0, 2, 0))
+
+
+class MemoizeTests(unittest.TestCase):
+
+    class Calculator(object):
+        def __init__(self):
+            self.calls = 0
+
+        @utils.memoize
+        def add(self, a, b=0):
+            self.calls += 1
+            return a + b
+
+        @utils.memoize(maxsize=2)
+        def total(self, values, extra=None):
+            self.calls += 1
+            return sum(values) + sum((extra or {}).values())
+
+    def test_cache(self):
+        calc = self.Calculator()
+        self.assertEqual(calc.add(1, 2), 3)
+        self.assertEqual(calc.add(1, 2), 3)
+        self.assertEqual(calc.add(1, b=2), 3)
+        self.assertEqual(calc.add(1, b=2), 3)
+        self.assertEqual(calc.calls, 2)
+        self.assertEqual(self.Calculator.add.cache_info(calc),
+                         utils.CacheInfo(2, 2, None, 2))
+
+        # caches are per instance
+        other = self.Calculator()
+        self.assertEqual(other.add(1, 2), 3)
+        self.assertEqual(other.calls, 1)
+
+        self.Calculator.add.cache_clear(calc)
+        self.assertEqual(calc.add(1, 2), 3)
+        self.assertEqual(calc.calls, 3)
+
+    def test_unhashable_arguments(self):
+        calc = self.Calculator()
+        self.assertEqual(calc.total([1, 2]), 3)
+        self.assertEqual(calc.total([1, 2]), 3)
+        self.assertEqual(calc.total((1, 2)), 3)
+        self.assertEqual(calc.total(array([1, 2])), 3)
+        self.assertEqual(calc.calls, 3)
+        self.assertEqual(calc.total(array([1, 2])), 3)
+        self.assertEqual(calc.total([1, 2], extra={'a': 1}), 4)
+        self.assertEqual(calc.total([1, 2], extra={'a': 1}), 4)
+        self.assertEqual(calc.calls, 4)
+
+    def test_lru_eviction(self):
+        calc = self.Calculator()
+        calc.total([1])
+        calc.total([2])
+        calc.total([1])
+        calc.total([3])
+        self.assertEqual(calc.calls, 3)
+        self.assertEqual(self.Calculator.total.cache_info(calc).currsize, 2)
+        # [2] was least recently used
+        calc.total([1])
+        self.assertEqual(calc.calls, 3)
+        calc.total([2])
+        self.assertEqual(calc.calls, 4)
+
 
 class GaussTests(unittest.TestCase):
 
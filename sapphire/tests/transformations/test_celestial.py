@@ -193,6 +193,33 @@ class EquatorialTests(unittest.TestCase):
         self.assertAlmostEqual(zencalc, zenith, 2)
         self.assertAlmostEqual(azcalc, azimuth, 2)
 
+    def test_arrays(self):
+        """Check that arrays give the same results as scalars"""
+
+        n = 20
+        latitude = np.random.uniform(-60, 60, n)
+        longitude = np.random.uniform(-180, 180, n)
+        gps = np.random.randint(1e9, 1.5e9, n)
+        zenith = np.random.uniform(0, pi / 2, n)
+        azimuth = np.random.uniform(-pi, pi, n)
+
+        ra, dec = celestial.zenithazimuth_to_equatorial(latitude, longitude,
+                                                        gps, zenith, azimuth)
+        zencalc, azcalc = celestial.equatorial_to_zenithazimuth(
+            latitude, longitude, gps, ra, dec)
+
+        for i in range(n):
+            ra_i, dec_i = celestial.zenithazimuth_to_equatorial(
+                latitude[i], longitude[i], gps[i], zenith[i], azimuth[i])
+            self.assertEqual(ra[i], ra_i)
+            self.assertEqual(dec[i], dec_i)
+            zen_i, az_i = celestial.equatorial_to_zenithazimuth(
+                latitude[i], longitude[i], gps[i], ra[i], dec[i])
+            self.assertEqual(zencalc[i], zen_i)
+            self.assertEqual(azcalc[i], az_i)
+
+        np.testing.assert_allclose(zencalc, zenith, atol=1e-6)
+
 
 @unittest.skipUnless(has_astropy, "astropy required.")
 class AstropyEquatorialTests(unittest.TestCase):
@@ -325,6 +352,69 @@ class AstropyEquatorialTests(unittest.TestCase):
         # Test zenithazimuth_to_equatorial_astropy
         np.testing.assert_almost_equal(efemeq, zenaztoeq_test, 4)
 
+    def test_pyephem_batch(self):
+        """Check the batch versions of the astropy functions"""
+
+        from astropy.utils import iers
+        degraded_accuracy = iers.conf.iers_degraded_accuracy
+
+        with celestial.use_bundled_iers_tables():
+            self.check_batch()
+
+        # the configuration is restored
+        self.assertEqual(iers.conf.iers_degraded_accuracy, degraded_accuracy)
+
+    def check_batch(self):
+        # This is the transform inputs, the first event is repeated to get
+        # multiple events for one location
+        eq = np.array([(-39.34633914878846, -112.2277168069694, 1295503840,
+                        3.8662384455822716, -0.31222454326513827),
+                       (53.13143508448587, -49.24074935964933, 985619982,
+                        3.901575896592809, -0.3926720112815971),
+                       (48.02031016860923, -157.4023812557098, 1126251396,
+                        3.366278312183976, -1.3610394240813288),
+                       (-39.34633914878846, -112.2277168069694, 1295503840,
+                        3.8662384455822716, -0.31222454326513827)])
+        latitude, longitude, gps = eq[:, 0], eq[:, 1], eq[:, 2]
+
+        # result of pyephem hor->eq/zenaz-> eq
+        efemeq = [(5.620508199785029, -0.3651173667585858),
+                  (5.244630787139936, -0.7866376569183651),
+                  (2.276751381056623, -1.0406498066785745),
+                  (5.620508199785029, -0.3651173667585858)]
+        # result of pyephem eq->hor
+        altaz = [(2.175107479095459, -0.19537943601608276),
+                 (5.25273323059082, -0.8308737874031067),
+                 (3.4536221027374268, -0.894329845905304),
+                 (2.175107479095459, -0.19537943601608276)]
+
+        result = celestial.horizontal_to_equatorial_astropy_batch(
+            latitude, longitude, gps, eq[:, 3:])
+        np.testing.assert_almost_equal(efemeq, result, 4)
+
+        result = celestial.equatorial_to_horizontal_astropy_batch(
+            latitude, longitude, gps, eq[:, 3:])
+        np.testing.assert_almost_equal(altaz, result, 4)
+
+        # Compare to the single event versions
+        zenaz = celestial.equatorial_to_zenithazimuth_astropy_batch(
+            latitude, longitude, gps, efemeq)
+        equatorial = celestial.zenithazimuth_to_equatorial_astropy_batch(
+            latitude, longitude, gps, zenaz)
+        for i in range(len(eq)):
+            expected = celestial.equatorial_to_zenithazimuth_astropy(
+                latitude[i], longitude[i], gps[i], [efemeq[i]])
+            np.testing.assert_almost_equal(expected, zenaz[i:i + 1], 10)
+            expected = celestial.zenithazimuth_to_equatorial_astropy(
+                latitude[i], longitude[i], gps[i], [zenaz[i]])
+            np.testing.assert_almost_equal(expected, equatorial[i:i + 1], 10)
+        np.testing.assert_almost_equal(efemeq, equatorial, 10)
+
+        # One observer for all events
+        result = celestial.horizontal_to_equatorial_astropy_batch(
+            latitude[0], longitude[0], gps[0], eq[[0, 3], 3:])
+        np.testing.assert_almost_equal(efemeq[:1] * 2, result, 4)
+
 
 if __name__ == '__main__':
     unittest.main()
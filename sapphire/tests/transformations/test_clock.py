@@ -2,6 +2,8 @@ import datetime
 import random
 import unittest
 
+import numpy as np
+
 from sapphire.transformations import clock
 
 
@@ -83,6 +85,24 @@ class GMSTTests(unittest.TestCase):
         self.assertAlmostEqual(clock.utc_to_gmst(datetime.datetime(2010, 12, 25)),
                                clock.time_to_decimal(datetime.time(6, 13, 35, 852535)))
 
+    def test_juliandate_to_gmst_array(self):
+        juliandates = np.array([2455555.5, 2455556.0, 2457000.123])
+        gmst = clock.juliandate_to_gmst(juliandates)
+        for juliandate, hours in zip(juliandates, gmst):
+            self.assertEqual(clock.juliandate_to_gmst(juliandate), hours)
+
+    def test_utc_timestamp_to_gmst(self):
+        dt = datetime.datetime(2010, 12, 25)
+        timestamp = clock.datetime_to_gps(dt)
+        self.assertEqual(clock.utc_timestamp_to_juliandate(timestamp),
+                         clock.datetime_to_juliandate(dt))
+        self.assertAlmostEqual(clock.utc_timestamp_to_gmst(timestamp),
+                               clock.utc_to_gmst(dt))
+        timestamps = timestamp + np.array([0, 3600, 123456])
+        for timestamp, gmst in zip(timestamps, clock.utc_timestamp_to_gmst(timestamps)):
+            dt = datetime.datetime.utcfromtimestamp(timestamp)
+            self.assertAlmostEqual(gmst, clock.utc_to_gmst(dt))
+
 
 class LSTTests(unittest.TestCase):
 
@@ -108,6 +128,15 @@ class LSTTests(unittest.TestCase):
         self.assertAlmostEqual(clock.utc_to_lst(datetime.datetime(2010, 12, 25), 5),
                                clock.time_to_decimal(datetime.time(6, 33, 35, 852535)))
 
+    def test_gps_to_lst(self):
+        timestamps = np.array([1e9, 1.2e9, 1.5e9]).astype(int)
+        longitude = 4.95
+        lst = clock.gps_to_lst(timestamps, longitude)
+        for timestamp, hours in zip(timestamps, lst):
+            utc = datetime.datetime.utcfromtimestamp(clock.gps_to_utc(int(timestamp)))
+            self.assertAlmostEqual(hours, clock.utc_to_lst(utc, longitude))
+            self.assertEqual(clock.gps_to_lst(timestamp, longitude), hours)
+
 
 class GPSTimeTests(unittest.TestCase):
 
@@ -154,6 +183,21 @@ class GPSTimeTests(unittest.TestCase):
             self.assertEqual(clock.utc_to_gps(clock.utc_from_string(date)),
                              clock.gps_from_string(date))
 
+    def test_gps_to_utc_array(self):
+        gps = np.array([clock.gps_from_string(date) for date, _, _ in self.combinations])
+        utc = np.array([clock.utc_from_string(date) for date, _, _ in self.combinations])
+        np.testing.assert_equal(clock.gps_to_utc(gps), utc)
+        np.testing.assert_equal(clock.utc_to_gps(utc), gps)
+
+    def test_leap_seconds(self):
+        for date, timestamp, leapseconds in self.combinations:
+            self.assertEqual(clock.leap_seconds(timestamp), leapseconds)
+        self.assertEqual(clock.leap_seconds(0), 0)
+        self.assertEqual(clock.leap_seconds(2e9), clock.LEAP_SECONDS[0][1])
+        timestamps = np.array([timestamp for _, timestamp, _ in self.combinations])
+        leapseconds = np.array([leapseconds for _, _, leapseconds in self.combinations])
+        np.testing.assert_equal(clock.leap_seconds(timestamps), leapseconds)
+
     def test_utc_from_string(self):
         for date, timestamp, _ in self.combinations:
             self.assertEqual(clock.utc_from_string(date), timestamp)
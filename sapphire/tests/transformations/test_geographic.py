@@ -1,5 +1,9 @@
 import unittest
 
+import numpy as np
+
+from numpy.testing import assert_allclose
+
 from sapphire.transformations import geographic
 
 
@@ -29,6 +33,33 @@ class GeographicTransformationTests(unittest.TestCase):
         lla = self.transform.enu_to_lla(enu)
         self.assert_tuple_almost_equal(self.transform.ref_lla, lla)
 
+    def test_arrays(self):
+        llas = np.array([self.ref_lla,
+                         (52.35, 4.95, 10.),
+                         (52.36, 4.96, 100.),
+                         (-33.9, 18.4, 1000.)])
+
+        ecef = self.transform.lla_to_ecef(llas)
+        enu = self.transform.lla_to_enu(llas)
+        self.assertEqual(ecef.shape, (4, 3))
+        self.assertEqual(enu.shape, (4, 3))
+        for lla, ecef_i, enu_i in zip(llas, ecef, enu):
+            assert_allclose(self.transform.lla_to_ecef(tuple(lla)), ecef_i)
+            assert_allclose(self.transform.lla_to_enu(tuple(lla)), enu_i, atol=1e-8)
+
+        assert_allclose(self.transform.ecef_to_lla(ecef), llas)
+        assert_allclose(self.transform.enu_to_ecef(enu), ecef)
+        assert_allclose(self.transform.enu_to_lla(enu), llas)
+        assert_allclose(self.transform.transform(llas), enu)
+        assert_allclose(enu[0], (0., 0., 0.), atol=1e-8)
+
+    def test_enu_transformation(self):
+        transform = geographic.enu_transformation(self.ref_lla)
+        self.assertIsInstance(transform, geographic.FromWGS84ToENUTransformation)
+        self.assertEqual(transform.ref_lla, self.ref_lla)
+        self.assertIs(geographic.enu_transformation(list(self.ref_lla)), transform)
+        self.assertIsNot(geographic.enu_transformation((52., 4., 0.)), transform)
+
     def assert_tuple_almost_equal(self, actual, expected, places=7):
         self.assertIsInstance(actual, tuple)
         self.assertIsInstance(expected, tuple)
@@ -18,16 +18,20 @@ import warnings
 
 import numpy as np
 
-from numpy import arccos, arcsin, around, cos, pi, radians, sin
+from numpy import arccos, arcsin, around, cos, pi, radians, sin, where
 
 from . import angles, clock
-from ..utils import norm_angle
+from ..utils import MemoCache, norm_angle
 
 
 def zenithazimuth_to_equatorial(latitude, longitude, timestamp, zenith,
                                 azimuth):
     """Convert Zenith Azimuth to Equatorial coordinates (J2000.0)
 
+    All arguments may also be arrays (which are broadcast together), for
+    instance to convert many events at once, each with the position of
+    the station that observed it.
+
     :param latitude,longitude: Position of the observer on Earth in degrees.
                                North and east positive.
     :param timestamp: GPS timestamp of the observation in seconds.
@@ -125,9 +129,8 @@ def horizontal_to_hadec(latitude, altitude, alt_azimuth):
     # Round to prevent value beyond allowed range for arccos.
     cha = around((salt - (slat * sin(dec))) / (clat * cos(dec)), 15)
     ha = arccos(cha)
-
-    if sazi > 0:
-        ha = 2 * pi - ha
+    # Indexing with () turns 0-d arrays back into scalars
+    ha = where(sazi > 0, 2 * pi - ha, ha)[()]
 
     return ha, dec
 
@@ -160,6 +163,8 @@ def equatorial_to_zenithazimuth(latitude, longitude, timestamp,
 
     :return: zenith and azimuth in radians.
 
+    All arguments may also be arrays, which are broadcast together.
+
     This function was renamed from equatorial_to_horizontal to
     equatorial_to_zenithazimuth in order to make it operate as the name does.
 
@@ -181,8 +186,8 @@ def equatorial_to_zenithazimuth(latitude, longitude, timestamp,
     alt_azimuth = arccos((sdec - (slat * sin(altitude))) /
                          (clat * cos(altitude)))
 
-    if sha > 0:
-        alt_azimuth = 2 * pi - alt_azimuth
+    # Indexing with () turns 0-d arrays back into scalars
+    alt_azimuth = where(sha > 0, 2 * pi - alt_azimuth, alt_azimuth)[()]
 
     zenith, azimuth = horizontal_to_zenithazimuth(altitude, alt_azimuth)
 
@@ -194,8 +199,74 @@ try:
     # to accommodate those without astropy.
     import astropy.units as u
 
-    from astropy.coordinates import EarthLocation, SkyCoord
+    from astropy.coordinates import ICRS, AltAz, EarthLocation, SkyCoord
     from astropy.time import Time
+    from astropy.utils import iers
+
+    #: Cache of observer locations, keyed by latitude and longitude.
+    _earth_locations = MemoCache(maxsize=1000)
+
+    def use_bundled_iers_tables():
+        """Only use the IERS tables bundled with astropy
+
+        Disables downloading of IERS tables, such that the astropy
+        transformations can be performed offline. The bundled IERS-B
+        table is loaded once and used for all following transformations.
+        Outside its time range the transformations are less accurate.
+
+        The returned object restores the previous configuration when it
+        is used as a context manager::
+
+            >>> with use_bundled_iers_tables():
+            ...     equatorial_to_horizontal_astropy_batch(
+            ...         latitude, longitude, timestamps, coordinates)
+
+        """
+        restore = _RestoreIERSConfiguration()
+        iers.conf.auto_download = False
+        if hasattr(iers.conf, 'iers_degraded_accuracy'):
+            iers.conf.iers_degraded_accuracy = 'warn'
+        if hasattr(iers, 'earth_orientation_table'):
+            restore.table = iers.earth_orientation_table.set(
+                iers.IERS_B.open())
+        return restore
+
+    class _RestoreIERSConfiguration(object):
+
+        """Restore the IERS configuration when leaving a with block"""
+
+        def __init__(self):
+            self.auto_download = iers.conf.auto_download
+            self.degraded_accuracy = getattr(iers.conf,
+                                             'iers_degraded_accuracy', None)
+            self.table = None
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            iers.conf.auto_download = self.auto_download
+            if self.degraded_accuracy is not None:
+                iers.conf.iers_degraded_accuracy = self.degraded_accuracy
+            if self.table is not None:
+                self.table.__exit__(exc_type, exc_value, traceback)
+
+    def _earth_location(latitude, longitude):
+        """Get the (cached) EarthLocation of an observer
+
+        :param latitude: Latitude in decimal degrees
+        :param longitude: Longitude in decimal degrees
+        :return: EarthLocation object.
+
+        """
+        key = (float(latitude), float(longitude))
+        try:
+            return _earth_locations.get(key)
+        except KeyError:
+            location = EarthLocation.from_geodetic(key[1] * u.deg,
+                                                   key[0] * u.deg)
+            _earth_locations.set(key, location)
+            return location
 
     def zenithazimuth_to_equatorial_astropy(latitude, longitude, utc_timestamp,
                                             zenaz_coordinates):
@@ -269,7 +340,7 @@ try:
         # For speed in numpy
         equatorial_coordinates = np.array(equatorial_coordinates)
 
-        location = EarthLocation(longitude, latitude)
+        location = _earth_location(latitude, longitude)
         t = Time(datetime.datetime.utcfromtimestamp(utc_timestamp))
         equatorial_frame = SkyCoord(equatorial_coordinates, location=location,
                                     obstime=t, unit=u.rad, frame='icrs')
@@ -292,7 +363,7 @@ try:
         # For speed in numpy
         horizontal_coordinates = np.array(horizontal_coordinates)
 
-        location = EarthLocation(longitude, latitude)
+        location = _earth_location(latitude, longitude)
         t = Time(datetime.datetime.utcfromtimestamp(utc_timestamp))
         horizontal_frame = SkyCoord(horizontal_coordinates, location=location,
                                     obstime=t, unit=u.rad, frame='altaz')
@@ -300,6 +371,151 @@ try:
 
         return np.array((equatorial_frame.ra.rad, equatorial_frame.dec.rad)).T
 
+    def _transform_astropy_batch(latitude, longitude, utc_timestamps,
+                                 coordinates, transform):
+        """Perform a transformation per observer location
+
+        The events are grouped by observer location, for each location a
+        single transformation is performed over all times of its events.
+
+        :param latitude: Latitude(s) in decimal degrees
+        :param longitude: Longitude(s) in decimal degrees
+        :param utc_timestamps: Unix UTC timestamp(s)
+        :param coordinates: np.array of tuples of coordinates in radians
+        :param transform: function which transforms the coordinates
+            given an EarthLocation, a Time and a coordinate array.
+        :return: np.array of tuples of the transformed coordinates.
+
+        """
+        coordinates = np.array(coordinates, dtype=float).reshape(-1, 2)
+        n = len(coordinates)
+        utc_timestamps = np.broadcast_to(utc_timestamps, n)
+        locations = np.column_stack((np.broadcast_to(latitude, n),
+                                     np.broadcast_to(longitude, n)))
+        locations, inverse = np.unique(locations, axis=0,
+                                       return_inverse=True)
+        inverse = inverse.ravel()
+        # indexes of the events, grouped by location
+        order = np.argsort(inverse, kind='mergesort')
+        splits = np.cumsum(np.bincount(inverse))[:-1]
+
+        result = np.empty((n, 2))
+        for (lat, lon), selection in zip(locations, np.split(order, splits)):
+            location = _earth_location(lat, lon)
+            t = Time(utc_timestamps[selection], format='unix')
+            result[selection] = transform(location, t,
+                                          coordinates[selection])
+
+        return result
+
+    def _equatorial_to_horizontal(location, t, equatorial_coordinates):
+        horizontal_frame = AltAz(obstime=t, location=location)
+        equatorial_frame = SkyCoord(ra=equatorial_coordinates[:, 0],
+                                    dec=equatorial_coordinates[:, 1],
+                                    unit=u.rad, frame='icrs')
+        horizontal = equatorial_frame.transform_to(horizontal_frame)
+
+        return np.array((horizontal.az.rad, horizontal.alt.rad)).T
+
+    def _horizontal_to_equatorial(location, t, horizontal_coordinates):
+        horizontal_frame = SkyCoord(az=horizontal_coordinates[:, 0],
+                                    alt=horizontal_coordinates[:, 1],
+                                    unit=u.rad, frame=AltAz(obstime=t,
+                                                            location=location))
+        equatorial = horizontal_frame.transform_to(ICRS())
+
+        return np.array((equatorial.ra.rad, equatorial.dec.rad)).T
+
+    def equatorial_to_horizontal_astropy_batch(latitude, longitude,
+                                               utc_timestamps,
+                                               equatorial_coordinates):
+        """ Converts equatorial to horizontal coordinates of many events
+
+        In contrast to :func:`equatorial_to_horizontal_astropy` each
+        coordinate can have its own time and observer location. A single
+        transformation is performed for all events of each location.
+
+        :param latitude: Latitude(s) in decimal degrees
+        :param longitude: Longitude(s) in decimal degrees
+        :param utc_timestamps: Unix UTC timestamp(s)
+        :param equatorial_coordinates: np.array of tuples (ra, dec) in radians
+        :return: np.array of tuples (az, alt) in radians
+        """
+        return _transform_astropy_batch(latitude, longitude, utc_timestamps,
+                                        equatorial_coordinates,
+                                        _equatorial_to_horizontal)
+
+    def horizontal_to_equatorial_astropy_batch(latitude, longitude,
+                                               utc_timestamps,
+                                               horizontal_coordinates):
+        """ Converts horizontal to equatorial coordinates of many events
+
+        In contrast to :func:`horizontal_to_equatorial_astropy` each
+        coordinate can have its own time and observer location. A single
+        transformation is performed for all events of each location.
+
+        :param latitude: Latitude(s) in decimal degrees
+        :param longitude: Longitude(s) in decimal degrees
+        :param utc_timestamps: Unix UTC timestamp(s)
+        :param horizontal_coordinates: np.array of tuples (az, alt) in radians
+        :return: np.array of tuples (ra, dec) in radians
+        """
+        return _transform_astropy_batch(latitude, longitude, utc_timestamps,
+                                        horizontal_coordinates,
+                                        _horizontal_to_equatorial)
+
+    def zenithazimuth_to_equatorial_astropy_batch(latitude, longitude,
+                                                  utc_timestamps,
+                                                  zenaz_coordinates):
+        """ Converts zenithazimuth to equatorial coordinates of many events
+
+        Batch version of :func:`zenithazimuth_to_equatorial_astropy`, see
+        :func:`horizontal_to_equatorial_astropy_batch`.
+
+        :param latitude: Latitude(s) in decimal degrees
+        :param longitude: Longitude(s) in decimal degrees
+        :param utc_timestamps: Unix UTC timestamp(s)
+        :param zenaz_coordinates: np.array of tuples (zen, az) in radians
+        :return: np.array of tuples (ra, dec) in radians
+        """
+        # Convert and flip order of zenaz coordinates, done in numpy for speed
+        zenaz_coordinates = np.array(zenaz_coordinates).reshape(-1, 2)
+        zenaz_coordinates = 0.5 * np.pi - zenaz_coordinates
+        horizontal_coordinates = np.unwrap(zenaz_coordinates[:, [1, 0]])
+
+        # Normalise angle
+        horizontal_coordinates = norm_angle(horizontal_coordinates)
+
+        return horizontal_to_equatorial_astropy_batch(latitude, longitude,
+                                                      utc_timestamps,
+                                                      horizontal_coordinates)
+
+    def equatorial_to_zenithazimuth_astropy_batch(latitude, longitude,
+                                                  utc_timestamps,
+                                                  equatorial_coordinates):
+        """ Converts equatorial to zenithazimuth coordinates of many events
+
+        Batch version of :func:`equatorial_to_zenithazimuth_astropy`, see
+        :func:`equatorial_to_horizontal_astropy_batch`.
+
+        :param latitude: Latitude(s) in decimal degrees
+        :param longitude: Longitude(s) in decimal degrees
+        :param utc_timestamps: Unix UTC timestamp(s)
+        :param equatorial_coordinates: np.array of tuples (ra, dec) in radians
+        :return: np.array of tuples (zen, az) in radians
+        """
+        horizontal_coordinates = equatorial_to_horizontal_astropy_batch(
+            latitude, longitude, utc_timestamps, equatorial_coordinates)
+
+        # Convert and flip order of zenaz coordinates, done in numpy for speed
+        horizontal_coordinates = 0.5 * np.pi - horizontal_coordinates
+        zenaz_coordinates = horizontal_coordinates[:, [1, 0]]
+
+        # Normalise angle
+        zenaz_coordinates = norm_angle(zenaz_coordinates)
+
+        return zenaz_coordinates
+
 
 except ImportError as e:
     warnings.warn(str(e) + "\nImport of astropy failed", ImportWarning)
@@ -29,6 +29,8 @@ import math
 
 from time import strptime
 
+import numpy as np
+
 from . import angles, base
 
 #: Dates of leap second introductions.
@@ -51,6 +53,14 @@ LEAP_SECONDS = (('January 1, 2017', 18),
                 ('July 1, 1982', 2),
                 ('July 1, 1981', 1))
 
+#: UTC timestamps of the leap second introductions, in ascending order.
+LEAP_SECONDS_UTC = np.array([calendar.timegm(strptime(date, '%B %d, %Y'))
+                             for date, _ in reversed(LEAP_SECONDS)])
+
+#: Number of leap seconds before the first and after each introduction.
+LEAP_SECONDS_OFFSETS = np.array([0] + [seconds for _, seconds
+                                       in reversed(LEAP_SECONDS)])
+
 
 def time_to_decimal(time):
     """Converts a time or datetime object into decimal time
@@ -161,11 +171,11 @@ def datetime_to_modifiedjd(dt):
 def juliandate_to_gmst(juliandate):
     """Convert a Julian Date to Greenwich Mean Sidereal Time
 
-    :param juliandate: Julian Date.
+    :param juliandate: Julian Date, or array of Julian Dates.
     :return: decimal hours in GMST.
 
     """
-    jd0 = int(juliandate - 0.5) + 0.5  # Julian Date of previous midnight
+    jd0 = np.trunc(juliandate - 0.5) + 0.5  # Julian Date of previous midnight
     h = (juliandate - jd0) * 24.  # Hours since mightnight
     # Days since J2000 (Julian Date 2451545.)
     d0 = jd0 - 2451545.
@@ -190,6 +200,32 @@ def utc_to_gmst(dt):
     return juliandate_to_gmst(jd)
 
 
+def utc_timestamp_to_juliandate(timestamp):
+    """Convert a UTC timestamp to a Julian Date
+
+    :param timestamp: UTC timestamp in seconds, or array of timestamps.
+    :return: the Julian Date for the given timestamp.
+
+    """
+    days, seconds = np.divmod(timestamp, 86400)
+    return 2440587.5 + days + seconds / 86400.
+
+
+def utc_timestamp_to_gmst(timestamp):
+    """Convert a UTC timestamp to Greenwich Mean Sidereal Time
+
+    Equivalent to :func:`utc_to_gmst`, but using timestamps instead of
+    datetime objects, such that arrays of timestamps can be converted.
+
+    :param timestamp: UTC timestamp in seconds, or array of timestamps.
+    :return: decimal hours in GMST.
+
+    """
+    jd = utc_timestamp_to_juliandate(timestamp)
+
+    return juliandate_to_gmst(jd)
+
+
 def gmst_to_utc(dt):
     """Convert datetime object in Greenwich Mean Sidereal Time to UTC
 
@@ -315,28 +351,38 @@ def utc_to_lst(dt, longitude):
     return gmst_to_lst(gmst, longitude)
 
 
+def leap_seconds(timestamp):
+    """Number of leap seconds between GPS and UTC time at a timestamp
+
+    :param timestamp: timestamp in seconds, or array of timestamps.
+    :return: number of leap seconds.
+
+    """
+    offset = LEAP_SECONDS_OFFSETS[LEAP_SECONDS_UTC.searchsorted(timestamp,
+                                                                side='right')]
+    if np.ndim(offset) == 0:
+        return int(offset)
+    return offset
+
+
 def gps_to_utc(timestamp):
     """Convert GPS time to UTC
 
-    :param timestamp: GPS timestamp in seconds.
+    :param timestamp: GPS timestamp in seconds, or array of timestamps.
     :return: UTC timestamp in seconds.
 
     """
-    offset = next((seconds for date, seconds in LEAP_SECONDS
-                   if timestamp >= utc_from_string(date)), 0)
-    return timestamp - offset
+    return timestamp - leap_seconds(timestamp)
 
 
 def utc_to_gps(timestamp):
     """Convert UTC to GPS time
 
-    :param timestamp: UTC timestamp in seconds.
+    :param timestamp: UTC timestamp in seconds, or array of timestamps.
     :return: GPS timestamp in seconds.
 
     """
-    offset = next((seconds for date, seconds in LEAP_SECONDS
-                   if timestamp >= utc_from_string(date)), 0)
-    return timestamp + offset
+    return timestamp + leap_seconds(timestamp)
 
 
 def utc_from_string(date):
@@ -364,14 +410,14 @@ def gps_from_string(date):
 def gps_to_lst(timestamp, longitude):
     """Convert a GPS timestamp to lst
 
-    :param timestamp: GPS timestamp in seconds.
+    :param timestamp: GPS timestamp in seconds, or array of timestamps.
     :param longitude: location in degrees, east positive.
     :return: decimal hours in LST.
 
     """
     utc_timestamp = gps_to_utc(timestamp)
-    utc = datetime.datetime.utcfromtimestamp(utc_timestamp)
-    return utc_to_lst(utc, longitude)
+    gmst = utc_timestamp_to_gmst(utc_timestamp)
+    return gmst_to_lst(gmst, longitude)
 
 
 def gps_to_datetime(timestamp):
@@ -4,9 +4,9 @@
     well-known formulas.
 
 """
-from math import atan2, cos, degrees, radians, sin, sqrt
+from numpy import arctan2, array, column_stack, cos, degrees, ndim, radians, sin, sqrt, transpose
 
-from numpy import matrix
+from ..utils import MemoCache
 
 
 class WGS84Datum(object):
@@ -27,12 +27,61 @@ class WGS84Datum(object):
     eprime = sqrt(f * (2 - f) / (1 - f) ** 2)
 
 
+#: Cache of transformations, keyed by their reference coordinates.
+_transformations = MemoCache(maxsize=100)
+
+
+def enu_transformation(ref_llacoordinates):
+    """Get a (cached) transformation for a reference point
+
+    :param ref_llacoordinates: reference latitude, longitude, and altitude
+        coordinates. These are used as origin for ENU coordinates.
+    :return: :class:`FromWGS84ToENUTransformation` object.
+
+    """
+    key = tuple(float(value) for value in ref_llacoordinates)
+    try:
+        return _transformations.get(key)
+    except KeyError:
+        transformation = FromWGS84ToENUTransformation(ref_llacoordinates)
+        _transformations.set(key, transformation)
+        return transformation
+
+
+def _split(coordinates):
+    """Split coordinates into their three components
+
+    :param coordinates: tuple of three values, or array with shape (N, 3).
+    :return: the three components, as values or arrays of length N.
+
+    """
+    if ndim(coordinates) == 2:
+        return transpose(coordinates)
+    return coordinates
+
+
+def _combine(coordinates, first, second, third):
+    """Combine three components in the shape of the input coordinates
+
+    :param coordinates: the original tuple or (N, 3) array.
+    :return: tuple of three values, or array with shape (N, 3).
+
+    """
+    if ndim(coordinates) == 2:
+        return column_stack((first, second, third))
+    return first, second, third
+
+
 class FromWGS84ToENUTransformation(object):
 
     """Convert between various geographic coordinate systems
 
     This class converts coordinates between LLA, ENU, and ECEF.
 
+    All conversions accept either a single tuple of coordinates or an
+    array with shape (N, 3) of coordinates, in which case an array with
+    shape (N, 3) is returned.
+
     """
 
     geode = WGS84Datum()
@@ -47,6 +96,17 @@ class FromWGS84ToENUTransformation(object):
         self.ref_lla = ref_llacoordinates
         self.ref_ecef = self.lla_to_ecef(ref_llacoordinates)
 
+        latitude, longitude, _ = ref_llacoordinates
+        lat = radians(latitude)
+        lon = radians(longitude)
+
+        # Rotation from ECEF to ENU, the inverse is its transpose
+        self.ecef_to_enu_matrix = array([
+            [           -sin(lon),             cos(lon),       0.],  # noqa
+            [-sin(lat) * cos(lon), -sin(lat) * sin(lon), cos(lat)],
+            [ cos(lat) * cos(lon),  cos(lat) * sin(lon), sin(lat)]])  # noqa
+        self.enu_to_ecef_matrix = self.ecef_to_enu_matrix.T
+
     def transform(self, coordinates):
         """Transfrom WGS84 coordinates to ENU coordinates"""
 
@@ -80,7 +140,7 @@ class FromWGS84ToENUTransformation(object):
         :return: ECEF coordinates (in meters).
 
         """
-        latitude, longitude, altitude = coordinates
+        latitude, longitude, altitude = _split(coordinates)
 
         latitude = radians(latitude)
         longitude = radians(longitude)
@@ -95,7 +155,7 @@ class FromWGS84ToENUTransformation(object):
         y = (n + altitude) * cos(latitude) * sin(longitude)
         z = (b ** 2 / a ** 2 * n + altitude) * sin(latitude)
 
-        return x, y, z
+        return _combine(coordinates, x, y, z)
 
     def ecef_to_lla(self, coordinates):
         """Convert from ECEF coordinates to LLA coordinates
@@ -110,7 +170,7 @@ class FromWGS84ToENUTransformation(object):
         :return: latitude, longitude (in degrees) and altitude (in meters).
 
         """
-        x, y, z = coordinates
+        x, y, z = _split(coordinates)
 
         a = self.geode.a
         b = self.geode.b
@@ -118,15 +178,16 @@ class FromWGS84ToENUTransformation(object):
         eprime = self.geode.eprime
 
         p = sqrt(x ** 2 + y ** 2)
-        th = atan2(a * z, b * p)
+        th = arctan2(a * z, b * p)
 
-        longitude = atan2(y, x)
-        latitude = atan2((z + eprime ** 2 * b * sin(th) ** 3),
-                         (p - e ** 2 * a * cos(th) ** 3))
+        longitude = arctan2(y, x)
+        latitude = arctan2((z + eprime ** 2 * b * sin(th) ** 3),
+                           (p - e ** 2 * a * cos(th) ** 3))
         n = a / sqrt(1 - e ** 2 * sin(latitude) ** 2)
         altitude = p / cos(latitude) - n
 
-        return degrees(latitude), degrees(longitude), altitude
+        return _combine(coordinates, degrees(latitude), degrees(longitude),
+                        altitude)
 
     def ecef_to_enu(self, coordinates):
         """Convert from ECEF coordinates to ENU coordinates
@@ -142,21 +203,9 @@ class FromWGS84ToENUTransformation(object):
         :return: east, north, and up (in meters).
 
         """
-        latitude, longitude, altitude = self.ref_lla
-        xr, yr, zr = self.ref_ecef
-        x, y, z = coordinates
+        coordinates = array(coordinates, dtype=float) - self.ref_ecef
 
-        lat = radians(latitude)
-        lon = radians(longitude)
-
-        transformation = matrix([
-            [           -sin(lon),             cos(lon),       0.],  # noqa
-            [-sin(lat) * cos(lon), -sin(lat) * sin(lon), cos(lat)],
-            [ cos(lat) * cos(lon),  cos(lat) * sin(lon), sin(lat)]])  # noqa
-
-        coordinates = matrix([[x - xr], [y - yr], [z - zr]])
-
-        return (transformation * coordinates).A1
+        return coordinates.dot(self.ecef_to_enu_matrix.T)
 
     def enu_to_ecef(self, coordinates):
         """Convert from ENU coordinates to ECEF coordinates
@@ -168,20 +217,12 @@ class FromWGS84ToENUTransformation(object):
         :return: ECEF coordinates (in meters).
 
         """
-        latitude, longitude, altitude = self.ref_lla
-        xr, yr, zr = self.ref_ecef
-
-        lat = radians(latitude)
-        lon = radians(longitude)
-
-        transformation = matrix([
-            [-sin(lon), -sin(lat) * cos(lon), cos(lat) * cos(lon)],
-            [ cos(lon), -sin(lat) * sin(lon), cos(lat) * sin(lon)],  # noqa
-            [       0.,             cos(lat),            sin(lat)]])  # noqa
-
-        x, y, z = (transformation * matrix(coordinates).T).A1
+        ecef = array(coordinates, dtype=float).dot(self.enu_to_ecef_matrix.T)
+        ecef += self.ref_ecef
 
-        return x + xr, y + yr, z + zr
+        if ndim(coordinates) == 2:
+            return ecef
+        return tuple(ecef)
 
     def __repr__(self):
         return "%s(%r)" % (self.__class__.__name__, self.ref_lla)
@@ -6,10 +6,11 @@ The module contains some commonly functions and classes.
 from __future__ import division
 
 from bisect import bisect_right
+from collections import OrderedDict, namedtuple
 from distutils.spawn import find_executable
-from functools import wraps
+from functools import partial, wraps
 
-from numpy import arcsin, ceil, floor, pi, round, sin, sqrt
+from numpy import arcsin, ceil, floor, maximum, ndarray, pi, round, searchsorted, sin, sqrt
 from progressbar import ETA, Bar, Percentage, ProgressBar
 from scipy.stats import norm
 
@@ -88,6 +89,21 @@ def get_active_index(values, value):
     return idx - 1
 
 
+def get_active_indices(values, value):
+    """Get the indices where the values fit.
+
+    Array version of :func:`get_active_index`.
+
+    :param values: sorted list of values (e.g. list of timestamps).
+    :param value: array of values for which to find the positions (e.g.
+        the timestamps of events).
+    :return: array of indices into the values list.
+
+    """
+    idx = searchsorted(values, value, side='right')
+    return maximum(idx - 1, 0)
+
+
 def gauss(x, n, mu, sigma):
     """Gaussian distribution
 
@@ -166,27 +182,162 @@ def which(program):
         raise Exception('The program %s is not available.' % program)
 
 
-def memoize(method):
-    """Memoisation cache decorator
+#: Statistics of a memoization cache.
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class MemoCache(object):
+
+    """Cache of computed values with least recently used eviction
 
-    Source: http://stackoverflow.com/a/29954160/1033535
+    Used by :func:`memoize` to cache the results of methods.  It can also
+    be used directly for functions of which the results should be reused,
+    for example::
+
+        >>> _locations = MemoCache(maxsize=100)
+        >>> def location(latitude, longitude):
+        ...     key = (latitude, longitude)
+        ...     try:
+        ...         return _locations.get(key)
+        ...     except KeyError:
+        ...         value = compute_location(latitude, longitude)
+        ...         _locations.set(key, value)
+        ...         return value
+
+    :param maxsize: maximum number of cached values, the least recently
+        used values are removed first.  By default the cache is unbounded.
 
     """
-    @wraps(method)
-    def memoizer(self, *args, **kwargs):
 
-        # Prepare and get reference to cache
-        attr = "_memo_{name}".format(name=method.__name__)
-        if not hasattr(self, attr):
-            setattr(self, attr, {})
-        cache = getattr(self, attr)
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def get(self, key):
+        """Get a cached value, raises KeyError if it is not cached"""
+
+        try:
+            value = self._cache.pop(key)
+        except KeyError:
+            self.misses += 1
+            raise
+        self._cache[key] = value
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Cache a value, removing the least recently used if full"""
 
-        # Actual caching
-        key = '{args}{kwargs}'.format(args=args, kwargs=sorted(kwargs.items()))
+        self._cache[key] = value
+        if self.maxsize is not None and len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def info(self):
+        """Get the cache statistics as :data:`CacheInfo`"""
+
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                         len(self._cache))
+
+    def clear(self):
+        """Remove all values and reset the statistics"""
+
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def _freeze(value):
+    """Convert a value into something hashable to use in a cache key
+
+    Objects which are hashable are used as is, i.e. objects without an
+    equality method by identity.  Lists, sets and dictionaries are
+    converted recursively, arrays by their contents.
+
+    """
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(_freeze(item) for item in value)
+    elif isinstance(value, dict):
+        return dict, frozenset((key, _freeze(item))
+                               for key, item in value.items())
+    elif isinstance(value, (set, frozenset)):
+        return frozenset, frozenset(_freeze(item) for item in value)
+    elif isinstance(value, ndarray):
+        return ndarray, value.dtype.str, value.shape, value.tobytes()
+    try:
+        hash(value)
+    except TypeError:
+        return type(value), repr(value)
+    return value
+
+
+# Separates the positional from the keyword arguments in cache keys
+_KWARGS_MARK = object()
+
+
+def _make_key(args, kwargs):
+    """Make a hashable key from the arguments of a call"""
+
+    key = args
+    if kwargs:
+        key += (_KWARGS_MARK,) + tuple(sorted(kwargs.items()))
+    try:
+        hash(key)
+    except TypeError:
+        key = _freeze(key)
+    return key
+
+
+def memoize(method=None, maxsize=None):
+    """Memoisation cache decorator for methods
+
+    The results are cached per instance, keyed by the arguments.  Hashable
+    arguments are used directly, other arguments like lists and
+    dictionaries are frozen into tuples.  Objects without an equality
+    method, like :class:`~sapphire.api.Station`, are compared by identity.
+
+    :param maxsize: maximum number of cached results per instance, the
+        least recently used results are removed first.  By default the
+        cache is unbounded.
+
+    The cache statistics of an instance are available via the
+    ``cache_info`` attribute of the method, the cache is cleared with
+    ``cache_clear``::
+
+        >>> class Reconstruction(object):
+        ...     @memoize(maxsize=100)
+        ...     def offsets(self, stations, timestamp):
+        ...         pass
+        >>> rec = Reconstruction()
+        >>> rec.offsets([501, 502], 1451606400)
+        >>> Reconstruction.offsets.cache_info(rec)
+        CacheInfo(hits=0, misses=1, maxsize=100, currsize=1)
+
+    """
+    if method is None:
+        return partial(memoize, maxsize=maxsize)
+
+    attr = "_memo_{name}".format(name=method.__name__)
+
+    def get_cache(self):
+        try:
+            return self.__dict__[attr]
+        except KeyError:
+            cache = self.__dict__[attr] = MemoCache(maxsize)
+            return cache
+
+    @wraps(method)
+    def memoizer(self, *args, **kwargs):
+        cache = get_cache(self)
+        key = _make_key(args, kwargs)
         try:
-            return cache[key]
+            return cache.get(key)
         except KeyError:
-            cache[key] = method(self, *args, **kwargs)
-            return cache[key]
+            value = method(self, *args, **kwargs)
+            cache.set(key, value)
+            return value
 
+    memoizer.cache_info = lambda self: get_cache(self).info()
+    memoizer.cache_clear = lambda self: get_cache(self).clear()
     return memoizer